@@ -0,0 +1,51 @@
+"""
+Loading EL files with ELRuntime.load_files, parsing in this process,
+and in process pools of increasing size, see ELBulkLoader.
+Also compares the size of the IR workers send back, encoded and pickled.
+
+    python bulk_load.py [number_of_statements] [max_workers]
+"""
+import logging as root_logger
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELBulkLoader import parse_statements, DEFAULT_CHUNK_SIZE
+from ielpy.ELSerialise import dumps
+
+def statements(count):
+    #mostly plain facts, with arrays, which need the full grammar, every tenth
+    return [".agents.{}.location!{}, .agents.{}.mood.[happy, tired]".format(i % 1000, i % 50, i % 1000)
+            if i % 10 == 0 else ".agents.{}.location!{}.since.{}".format(i % 1000, i % 50, i)
+            for i in range(count)]
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    directory = tempfile.mkdtemp()
+    strings = statements(count)
+    paths = []
+    try:
+        for part in range(4):
+            path = os.path.join(directory, "part{}.el".format(part))
+            with open(path, 'w') as f:
+                f.write("\n".join(strings[part::4]))
+            paths.append(path)
+
+        chunk = [(paths[0], i, x) for i, x in enumerate(strings[:DEFAULT_CHUNK_SIZE])]
+        ir = parse_statements(chunk)
+        print("chunk of {} statements: {} bytes encoded, {} bytes pickled".format(
+            len(chunk), len(dumps(ir)), len(pickle.dumps(ir))))
+
+        for workers in range(max_workers + 1):
+            report = ELRuntime().load_files(paths, workers=workers)
+            print("workers {:2}: {:8.0f} statements/s, parse {:8.0f}/s cpu, ingest {:8.0f}/s".format(
+                workers, report['statements'] / report['seconds'],
+                report['parse']['statements_per_second'],
+                report['ingest']['statements_per_second']))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,38 @@
+"""
+A long running simulation churning facts: each step asserts an agent's
+state, overwrites it through an exclusion, and retracts the agent.
+Reports the registered node count, the interned symbols,
+and the process's peak memory as it goes, which should stay flat.
+Every step's state is a new value, as counters and timestamps are.
+
+    python churn.py [number_of_steps] [ELTrie|ELArrayTrie]
+"""
+import logging as root_logger
+import os
+import resource
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELSymbols import SYMBOLS
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    engine = ELArrayTrie if len(sys.argv) > 2 and sys.argv[2] == "ELArrayTrie" else ELTrie
+    trie = engine()
+    report = max(1, steps // 10)
+    start = perf_counter()
+    for i in range(steps):
+        agent = i % 100
+        state = i
+        trie.push(ELFACT(r=True).pair('agents').pair(agent).pair('state').epair(state).pair('since').pair(state))
+        trie.push(ELFACT(r=True).pair('agents').pair(agent).pair('state').epair(state + 1))
+        if i % 3 == 0:
+            trie.pop(ELFACT(r=True).pair('agents').pair(agent))
+        if (i + 1) % report == 0:
+            print("{:>10} steps: {:>6} nodes, {:>6} symbols, peak rss {:>7} KB, {:.1f}s".format(
+                i + 1, len(trie.allNodes), len(SYMBOLS),
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, perf_counter() - start))
@@ -0,0 +1,45 @@
+"""
+Restoring a runtime: replaying its facts through the parser,
+against loading a binary dump written by save.
+
+    python dump.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+import tempfile
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELFactStructure import ELFACT
+
+ATTRIBUTES = ['name', 'age', 'home', 'mood', 'friends']
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    runtime = ELRuntime()
+    runtime.trie.push_many(ELFACT(r=True).pair('world').pair('agents').pair(i // len(ATTRIBUTES))
+                           .epair(ATTRIBUTES[i % len(ATTRIBUTES)]).pair(i)
+                           for i in range(count))
+    source = str(runtime)
+    path = os.path.join(tempfile.mkdtemp(), "runtime.eld")
+
+    start = perf_counter()
+    runtime.save(path)
+    print("save      {:.3f}s, {:.1f}MB, against {:.1f}MB of source".format(
+        perf_counter() - start, os.path.getsize(path) / 1e6, len(source) / 1e6))
+
+    start = perf_counter()
+    replayed = ELRuntime()
+    replayed(source)
+    elapsed = perf_counter() - start
+    print("replay    {:.3f}s, {:.0f} nodes/s".format(elapsed, replayed.num_nodes() / elapsed))
+    replayed = None
+
+    start = perf_counter()
+    loaded = ELRuntime.load(path)
+    elapsed = perf_counter() - start
+    print("load      {:.3f}s, {:.0f} nodes/s".format(elapsed, loaded.num_nodes() / elapsed))
+    assert str(loaded) == source
+    os.remove(path)
@@ -0,0 +1,69 @@
+"""
+A static fact base as a live trie, against the same facts frozen to a file
+and mapped: time to load, memory held by the process, and query rates.
+
+    python frozen.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELFactStructure import ELFACT
+
+KINDS = 1000
+
+def facts(count):
+    for i in range(count // 3):
+        yield ELFACT(r=True).pair('ontology').pair(i).pair('isa').pair(i % KINDS)
+        yield ELFACT(r=True).pair('ontology').pair(i).epair('level').pair(i % 7)
+        yield ELFACT(r=True).pair('ontology').pair(i).pair('relates').pair(i * 31 % (count // 3))
+
+def rate(trie, queries):
+    start = perf_counter()
+    for query in queries:
+        trie.query(query)
+    return len(queries) / (perf_counter() - start)
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = os.path.join(tempfile.mkdtemp(), "facts.elm")
+    parser = ELRuntime().parser
+    ground = [parser(".ontology.{}.isa.{}?".format(i, i % KINDS))[0] for i in range(0, count // 3, 97)]
+    variable = [parser(".ontology.{}.$x.$y?".format(i))[0] for i in range(0, count // 3, 97)]
+
+    tracemalloc.start()
+    start = perf_counter()
+    trie = ELTrie()
+    trie.push_many(facts(count))
+    elapsed = perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("live    loaded {} nodes in {:.3f}s, {:.0f}MB held".format(
+        trie.stats.nodes, elapsed, size / 1e6))
+    ground_rate, variable_rate = rate(trie, ground), rate(trie, variable)
+
+    start = perf_counter()
+    trie.freeze(path)
+    print("froze to {:.0f}MB in {:.3f}s".format(os.path.getsize(path) / 1e6, perf_counter() - start))
+    trie = None
+
+    tracemalloc.start()
+    start = perf_counter()
+    frozen = ELTrie.open_frozen(path)
+    elapsed = perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    print("frozen  opened {} nodes in {:.6f}s, {:.3f}MB held, the rest mapped".format(
+        frozen.stats.nodes, elapsed, size / 1e6))
+    tracemalloc.stop()
+    frozen_rates = rate(frozen, ground), rate(frozen, variable)
+    print("{:8} {:>12} {:>12}".format("", "ground/s", "variable/s"))
+    print("{:8} {:12.0f} {:12.0f}".format("live", ground_rate, variable_rate))
+    print("{:8} {:12.0f} {:12.0f}".format("frozen", *frozen_rates))
+    frozen.close()
+    os.remove(path)
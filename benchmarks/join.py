@@ -0,0 +1,40 @@
+"""
+A second rule condition over a large frame, evaluated by
+probing the trie once per slice, by probing once per distinct value
+from the end of the query's ground prefix, and by joining the frame
+with a single match.
+
+    python join.py [number_of_slices]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELBinding import ELBindingFrame
+from ielpy.ELJoin import ELFactoredProbe
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runtime = ELRuntime()
+    for i in range(count):
+        runtime(".people.{}".format(i))
+        runtime(".likes.{}.{}".format(i, i % 7))
+    people = runtime.fact_query(runtime.parser(".people.$x?")[0], ELBindingFrame())
+    condition = runtime.parser(".likes.$x.$y?")[0]
+    #each slice binding one of 7 values:
+    things = runtime.fact_query(runtime.parser(".likes.$p.$x?")[0], ELBindingFrame())
+
+    evaluations = [
+        ("probe", lambda query, frame: [runtime.trie.query(query.bind(x)) for x in frame]),
+        ("factored", lambda query, frame: ELFactoredProbe(runtime.trie, query).results(frame)),
+        ("join", lambda query, frame: runtime.fact_query(query, frame).bindings),
+    ]
+    for frame_name, frame in [("people", people.bindings), ("things", things.bindings)]:
+        for name, evaluate in evaluations:
+            start = perf_counter()
+            result = evaluate(condition, frame)
+            elapsed = perf_counter() - start
+            print("{:8} over {:6} ({} slices): {:.3f}s".format(name, frame_name, len(frame), elapsed))
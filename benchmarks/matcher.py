@@ -0,0 +1,93 @@
+"""
+The trie matcher over wide and deep tries, against the previous
+recursive matcher, which copied the remaining pattern for each child.
+
+    python matcher.py [fanout] [depth]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELStructure import ELPAIR, ELVAR
+from ielpy.ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
+from ielpy.ELResults import ELFail
+from ielpy import ELExceptions as ELE
+
+class RecursiveTrie(ELTrie):
+    """ The matcher before it was made iterative """
+
+    def sub_get(self, root, el_string, current_bindings=None, new_binding=None):
+        if current_bindings is None:
+            internal_bindings = ELBindingSlice()
+        else:
+            internal_bindings = ELBindingSlice(current_bindings)
+        if new_binding is not None:
+            internal_bindings[new_binding[0]] = ELBindingEntry(*new_binding)
+        current = root
+        results = ELBindingFrame([])
+        remaining_string = el_string[:]
+        while len(remaining_string) > 0:
+            statement = remaining_string.pop(0)
+            if isinstance(statement, ELPAIR) and statement.isVar():
+                varKey = statement.value.value
+                for child in current.children.values():
+                    results.extend(self.sub_get(self[child.uuid], remaining_string,
+                                                current_bindings=internal_bindings,
+                                                new_binding=(varKey, child.uuid, child.value)))
+                remaining_string = []
+                current = None
+            elif isinstance(statement, ELPAIR) and statement in current and \
+                 (len(remaining_string) == 0 or statement.elop == current[statement].elop):
+                current = current[statement]
+            elif not isinstance(statement, ELPAIR):
+                raise ELE.ELConsistencyException('Getting something that is not a pair')
+            else:
+                results.append(ELFail())
+                remaining_string = []
+        containsAFail = any([isinstance(x, ELFail) for x in results])
+        results = ELBindingFrame([x for x in results if not isinstance(x, ELFail)])
+        if len(results) == 0 and containsAFail:
+            results = ELBindingFrame([ ELFail() ])
+        elif len(results) == 0:
+            results = ELBindingFrame([ ELBindingSlice(internal_bindings, current.uuid) ])
+        return results
+
+def build(engine, fanout, depth):
+    """ A wide part, .wide.$a.$b with fanout squared leaves,
+    and a deep part, a chain of depth pairs with two children at each step """
+    trie = engine()
+    for a in range(fanout):
+        for b in range(fanout):
+            trie.push(ELFACT(r=True).pair('wide').pair(a).pair(b))
+    chain = ELFACT(r=True).pair('deep')
+    for d in range(depth):
+        trie.push(ELFACT(chain.data[:], r=False).pair('side'))
+        chain.pair('step')
+    trie.push(chain)
+    return trie
+
+def queries(depth):
+    wide = ELFACT(r=True).pair('wide').pair(ELVAR('a')).pair(ELVAR('b')).query()
+    deep = ELFACT(r=True).pair('deep')
+    for d in range(depth):
+        deep.pair(ELVAR("v{}".format(d)) if d % 4 == 0 else 'step')
+    return [('wide', wide), ('deep', deep.query())]
+
+def time_query(trie, query, repeats):
+    start = perf_counter()
+    for i in range(repeats):
+        result = trie.query(query)
+    return (perf_counter() - start) / repeats, result
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    fanout = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    tries = [(engine.__name__, build(engine, fanout, depth)) for engine in [RecursiveTrie, ELTrie]]
+    for name, query in queries(depth):
+        for engine, trie in tries:
+            seconds, result = time_query(trie, query, 5)
+            print("{:6} {:14} {:9.2f}ms  {} matches".format(name, engine, seconds * 1000, len(result.bindings)))
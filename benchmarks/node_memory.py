@@ -0,0 +1,61 @@
+"""
+Bytes per trie node, for the current ELTrieNode, against
+the previous layout of a __dict__ per node and a uuid1 id.
+
+    python node_memory.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+import tracemalloc
+import uuid
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELTrieNode import ELTrieNode
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELUtil import EL
+
+class LegacyNode:
+    """ The node layout before __slots__ and integer ids """
+    def __init__(self, val, parent=None):
+        self.uuid = uuid.uuid1()
+        self.elop = EL.DOT
+        self.value = val
+        self.parent = parent
+        self.children = {}
+
+def measure_nodes(node_type, count):
+    """ Allocate nodes with their id index, returning (bytes per node, seconds) """
+    tracemalloc.start()
+    start = perf_counter()
+    root = node_type('ROOT')
+    index = {root.uuid : root}
+    for i in range(count):
+        node = node_type(i, parent=root)
+        root.children[i] = node
+        index[node.uuid] = node
+    elapsed = perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / count, elapsed
+
+def measure_trie(count):
+    """ Bytes per node of a trie built from facts, including its indexes """
+    facts = [ELFACT(r=True).pair('a').pair(i % 100).pair(i) for i in range(count)]
+    tracemalloc.start()
+    trie = ELTrie()
+    for fact in facts:
+        trie.push(fact)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(trie.allNodes)
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    legacy, legacy_time = measure_nodes(LegacyNode, count)
+    current, current_time = measure_nodes(ELTrieNode, count)
+    print("legacy node:  {:7.1f} bytes/node  {:.3f}s".format(legacy, legacy_time))
+    print("ELTrieNode:   {:7.1f} bytes/node  {:.3f}s".format(current, current_time))
+    print("trie of {} facts: {:.1f} bytes/node".format(count // 10, measure_trie(count // 10)))
@@ -0,0 +1,34 @@
+"""
+Parsing repeated statements through runtime.parser, with the parse cache
+and without it. Statements the fast parser accepts skip the cache,
+those needing the full grammar are copied out of it.
+
+    python parse_cache.py [repeats]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+
+STATEMENTS = ['.a.b.c!d.5', '.agents.$a.energy.$e?', '.agents.bob.location!market',
+              '.agents.bob.mood.[happy, tired]', '.a.b.$x?, .a.$x.c?']
+
+def time_parse(parser, statement, repeats):
+    parser(statement)
+    start = perf_counter()
+    for i in range(repeats):
+        parser(statement)
+    return (perf_counter() - start) / repeats
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    cached = ELRuntime().parser
+    uncached = ELRuntime(parse_cache_size=0).parser
+    for statement in STATEMENTS:
+        print("{:<36} cached {:>8.1f}us, uncached {:>8.1f}us".format(
+            statement, time_parse(cached, statement, repeats) * 1e6,
+            time_parse(uncached, statement, repeats) * 1e6))
+    print(cached)
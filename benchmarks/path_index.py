@@ -0,0 +1,40 @@
+"""
+Ground queries and get_location on fully specified paths,
+by walking the trie, and by a lookup in the path index.
+
+    python path_index.py [number_of_facts] [depth]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+
+def best_of(run, repeats=5):
+    times = []
+    for i in range(repeats):
+        start = perf_counter()
+        run()
+        times.append(perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    facts = ["".join([".{}".format((i >> (2 * j)) % 4) for j in range(depth - 1)]) + ".{}".format(i)
+             for i in range(count)]
+    for name, indexed in [("walk", False), ("index", True)]:
+        runtime = ELRuntime()
+        if indexed:
+            runtime.trie.add_path_index()
+        start = perf_counter()
+        for fact in facts:
+            runtime(fact)
+        loading = perf_counter() - start
+        queries = [runtime.parser(x + "?")[0] for x in facts]
+        querying = best_of(lambda: [runtime.trie.query(x) for x in queries])
+        locating = best_of(lambda: [runtime.get_location(x) for x in queries])
+        print("{:5}: load {:.3f}s, {:.2f}us per query, {:.2f}us per get_location".format(
+            name, loading, querying * 1e6 / count, locating * 1e6 / count))
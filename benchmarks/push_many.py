@@ -0,0 +1,40 @@
+"""
+Loading the facts of a dumped trie, as its leaves in order:
+each fact pushed in turn, compared to push_many sharing their prefixes.
+
+    python push_many.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELFactStructure import ELFACT
+
+ATTRIBUTES = ['name', 'age', 'home', 'mood', 'friends']
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    facts = []
+    agent = 0
+    while len(facts) < count:
+        for attribute in ATTRIBUTES:
+            for value in range(2 if attribute == 'friends' else 1):
+                facts.append(ELFACT(r=True).pair('world').pair('agents').pair(agent)
+                             .pair('details').epair(attribute).pair(value + agent))
+        agent += 1
+    facts = facts[:count]
+
+    for name in ["push", "push_many"]:
+        trie = ELTrie()
+        start = perf_counter()
+        if name == "push":
+            for fact in facts:
+                trie.push(fact)
+        else:
+            trie.push_many(facts)
+        elapsed = perf_counter() - start
+        print("{:10} {} facts in {:.3f}s, {:.0f} facts/s, {} nodes".format(
+            name, count, elapsed, count / elapsed, trie.stats.nodes))
@@ -0,0 +1,44 @@
+"""
+Snapshots of a large trie: the time to take one, the memory kept for it
+as the trie changes, and queries against it compared to the live trie.
+
+    python snapshot.py [number_of_facts] [number_of_changes]
+"""
+import logging as root_logger
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELFactStructure import ELFACT
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    changes = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    runtime = ELRuntime()
+    for i in range(count):
+        runtime.trie.push(ELFACT(r=True).pair('agents').pair(i).epair('location').pair(i % 50))
+    print("trie of {} nodes".format(len(runtime.trie.allNodes)))
+
+    tracemalloc.start()
+    start = perf_counter()
+    snapshot = runtime.snapshot()
+    print("snapshot taken in {:.1f}us".format((perf_counter() - start) * 1e6))
+    base = tracemalloc.get_traced_memory()[0]
+    start = perf_counter()
+    for i in range(changes):
+        runtime.trie.push(ELFACT(r=True).pair('agents').pair(i * 7 % count).epair('location').pair(i % 50 + 1))
+    elapsed = perf_counter() - start
+    kept = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    print("{} changes in {:.3f}s: {} nodes preserved, {:.0f} bytes kept per change".format(
+        changes, elapsed, len(runtime.trie.frozen), kept / changes))
+
+    queries = [runtime.parser(".agents.{}.location!$l?".format(i * 13 % count))[0] for i in range(2000)]
+    for name, trie in [("live", runtime.trie), ("snapshot", snapshot)]:
+        start = perf_counter()
+        for query in queries:
+            trie.query(query)
+        print("{:8} queries: {:.2f}us each".format(name, (perf_counter() - start) * 1e6 / len(queries)))
@@ -0,0 +1,59 @@
+"""
+Child lookup and memory of a trie whose facts repeat the same names,
+as parsed facts do: each parsed string is a fresh object, which interning shares.
+
+    python symbols.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELStructure import ELPAIR
+from ielpy.ELSymbols import SYMBOLS
+
+NAMES = ["character_{}".format(x) for x in range(50)]
+
+def fresh(name):
+    """ A new copy of a string, as the parser produces """
+    return "".join(list(name))
+
+def build(count):
+    """ Bytes per node of a trie, including the facts' strings """
+    tracemalloc.start()
+    facts = [ELFACT(r=True).pair(fresh('people')).pair(fresh(NAMES[i % 50]))
+             .pair(fresh(NAMES[(i // 50) % 50]))
+             .pair(fresh(NAMES[(i // 2500) % 50])) for i in range(count)]
+    trie = ELTrie()
+    for fact in facts:
+        trie.push(fact)
+    del facts
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return trie, size / len(trie.allNodes)
+
+def lookups(trie, repeats, keys):
+    """ Time walking the first levels of the trie by the given keys """
+    root = trie.root
+    first = keys[0]
+    rest = keys[1:]
+    start = perf_counter()
+    for i in range(repeats):
+        people = root[first]
+        for key in rest:
+            people[key]
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    trie, per_node = build(count)
+    print("trie of {} facts: {:.1f} bytes/node, {} symbols".format(count, per_node, len(SYMBOLS)))
+    values = ['people'] + NAMES
+    pairs = [ELPAIR(fresh(x)) for x in values]
+    for name, keys in [('value', values), ('pair', pairs)]:
+        best = min([lookups(trie, 20000, keys) for x in range(5)])
+        print("{} {} lookups: {:.3f}s".format(20000 * len(keys), name, best))
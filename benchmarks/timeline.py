@@ -0,0 +1,57 @@
+"""
+Queries as of a past step: the timeline's binary searches,
+compared to replaying the statements up to that step into a new runtime.
+
+    python timeline.py [number_of_agents] [number_of_steps]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELFactStructure import ELFACT
+
+PLACES = ['market', 'home', 'farm', 'forge']
+
+def move(agent, step):
+    return ELFACT(r=True).pair('agents').pair(agent).epair('location').pair(PLACES[(agent + step) % 4])
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    runtime = ELRuntime()
+    runtime.enable_timeline()
+    moves = []
+    start = perf_counter()
+    for step in range(steps):
+        #a tenth of the agents move each step
+        moves.append([move(x, step) for x in range(step % 10, agents, 10)])
+        for fact in moves[-1]:
+            runtime.trie.push(fact)
+        runtime.advance()
+    print("{} steps of {} moves in {:.3f}s, {} nodes recorded".format(
+        steps, len(moves[0]), perf_counter() - start, len(runtime.trie.timeline)))
+
+    past = steps // 2
+    queries = [runtime.parser(".agents.{}.location!$l?".format(x * 7 % agents))[0] for x in range(100)]
+    start = perf_counter()
+    for query in queries:
+        runtime.trie.query(query, at=past)
+    print("timeline: {:.2f}us per query".format((perf_counter() - start) * 1e6 / len(queries)))
+
+    start = perf_counter()
+    replayed = ELRuntime()
+    for step in moves[:past + 1]:
+        for fact in step:
+            replayed.trie.push(fact)
+    for query in queries:
+        replayed.trie.query(query)
+    print("replay:   {:.2f}us per query, with one replay".format(
+        (perf_counter() - start) * 1e6 / len(queries)))
+
+    start = perf_counter()
+    for query in queries[:10]:
+        runtime.trie.query(query, between=(0, steps))
+    print("ever, over every step: {:.2f}us per query".format((perf_counter() - start) * 1e6 / 10))
@@ -0,0 +1,47 @@
+"""
+Who is at the market: a query with a variable before a selective value,
+matched by scanning every agent, and through a secondary index.
+Also times the cost the index adds to moving agents around.
+
+    python trie_index.py [number_of_agents]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+
+PLACES = 50
+
+def place(i):
+    """ Names are letters only: placea, placeb, ... placeaa, placeab """
+    letters = ""
+    i += 1
+    while i > 0:
+        i, remainder = divmod(i - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return "place" + letters
+
+def populate(runtime, count):
+    start = perf_counter()
+    for i in range(count):
+        runtime(".agents.{}.location!{}".format(i, place(i % PLACES)))
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = 100
+    for name, indexed in [("scan", False), ("index", True)]:
+        runtime = ELRuntime()
+        if indexed:
+            runtime.add_index(".agents.$a.location!$l")
+        loading = populate(runtime, count)
+        query = runtime.parser(".agents.$a.location!placea?")[0]
+        start = perf_counter()
+        for i in range(repeats):
+            result = runtime.trie.query(query)
+        elapsed = perf_counter() - start
+        print("{:6}: load {} agents {:.3f}s, {} at the market, {:.2f}ms per query".format(
+            name, count, loading, len(result.bindings), elapsed * 1000 / repeats))
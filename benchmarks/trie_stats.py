@@ -0,0 +1,50 @@
+"""
+Polling trie metrics: the full traversal of dfs_for_metrics,
+against the statistics kept as the trie changes,
+what keeping them costs when loading,
+and counting them on first use, for a trie loaded without them.
+
+    python trie_stats.py [number_of_facts]
+"""
+import logging as root_logger
+import os
+import sys
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELFactStructure import ELFACT
+
+def load(trie, facts):
+    start = perf_counter()
+    for fact in facts:
+        trie.push(fact)
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    facts = [ELFACT(r=True).pair('a').pair(i % 100).pair(i // 100 % 100).pair(i) for i in range(count)]
+
+    untracked = ELTrie()
+    print("load without stats: {:.3f}s".format(load(untracked, facts)))
+    trie = ELTrie()
+    #reading the stats starts keeping them
+    trie.stats
+    print("load with stats:    {:.3f}s".format(load(trie, facts)))
+    start = perf_counter()
+    untracked.stats
+    print("first read:         {:.3f}s".format(perf_counter() - start))
+
+    start = perf_counter()
+    metrics = trie.dfs_for_metrics()
+    traversal = perf_counter() - start
+    print("dfs_for_metrics: {:>8.3f}ms, depth {}, {} leaves, {} nodes".format(
+        traversal * 1000, metrics['maxDepth'], len(metrics['leaves']), len(trie.allNodes) - 1))
+    repeats = 10000
+    start = perf_counter()
+    for i in range(repeats):
+        stats = trie.stats
+        metrics = (stats.max_depth(), stats.leaves, stats.nodes, stats.leaves_under(trie.root['a']))
+    kept = perf_counter() - start
+    print("kept stats:      {:>8.3f}ms, depth {}, {} leaves, {} nodes".format(
+        kept * 1000 / repeats, metrics[0], metrics[1], metrics[2]))
@@ -0,0 +1,55 @@
+"""
+Memory, insert rate and query rate of the trie storage engines,
+the object per node ELTrie against the array backed ELArrayTrie.
+
+    python trie_storage.py [number_of_nodes]
+"""
+import logging as root_logger
+import gc
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELFactStructure import ELFACT
+
+BRANCHING = 1000
+
+def make_facts(count):
+    """ Facts of .people.$group.$id, so nearly every fact adds one leaf """
+    return [ELFACT(r=True).pair('people').pair(i % BRANCHING).pair(i) for i in range(count)]
+
+def build(engine, facts):
+    """ Returns (trie, bytes per node, seconds) """
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    trie = engine()
+    for fact in facts:
+        trie.push(fact)
+    elapsed = perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return trie, size / len(trie.allNodes), elapsed
+
+def run_queries(trie, queries):
+    start = perf_counter()
+    for query in queries:
+        if not trie.query(query):
+            raise Exception("Missing: {}".format(query))
+    return perf_counter() - start
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    facts = make_facts(count)
+    queries = [facts[i].query() for i in range(0, count, max(1, count // 20000))]
+    for engine in [ELTrie, ELArrayTrie]:
+        trie, per_node, insert_time = build(engine, facts)
+        query_time = run_queries(trie, queries)
+        print("{:12} {:9} nodes {:7.1f} bytes/node  {:9.0f} inserts/s  {:8.0f} queries/s".format(
+            engine.__name__, len(trie.allNodes), per_node,
+            count / insert_time, len(queries) / query_time))
+        del trie
@@ -0,0 +1,77 @@
+"""
+Read throughput of threads querying pinned versions of a trie
+while a writer thread asserts into it, compared to no writer,
+and to readers and the writer sharing one lock on the live trie,
+held for each batch of queries, so a batch sees one state as it does
+with versions.
+
+    python versions.py [number_of_readers] [seconds]
+"""
+import logging as root_logger
+import os
+import sys
+import threading
+from time import sleep
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELFactStructure import ELFACT
+
+AGENTS = 10000
+
+def move(i):
+    return ELFACT(r=True).pair('agents').pair(i * 7 % AGENTS).epair('location').pair(i % 50)
+
+def run(mode, readers, seconds):
+    runtime = ELRuntime()
+    for i in range(AGENTS):
+        runtime.trie.push(move(i))
+    if mode == "versions":
+        versions = runtime.enable_versions()
+    lock = threading.Lock()
+    queries = [runtime.parser(".agents.{}.location!$l?".format(i * 13 % AGENTS))[0] for i in range(100)]
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def read(n):
+        while not stop.is_set():
+            if mode == "lock":
+                with lock:
+                    for query in queries:
+                        runtime.trie.query(query)
+            else:
+                with versions.pin() if mode == "versions" else runtime.snapshot() as version:
+                    for query in queries:
+                        version.query(query)
+            reads[n] += len(queries)
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            if mode == "lock":
+                with lock:
+                    runtime.trie.push(move(i))
+            else:
+                with versions.write():
+                    runtime.trie.push(move(i))
+            i += 1
+        writes[0] = i
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    if mode != "no writer":
+        threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print("{:10} {:8.0f} reads/s, {:8.0f} writes/s, {} preserved nodes".format(
+        mode, sum(reads) / seconds, writes[0] / seconds, len(runtime.trie.frozen)))
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for mode in ["no writer", "versions", "lock"]:
+        run(mode, readers, seconds)
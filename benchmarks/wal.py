@@ -0,0 +1,49 @@
+"""
+Assertion throughput of a runtime without a write ahead log,
+and with one at each durability level, see ELWal.
+
+    python wal.py [number_of_statements] [group_window_seconds]
+"""
+import logging as root_logger
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ielpy.ELRuntime import ELRuntime
+from ielpy.ELWal import ELDURABILITY
+
+def statements(count):
+    return [".agents.{}.location!{}".format(i % 1000, i % 50) for i in range(count)]
+
+def run(durability, strings, window, directory):
+    runtime = ELRuntime()
+    #parse ahead, so only acting and logging are timed
+    actions = [runtime.parser(x)[0] for x in strings]
+    path = os.path.join(directory, "{}.wal".format(durability))
+    if durability is not None:
+        runtime.enable_wal(path, durability, window)
+    start = perf_counter()
+    for action in actions:
+        runtime.act(action)
+    if durability is not None:
+        runtime.wal.close()
+    elapsed = perf_counter() - start
+    name = "no log" if durability is None else durability.name
+    size = os.path.getsize(path) / len(strings) if durability is not None else 0
+    print("{:8} {:10.0f} statements/s, {:4.1f} bytes each".format(name, len(strings) / elapsed, size))
+
+if __name__ == "__main__":
+    root_logger.disable(root_logger.CRITICAL)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    window = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    directory = tempfile.mkdtemp()
+    strings = statements(count)
+    try:
+        for durability in [None, ELDURABILITY.OS, ELDURABILITY.GROUP]:
+            run(durability, strings, window, directory)
+        #fsync per statement is slow, so fewer
+        run(ELDURABILITY.SYNC, strings[:count // 10], window, directory)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,420 @@
+"""
+An array backed storage engine for the ELTrie interface.
+Instead of an object per node, node fields are held in typed arrays
+indexed by a node's slot, and child edges are held in one dict for the
+whole trie, keyed by (parent slot, child symbol id).
+
+Node ids are assigned to slots from blocks of reserved ids,
+so finding a node by id needs no index of its own.
+The slots of removed subtrees are released for reuse, under fresh ids,
+so the few reused slots are indexed by id.
+Nodes are handed out as ELArrayNode views, which implement the
+ELTrieNode interface over the arrays. A view is shared while it is alive,
+so the same node is always the same object.
+"""
+import logging as root_logger
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, MutableMapping
+from weakref import WeakValueDictionary
+from .ELTrie import ELTrie
+from .ELTrieNode import ELTrieNode
+from .ELStructure import ELPAIR
+from .ELSymbols import SYMBOLS
+from .ELUtil import EL, ELNodeId, new_node_id, reserve_node_ids
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+#slots per reserved block of node ids
+BLOCK_BITS = 12
+BLOCK_SIZE = 1 << BLOCK_BITS
+#edges are keyed by (parent << SYM_BITS) | symbol id
+SYM_BITS = 32
+NONE = -1
+ELOPS = list(EL)
+ELOP_CODES = { x : i for i, x in enumerate(ELOPS) }
+
+
+class ELArrayTrie(ELTrie):
+    """ An ELTrie storing its nodes in typed arrays """
+
+    def __init__(self):
+        super().__init__()
+        self.parents = array('q')
+        #syms :: the ids of slots' symbols, symbols :: [ELSymbol | None], which holds them
+        self.syms = array('q')
+        self.symbols = []
+        self.elops = array('b')
+        self.first_child = array('q')
+        self.last_child = array('q')
+        self.next_sibling = array('q')
+        self.prev_sibling = array('q')
+        self.counts = array('l')
+        self.ids = array('q')
+        self.alive = bytearray()
+        #when each slot was last linked to its parent, which orders siblings
+        self.linked = array('q')
+        self.links = 0
+        #edges :: { (parent << SYM_BITS) | symbol id : slot }
+        self.edges = {}
+        #values that differ from their symbol's interned value, such as 1.0 after 1
+        self.exact = {}
+        #first node id of each block of slots
+        self.id_blocks = []
+        #released slots, and the ids given to slots on reuse
+        self.free = []
+        self.reused = {}
+        self.views = WeakValueDictionary()
+        #the storage of the root and node index replace the base trie's
+        self.root = self.view(self.allocate('ROOT', EL.DOT, NONE))
+        self.allNodes = ELArrayNodes(self)
+
+    def __len__(self):
+        return len(self.parents) - len(self.free)
+
+    def allocate(self, value, elop, parent):
+        """ Add a slot for a node, unlinked """
+        value, sym = SYMBOLS.canonical(value)
+        if sym is None:
+            raise ELE.ELTrieException("Trie values must be hashable: {}".format(value))
+        if bool(self.free):
+            return self.reuse(value, sym, elop, parent)
+        slot = len(self.parents)
+        if slot >> BLOCK_BITS == len(self.id_blocks):
+            self.id_blocks.append(reserve_node_ids(BLOCK_SIZE))
+        self.parents.append(parent)
+        self.syms.append(sym.id)
+        self.symbols.append(sym)
+        self.elops.append(ELOP_CODES[elop])
+        self.first_child.append(NONE)
+        self.last_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.prev_sibling.append(NONE)
+        self.counts.append(0)
+        self.ids.append(self.id_blocks[slot >> BLOCK_BITS] + (slot & (BLOCK_SIZE - 1)))
+        self.alive.append(1)
+        self.linked.append(0)
+        if sym.value is not value:
+            self.exact[slot] = value
+        return slot
+
+    def reuse(self, value, sym, elop, parent):
+        """ Fill a released slot, under a fresh id """
+        slot = self.free.pop()
+        node_id = new_node_id()
+        self.parents[slot] = parent
+        self.syms[slot] = sym.id
+        self.symbols[slot] = sym
+        self.elops[slot] = ELOP_CODES[elop]
+        self.first_child[slot] = NONE
+        self.last_child[slot] = NONE
+        self.next_sibling[slot] = NONE
+        self.prev_sibling[slot] = NONE
+        self.counts[slot] = 0
+        self.ids[slot] = node_id
+        self.alive[slot] = 1
+        self.reused[node_id] = slot
+        if sym.value is not value:
+            self.exact[slot] = value
+        return slot
+
+    def release(self, node):
+        """ Free the slots of a detached subtree. Views of them stop working """
+        self.preserve_subtree(node)
+        queue = [node.slot]
+        while bool(queue):
+            slot = queue.pop()
+            for child in self.child_slots(slot):
+                del self.edges[(slot << SYM_BITS) | self.syms[child]]
+                queue.append(child)
+            self.free_slot(slot)
+
+    def free_slot(self, slot):
+        self.alive[slot] = 0
+        self.symbols[slot] = None
+        self.reused.pop(self.ids[slot], None)
+        self.exact.pop(slot, None)
+        self.free.append(slot)
+        view = self.views.pop(slot, None)
+        if view is not None:
+            view.trie = None
+
+    def compact(self):
+        """ Release slots no longer reachable from the root.
+        Returns the number of nodes released """
+        reachable = bytearray(len(self.parents))
+        queue = [self.root.slot]
+        while bool(queue):
+            slot = queue.pop()
+            reachable[slot] = 1
+            queue.extend(self.child_slots(slot))
+        orphans = [x for x in range(len(self.parents)) if self.alive[x] and not reachable[x]]
+        for slot in orphans:
+            #children are released with their own slots, so edges are dropped here
+            for child in self.child_slots(slot):
+                del self.edges[(slot << SYM_BITS) | self.syms[child]]
+            self.free_slot(slot)
+        if self.kept_stats is not None:
+            self.kept_stats.rebuild()
+        logging.info("Compacted trie, released %s orphans", len(orphans))
+        return len(orphans)
+
+    def new_node(self, value, parent):
+        """ Create a node. Node ids don't need registering """
+        elop = EL.DOT
+        if isinstance(value, ELPAIR):
+            elop = value.elop
+            value = value.value
+        return self.view(self.allocate(value, elop, parent.slot))
+
+    def sibling_order(self, node):
+        """ A key ordering a node among its siblings, as a walk visits them """
+        return self.linked[node.slot]
+
+    def view(self, slot):
+        """ Get the node at a slot """
+        node = self.views.get(slot)
+        if node is None:
+            node = ELArrayNode(self, slot)
+            self.views[slot] = node
+        return node
+
+    def node_id(self, slot):
+        return ELNodeId(self.ids[slot])
+
+    def slot_of(self, node_id):
+        """ Get the slot of a node id, or None if it isn't in this trie """
+        if not isinstance(node_id, int):
+            return None
+        slot = self.reused.get(node_id)
+        if slot is not None:
+            return slot
+        block = bisect_right(self.id_blocks, node_id) - 1
+        if block < 0:
+            return None
+        offset = node_id - self.id_blocks[block]
+        slot = (block << BLOCK_BITS) + offset
+        if offset >= BLOCK_SIZE or slot >= len(self.parents) \
+           or not self.alive[slot] or self.ids[slot] != node_id:
+            return None
+        return slot
+
+    def child(self, parent, sym):
+        """ Get the slot of a child by symbol, or None """
+        if sym is None:
+            return None
+        return self.edges.get((parent << SYM_BITS) | sym.id)
+
+    def link(self, parent, slot):
+        """ Add a slot as the last child of parent,
+        replacing any child with the same symbol """
+        key = (parent << SYM_BITS) | self.syms[slot]
+        existing = self.edges.get(key)
+        if existing == slot:
+            return
+        if existing is not None:
+            self.unlink(existing)
+        self.edges[key] = slot
+        last = self.last_child[parent]
+        self.prev_sibling[slot] = last
+        self.next_sibling[slot] = NONE
+        if last == NONE:
+            self.first_child[parent] = slot
+        else:
+            self.next_sibling[last] = slot
+        self.last_child[parent] = slot
+        self.counts[parent] += 1
+        self.parents[slot] = parent
+        self.links += 1
+        self.linked[slot] = self.links
+
+    def unlink(self, slot):
+        """ Detach a slot from its parent. Like a removed ELTrieNode,
+        it keeps its own parent and children """
+        parent = self.parents[slot]
+        key = (parent << SYM_BITS) | self.syms[slot]
+        if parent == NONE or self.edges.get(key) != slot:
+            return
+        del self.edges[key]
+        prev = self.prev_sibling[slot]
+        following = self.next_sibling[slot]
+        if prev == NONE:
+            self.first_child[parent] = following
+        else:
+            self.next_sibling[prev] = following
+        if following == NONE:
+            self.last_child[parent] = prev
+        else:
+            self.prev_sibling[following] = prev
+        self.prev_sibling[slot] = NONE
+        self.next_sibling[slot] = NONE
+        self.counts[parent] -= 1
+
+    def child_slots(self, parent):
+        current = self.first_child[parent]
+        while current != NONE:
+            following = self.next_sibling[current]
+            yield current
+            current = following
+
+    def value_of(self, slot):
+        try:
+            return self.exact[slot]
+        except KeyError:
+            return self.symbols[slot].value
+
+
+class ELArrayNode(ELTrieNode):
+    """ A view of a node of an ELArrayTrie, behaving as an ELTrieNode """
+    __slots__ = ['trie', 'slot', '__weakref__']
+
+    def __init__(self, trie, slot):
+        self.trie = trie
+        self.slot = slot
+
+    @property
+    def uuid(self):
+        return self.trie.node_id(self.slot)
+
+    @property
+    def elop(self):
+        return ELOPS[self.trie.elops[self.slot]]
+
+    @elop.setter
+    def elop(self, elop):
+        self.trie.elops[self.slot] = ELOP_CODES[elop]
+
+    @property
+    def value(self):
+        return self.trie.value_of(self.slot)
+
+    @value.setter
+    def value(self, value):
+        value, sym = SYMBOLS.canonical(value)
+        if sym is None:
+            raise ELE.ELTrieException("Trie values must be hashable: {}".format(value))
+        if sym.value is value:
+            self.trie.exact.pop(self.slot, None)
+        else:
+            self.trie.exact[self.slot] = value
+
+    @property
+    def sym(self):
+        return self.trie.symbols[self.slot]
+
+    @sym.setter
+    def sym(self, sym):
+        self.trie.syms[self.slot] = sym.id
+        self.trie.symbols[self.slot] = sym
+
+    @property
+    def parent(self):
+        parent = self.trie.parents[self.slot]
+        if parent == NONE:
+            return None
+        return self.trie.view(parent)
+
+    @parent.setter
+    def parent(self, parent):
+        self.trie.parents[self.slot] = NONE if parent is None else parent.slot
+
+    @property
+    def children(self):
+        return ELArrayChildren(self.trie, self.slot)
+
+    def __len__(self):
+        return self.trie.counts[self.slot]
+
+    def __eq__(self, other):
+        if isinstance(other, ELArrayNode) and other.trie is self.trie:
+            return other.slot == self.slot
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+    def __getitem__(self, key):
+        slot = self.trie.child(self.slot, self.key_of(key))
+        if slot is None:
+            raise KeyError(key)
+        return self.trie.view(slot)
+
+    def __contains__(self, key):
+        return self.trie.child(self.slot, self.key_of(key)) is not None
+
+    def values(self):
+        return [self.trie.view(x) for x in self.trie.child_slots(self.slot)]
+
+    def is_empty(self):
+        return self.trie.counts[self.slot] == 0
+
+    def __iter__(self):
+        return iter(self.values())
+
+
+class ELArrayChildren(MutableMapping):
+    """ The children of an ELArrayNode, as the { sym : node } dict of an ELTrieNode """
+
+    def __init__(self, trie, slot):
+        self.trie = trie
+        self.slot = slot
+
+    def __getitem__(self, sym):
+        slot = self.trie.child(self.slot, sym)
+        if slot is None:
+            raise KeyError(sym)
+        return self.trie.view(slot)
+
+    def __contains__(self, sym):
+        return self.trie.child(self.slot, sym) is not None
+
+    def __setitem__(self, sym, node):
+        if not isinstance(node, ELArrayNode) or node.trie is not self.trie:
+            raise ELE.ELConsistencyException("Array trie nodes can only hold nodes of the same trie")
+        if sym != node.sym:
+            raise ELE.ELConsistencyException("Child symbol mismatch: {} {}".format(sym, node.sym))
+        self.trie.link(self.slot, node.slot)
+
+    def __delitem__(self, sym):
+        slot = self.trie.child(self.slot, sym)
+        if slot is None:
+            raise KeyError(sym)
+        self.trie.unlink(slot)
+
+    def __iter__(self):
+        symbols = self.trie.symbols
+        return (symbols[x] for x in self.trie.child_slots(self.slot))
+
+    def __len__(self):
+        return self.trie.counts[self.slot]
+
+    def values(self):
+        return [self.trie.view(x) for x in self.trie.child_slots(self.slot)]
+
+    def clear(self):
+        for slot in list(self.trie.child_slots(self.slot)):
+            self.trie.unlink(slot)
+
+
+class ELArrayNodes(Mapping):
+    """ The allNodes index of an ELArrayTrie, computed from node ids """
+
+    def __init__(self, trie):
+        self.trie = trie
+
+    def __getitem__(self, node_id):
+        slot = self.trie.slot_of(node_id)
+        if slot is None:
+            raise KeyError(node_id)
+        return self.trie.view(slot)
+
+    def __contains__(self, node_id):
+        return self.trie.slot_of(node_id) is not None
+
+    def __iter__(self):
+        alive = self.trie.alive
+        return (self.trie.node_id(x) for x in range(len(alive)) if alive[x])
+
+    def __len__(self):
+        return len(self.trie)
@@ -56,7 +56,7 @@ class ELBindingSlice(dict):
 
 class ELBindingEntry:
     """ Contains a single data point, $x = 5.
-    Stores both the node uuid and the value itself
+    Stores both the node id and the value itself
     """
     def __init__(self, key, node_uuid, value):
         self.key = key
@@ -64,5 +64,5 @@ class ELBindingEntry:
         self.value = value
 
     def __repr__(self):
-        return "ELBindEntry({}, {}, +uuid)".format(self.key, self.value)
+        return "ELBindEntry({}, {}, +id)".format(self.key, self.value)
         
@@ -0,0 +1,140 @@
+"""
+Bulk loading of EL files, parsing chunks of statements
+in a process pool while ingesting them into a single runtime in order.
+Workers send their IR back in the compact encoding of ELSerialise,
+which is cheaper to move between processes than pickled IR.
+"""
+import logging as root_logger
+import os
+from collections import deque
+from time import perf_counter, process_time
+from .ELStream import EL_STATEMENTS
+from .ELParser import ELPARSE
+from .ELSerialise import dumps, loads
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 512
+
+def parse_statements(chunk):
+    """ Parse a list of (path, line, statement) into IR """
+    results = []
+    for path, line_number, statement in chunk:
+        try:
+            results.extend(ELPARSE(statement))
+        except ELE.ELParseException as pe:
+            raise ELE.ELParseException("{} ({}: line {})".format(pe, path, line_number))
+    return results
+
+def parse_chunk(chunk):
+    """ Worker side: parse a chunk,
+    returning the encoded IR, and the cpu time spent """
+    start = process_time()
+    encoded = dumps(parse_statements(chunk))
+    return encoded, process_time() - start
+
+
+class ELBulkLoader:
+    """ Splits input at statement boundaries, parses chunks in worker processes,
+    and acts on the results in the main process in source order,
+    so exclusion and retraction semantics are the same as a sequential load.
+    """
+
+    def __init__(self, runtime, workers=0, chunk_size=DEFAULT_CHUNK_SIZE):
+        assert chunk_size > 0
+        self.runtime = runtime
+        #workers of None uses the cpu count, 0 parses in this process.
+        #In process is the default, as the pool only wins with cores to spare,
+        #see benchmarks/bulk_load.py
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def chunks(self, paths, stats):
+        """ Read and split the files, grouping statements into chunks """
+        chunk = []
+        for path in paths:
+            with open(path) as f:
+                for line_number, statement in EL_STATEMENTS(f):
+                    stats['bytes'] += len(statement)
+                    chunk.append((path, line_number, statement))
+                    if len(chunk) >= self.chunk_size:
+                        yield chunk
+                        chunk = []
+        if bool(chunk):
+            yield chunk
+
+    def load(self, paths, record_history=False):
+        """ Load the given files, returning the statistics of each stage """
+        stats = { 'bytes' : 0, 'statements' : 0, 'chunks' : 0,
+                  'split' : 0.0, 'parse' : 0.0, 'ingest' : 0.0 }
+        start = perf_counter()
+        chunks = self.chunks(paths, stats)
+        if self.workers == 0:
+            for results, parse_time in self.parse_locally(chunks, stats):
+                self.ingest(results, parse_time, stats, record_history)
+        else:
+            #deferred, as it pulls in multiprocessing:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for results, parse_time in self.parse_in_pool(executor, chunks, stats):
+                    self.ingest(results, parse_time, stats, record_history)
+        stats['total'] = perf_counter() - start
+        return self.report(stats)
+
+    def next_chunk(self, chunks, stats):
+        start = perf_counter()
+        chunk = next(chunks, None)
+        stats['split'] += perf_counter() - start
+        return chunk
+
+    def parse_locally(self, chunks, stats):
+        chunk = self.next_chunk(chunks, stats)
+        while chunk is not None:
+            stats['chunks'] += 1
+            start = process_time()
+            results = parse_statements(chunk)
+            yield results, process_time() - start
+            chunk = self.next_chunk(chunks, stats)
+
+    def parse_in_pool(self, executor, chunks, stats):
+        """ Keep a bounded window of chunks in flight,
+        yielding their decoded results in submission order """
+        window = 2 * (self.workers or os.cpu_count() or 1)
+        in_flight = deque()
+        chunk = self.next_chunk(chunks, stats)
+        while chunk is not None or bool(in_flight):
+            while chunk is not None and len(in_flight) < window:
+                stats['chunks'] += 1
+                in_flight.append(executor.submit(parse_chunk, chunk))
+                chunk = self.next_chunk(chunks, stats)
+            encoded, parse_time = in_flight.popleft().result()
+            start = process_time()
+            results = loads(encoded)
+            #decoding is part of parsing, but in this process
+            yield results, parse_time + process_time() - start
+
+    def ingest(self, results, parse_time, stats, record_history):
+        start = perf_counter()
+        for action in results:
+            self.runtime.act(action, record=record_history)
+        stats['statements'] += len(results)
+        stats['parse'] += parse_time
+        stats['ingest'] += perf_counter() - start
+
+    def report(self, stats):
+        """ Convert the stage timings to throughputs.
+        Split and ingest are wall time in this process,
+        parse is the cpu time summed across workers """
+        report = { 'bytes' : stats['bytes'],
+                   'statements' : stats['statements'],
+                   'chunks' : stats['chunks'],
+                   'seconds' : stats['total'] }
+        for stage in ['split', 'parse', 'ingest']:
+            seconds = stats[stage]
+            report[stage] = {
+                'seconds' : seconds,
+                'statements_per_second' : stats['statements'] / seconds if seconds > 0 else None
+            }
+        logging.info("Bulk load: {}".format(report))
+        return report
@@ -0,0 +1,127 @@
+"""
+Compiled IR caches for EL source files.
+Parsed IR is written next to its source (rules.el -> rules.elc),
+keyed by a digest of the source's content, and read back in place
+of parsing while the source is unchanged.
+
+File layout:
+    header: MAGIC, format version, python major and minor version, sha256 of the source
+    records: marshalled lists of encoded IR, of up to CHUNK_SIZE statements each
+    end: a marshalled None, so truncated files are rejected
+"""
+import logging as root_logger
+import hashlib
+import marshal
+import os
+import sys
+from .ELSerialise import encode, decode, FORMAT_VERSION, MARSHAL_VERSION
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+MAGIC = b'ELC'
+SUFFIX = 'c'
+CHUNK_SIZE = 256
+DIGEST_SIZE = hashlib.sha256().digest_size
+HEADER = MAGIC + bytes([FORMAT_VERSION, sys.version_info[0], sys.version_info[1]])
+
+def compiled_path(path):
+    """ The location of the cache for a source file """
+    return path + SUFFIX
+
+def source_digest(path):
+    """ The sha256 of a source file's content """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.digest()
+
+def read_compiled(path, digest=None):
+    """ Get an iterator of the cached IR for a source file,
+    or None if there is no cache, or it is stale """
+    if digest is None:
+        digest = source_digest(path)
+    target = compiled_path(path)
+    try:
+        with open(target, 'rb') as f:
+            header = f.read(len(HEADER) + DIGEST_SIZE)
+    except OSError:
+        return None
+    if header != HEADER + digest:
+        logging.info("Stale compiled file: {}".format(target))
+        return None
+    return iterate_records(target, header)
+
+def iterate_records(target, header):
+    """ Yield IR from the records of a compiled file """
+    with open(target, 'rb') as f:
+        if f.read(len(header)) != header:
+            raise ELE.ELSerialiseException("Compiled file changed while loading: {}".format(target))
+        while True:
+            try:
+                record = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                raise ELE.ELSerialiseException("Truncated compiled file: {}".format(target))
+            if record is None:
+                return
+            for encoded in record:
+                yield decode(encoded)
+
+
+class ELCompiledWriter:
+    """ Incrementally writes IR for a source file to a temporary file,
+    which replaces the cache only once it is complete """
+
+    def __init__(self, path, digest=None):
+        if digest is None:
+            digest = source_digest(path)
+        self.target = compiled_path(path)
+        self.temp = "{}.{}.tmp".format(self.target, os.getpid())
+        self.buffer = []
+        self.count = 0
+        self.file = open(self.temp, 'wb')
+        self.file.write(HEADER + digest)
+
+    def add(self, ir):
+        self.buffer.append(encode(ir))
+        self.count += 1
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if bool(self.buffer):
+            marshal.dump(self.buffer, self.file, MARSHAL_VERSION)
+            self.buffer = []
+
+    def commit(self):
+        """ Finish the file, and move it into place """
+        self.flush()
+        marshal.dump(None, self.file, MARSHAL_VERSION)
+        self.file.close()
+        os.replace(self.temp, self.target)
+        logging.info("Wrote {} statements to {}".format(self.count, self.target))
+
+    def abort(self):
+        """ Discard the partial file """
+        self.file.close()
+        try:
+            os.remove(self.temp)
+        except OSError:
+            None
+
+
+def compile_file(path, parser):
+    """ Parse a whole source file with the given line parser,
+    (ie: ELParser.ELPARSE_iter), and write its cache.
+    Returns the number of statements """
+    writer = ELCompiledWriter(path)
+    try:
+        with open(path) as f:
+            for ir in parser(f):
+                writer.add(ir)
+    except:
+        writer.abort()
+        raise
+    writer.commit()
+    return writer.count
@@ -0,0 +1,122 @@
+"""
+Binary dumps of a runtime's trie, restored without parsing.
+See ELRuntime.save and ELRuntime.load.
+
+Nodes are written in pre-order, as the position of their parent,
+an id into a table of the trie's distinct values, and their elop.
+On load the table is interned once, and nodes are built directly,
+under a block of reserved node ids, and indexed in allNodes,
+so restoring costs a few assignments per node instead of a parse per fact.
+
+File layout:
+    header: MAGIC, format version, python major and minor version
+    body: marshalled (step, the number of the last change logged, see ELWal,
+    [encoded value], parents :: uint32[nodes] as bytes,
+    value ids :: uint32[nodes] as bytes, elops :: bytes), the root first
+"""
+import logging as root_logger
+import gc
+import marshal
+import os
+import sys
+from array import array
+from .ELSerialise import encode, decode, MARSHAL_VERSION
+from .ELTrie import ELTrie
+from .ELTrieNode import ELTrieNode
+from .ELSymbols import SYMBOLS
+from .ELUtil import EL, ELNodeId, reserve_node_ids
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+MAGIC = b'ELD'
+#Bump when the layout changes
+FORMAT_VERSION = 2
+#marshal is only stable within a python version:
+HEADER = MAGIC + bytes([FORMAT_VERSION, sys.version_info[0], sys.version_info[1]])
+EL_MEMBERS = { x.value : x for x in EL }
+
+def write_dump(trie, path, step=0, logged=0):
+    """ Write a trie, of any engine, to a file, replacing it once complete.
+    Returns the number of nodes written, including the root """
+    values = []
+    #ids :: { (sym, type) : value id }, as equal values of other types share a symbol
+    ids = {}
+    parents = array('I')
+    value_ids = array('I')
+    elops = bytearray()
+    stack = [(trie.root, 0)]
+    while bool(stack):
+        node, parent = stack.pop()
+        value = node.value
+        key = (node.sym, type(value))
+        if key not in ids:
+            ids[key] = len(values)
+            values.append(encode(value))
+        index = len(parents)
+        parents.append(parent)
+        value_ids.append(ids[key])
+        elops.append(node.elop.value)
+        stack.extend([(x, index) for x in reversed(list(node.children.values()))])
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(temp, 'wb') as f:
+            f.write(HEADER)
+            marshal.dump((step, logged, values, parents.tobytes(), value_ids.tobytes(), bytes(elops)),
+                         f, MARSHAL_VERSION)
+            #in place only once it is on disk, as logs are emptied after a checkpoint
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+    except:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    logging.info("Dumped %s nodes and %s values to %s", len(parents), len(values), path)
+    return len(parents)
+
+def read_dump(path):
+    """ Rebuild the trie of a file from write_dump as a new ELTrie.
+    Returns (trie, step, the number of the last change logged) """
+    with open(path, 'rb') as f:
+        if f.read(len(HEADER)) != HEADER:
+            raise ELE.ELSerialiseException("Not a dump for this version: {}".format(path))
+        try:
+            step, logged, values, parent_data, value_data, elops = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            raise ELE.ELSerialiseException("Truncated dump: {}".format(path))
+    parents = array('I')
+    parents.frombytes(parent_data)
+    value_ids = array('I')
+    value_ids.frombytes(value_data)
+    #value, sym pairs, interned once
+    canonical = [SYMBOLS.canonical(decode(x)) for x in values]
+    members = [EL_MEMBERS.get(x) for x in range(max(EL_MEMBERS) + 1)]
+
+    trie = ELTrie()
+    root = trie.root
+    root.elop = members[elops[0]]
+    nodes = [root]
+    append = nodes.append
+    new_node = object.__new__
+    base = reserve_node_ids(len(parents) - 1) - 1
+    #nothing built here is garbage, so don't let collections walk it as it grows
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(1, len(parents)):
+            node = new_node(ELTrieNode)
+            node.uuid = ELNodeId(base + i)
+            node.elop = members[elops[i]]
+            node.value, node.sym = canonical[value_ids[i]]
+            parent = nodes[parents[i]]
+            node.parent = parent
+            node.children = {}
+            parent.children[node.sym] = node
+            append(node)
+        trie.allNodes.update([(x.uuid, x) for x in nodes])
+    finally:
+        if collecting:
+            gc.enable()
+    logging.info("Loaded %s nodes from %s", len(nodes), path)
+    return (trie, step, logged)
@@ -29,3 +29,7 @@ class ELRuleException(ELException):
 class ELNotImplementedException(ELException):
     """ Raised when a not-implemented feature is called """
     None
+
+class ELSerialiseException(ELException):
+    """ Raised when IR can't be encoded to, or decoded from, its binary form """
+    None
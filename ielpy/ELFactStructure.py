@@ -1,11 +1,9 @@
 """
 The ways ELStructure components can be assembled into facts
 """
-import IPython
 import logging as root_logger
-from uuid import UUID
 from .ELFunctions import ELCOMP, ELARITH, get_EL_FUNC
-from .ELUtil import EL, ELVARSCOPE, EL_ARITH_2_STR, EL_COMP_2_STR
+from .ELUtil import EL, ELVARSCOPE, EL_ARITH_2_STR, EL_COMP_2_STR, ELNodeId
 from .ELBinding import ELBindingSlice 
 from .ELStructure import ELSTRUCTURE, ELPAIR, ELROOT, ELVAR, ELQUERY
 from . import ELExceptions as ELE
@@ -328,7 +326,7 @@ class ELARITH_FACT(ELExpandable):
     Essentially a wrapper to house a fact, an operation, and a value to apply
     """
     def __init__(self, data=None, op=None, val=None):
-        if not (isinstance(data, ELFACT) or isinstance(data, ELVAR) or isinstance(data, UUID)):
+        if not (isinstance(data, ELFACT) or isinstance(data, ELVAR) or isinstance(data, ELNodeId)):
             raise ELE.ELConsistencyException('All Arith facts need a fact or variable as a base')
         if not isinstance(op, ELARITH):
             raise ELE.ELConsistencyException('Arith Fact missing an operator')
@@ -384,14 +382,16 @@ class ELARITH_FACT(ELExpandable):
         forallbindings = [x.scope is ELVARSCOPE.FORALL for x in self.bindings]
         return any(forallbindings)
 
-    def apply(self, node):
-        """ An encapuslated way to perform an arithmetic action, just add a target """
+    def apply(self, node, trie=None):
+        """ An encapuslated way to perform an arithmetic action, just add a target.
+        Given the node's trie, the update goes through it, so its indexes follow """
         func = get_EL_FUNC(self.op, comp=False)
         new_value = func(node.value, self.val)
-        #update the parent:
-        del node.parent[node]
-        node.value = new_value
-        node.parent[node] = node
+        #update the node, and its key in the parent:
+        if trie is not None:
+            trie.update_value(node, new_value)
+        else:
+            node.update_value(new_value)
 
     def bind(self, binding_slice, all_sub_slice=None):
         #returns a new bound ELARITH_FACT that has been bound
@@ -0,0 +1,208 @@
+"""
+A Hand written tokenizer and recursive descent parser for the
+common subset of EL: plain assertions, retractions and queries.
+ie: .a.b!c.5 , ~.a."string".d , .a.$x.b?
+
+Produces the same IR as the pyparsing grammar in ELParser,
+and gives up (returning None) on anything outside the subset,
+so ELPARSE can fall back to the full grammar.
+Rules, comparisons, arrays, arithmetic, bindings, path variables
+and regex actions all fall back.
+"""
+import logging as root_logger
+import re
+from fractions import Fraction
+from .ELUtil import EL, ELVARSCOPE
+from .ELStructure import ELVAR, ELPAIR, ELROOT
+from .ELFactStructure import ELFACT
+
+logging = root_logger.getLogger(__name__)
+
+##############################
+# Tokens
+####################
+NAME_RE     = re.compile(r'[a-zA-Z]+')
+VARNAME_RE  = re.compile(r'[a-zA-Z0-9]+')
+#the maximal munch of the grammar's NUM word, then the forms it can become:
+NUM_RE      = re.compile(r'[0-9_d/-]+')
+INT_RE      = re.compile(r'-?[0-9][0-9_]*$')
+FLOAT_RE    = re.compile(r'-?[0-9][0-9_]*d[0-9][0-9_]*$')
+FRACTION_RE = re.compile(r'-?[0-9]+/[0-9]+$')
+STRING_RE   = re.compile(r'"[^"\\\n\r\t]*"')
+
+ELOPS       = {'.' : EL.DOT, '!' : EL.EX}
+VARSCOPES   = {'$' : ELVARSCOPE.EXIS, '@' : ELVARSCOPE.FORALL}
+#characters that may legally follow a terminal element:
+TERMINAL_END = ' \t\n,#?'
+#characters that may follow a variable, where the empty string is the end:
+VAR_END = ('.', '!', '?', ',', '')
+
+
+class ELFallback(Exception):
+    """ Internal signal that the input is outside the fast subset """
+    None
+
+
+##############################
+# Parser
+####################
+class ELFastParser:
+    """ Recursive descent over a single source string """
+
+    def __init__(self, string):
+        self.string = string
+        self.loc = 0
+        self.end = len(string)
+
+    def peek(self):
+        if self.loc < self.end:
+            return self.string[self.loc]
+        return None
+
+    def parse(self):
+        """ source := (statement separator)+ """
+        results = []
+        comma = False
+        self.skip_blank()
+        while self.loc < self.end:
+            results.append(self.statement())
+            comma = self.separator()
+            after = self.loc
+            self.skip_blank()
+        if not bool(results):
+            raise ELFallback()
+        if comma and '#' in self.string[after:]:
+            #the grammar rejects a trailing comma followed only by comments
+            raise ELFallback()
+        return results
+
+    def skip_blank(self):
+        """ Skip whitespace, newlines, and comments between statements """
+        while self.loc < self.end:
+            char = self.string[self.loc]
+            if char in ' \t\n':
+                self.loc += 1
+            elif char == '#':
+                self.skip_comment()
+            else:
+                return
+
+    def skip_comment(self):
+        newline = self.string.find('\n', self.loc)
+        self.loc = self.end if newline == -1 else newline
+
+    def separator(self):
+        """ separator := [ \t]* comment? ( ',' | newline | end )
+        Returns whether the separator was a comma """
+        while self.peek() in (' ', '\t'):
+            self.loc += 1
+        char = self.peek()
+        if char == '#':
+            self.skip_comment()
+            char = self.peek()
+        if char is None:
+            return False
+        if char == '\n':
+            self.loc += 1
+            return False
+        elif char == ',' and self.string[self.loc + 1:self.loc + 2] != '.':
+            #the grammar's comma is a keyword that can't touch a following dot
+            self.loc += 1
+            return True
+        else:
+            raise ELFallback()
+
+    def statement(self):
+        """ statement := '~'? '.' (element elop)* element '?'? """
+        negated = False
+        if self.peek() == '~':
+            negated = True
+            self.loc += 1
+        if self.peek() != '.':
+            raise ELFallback()
+        self.loc += 1
+
+        new_fact = ELFACT(negated=negated)
+        new_fact.insert(ELROOT(EL.DOT))
+        while True:
+            value = self.element()
+            char = self.peek()
+            if char is not None and char in ELOPS:
+                self.loc += 1
+                new_fact.insert(ELPAIR(value, ELOPS[char]))
+            elif char is None or char in TERMINAL_END:
+                new_fact.pair(value)
+                break
+            else:
+                raise ELFallback()
+
+        if self.peek() == '?':
+            self.loc += 1
+            return new_fact.query()
+        return new_fact
+
+    def element(self):
+        """ element := var | name | string | num """
+        char = self.peek()
+        if char is None:
+            raise ELFallback()
+        if char in VARSCOPES:
+            return self.var()
+        match = NAME_RE.match(self.string, self.loc)
+        if match is not None:
+            self.loc = match.end()
+            return match.group()
+        if char == '"':
+            return self.quoted()
+        return self.num()
+
+    def var(self):
+        scope = VARSCOPES[self.string[self.loc]]
+        match = VARNAME_RE.match(self.string, self.loc + 1)
+        if match is None:
+            #path variables fall back
+            raise ELFallback()
+        following = self.string[match.end():match.end() + 1]
+        if following not in VAR_END:
+            #The grammar's variables swallow trailing whitespace, newlines
+            #and comments, which can join lines into one fact. As can array access.
+            raise ELFallback()
+        self.loc = match.end()
+        return ELVAR(match.group(), None, False, scope)
+
+    def quoted(self):
+        match = STRING_RE.match(self.string, self.loc)
+        if match is None:
+            raise ELFallback()
+        self.loc = match.end()
+        return match.group()[1:-1]
+
+    def num(self):
+        match = NUM_RE.match(self.string, self.loc)
+        if match is None:
+            raise ELFallback()
+        token = match.group()
+        underscore_removed = token.replace('_', '')
+        if INT_RE.match(token):
+            value = int(underscore_removed)
+        elif FLOAT_RE.match(token):
+            value = float(underscore_removed.replace('d', '.'))
+        elif FRACTION_RE.match(token):
+            value = Fraction(underscore_removed)
+        else:
+            raise ELFallback()
+        self.loc = match.end()
+        return value
+
+
+##############################
+# MAIN PARSER FUNCTION:
+####################
+def ELFASTPARSE(string):
+    """ Parse a string in the fast subset, returning a list of IR,
+    or None if the full grammar is needed """
+    try:
+        return ELFastParser(string).parse()
+    except ELFallback:
+        logging.debug("Fast parse fallback: %s", string[:40])
+        return None
@@ -0,0 +1,290 @@
+"""
+Evaluation of a query over a frame of binding slices,
+without binding the query to each slice and walking the trie for each.
+
+ELJoin matches the query once with all its variables free, giving a table of rows,
+which is hash joined with the slices on the variables they share.
+ELFactoredProbe walks the query's ground prefix once, and the rest of
+the query once for each distinct set of values the slices bind.
+
+Results are the same, in the same order, as querying per slice:
+a bound variable is a concrete pair, so its row's node must have the
+same symbol, and, if it isn't the last pair, the same elop.
+Queries the join can't express (root variables, path variables,
+array access, repeated variables, forall scopes) are left to probing,
+as are queries whose free match would cost more than probing each slice.
+"""
+import logging as root_logger
+from .ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
+from .ELStructure import ELPAIR, ELQUERY
+from .ELResults import ELSuccess, ELFail
+from .ELSymbols import SYMBOLS
+from .ELUtil import ELVARSCOPE
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+#frames smaller than this are always probed
+MIN_JOIN_SLICES = 2
+#trie steps a join may take per slice per pair before probing is cheaper,
+#as a probe also has to copy and bind the query
+PROBE_COST = 8
+#marks a variable a slice leaves unbound, in the keys of ELFactoredProbe
+FREE = object()
+
+
+class ELJoin:
+    """ A query prepared for joining against binding frames """
+
+    def __init__(self, trie, query):
+        assert isinstance(query[-1], ELQUERY)
+        self.trie = trie
+        self.query = query
+        self.pattern = query.data[1:-1]
+        #var_positions :: [(var name, index into the pattern)]
+        self.var_positions = []
+        self.joinable = self.analyse()
+
+    def analyse(self):
+        """ Check the query only uses what the join can express """
+        if self.query[0].isVar() or self.query.hasForAllBinding():
+            return False
+        names = set()
+        for i, pair in enumerate(self.pattern):
+            if not isinstance(pair, ELPAIR):
+                return False
+            if not pair.isVar():
+                continue
+            var = pair.value
+            if var.is_path_var or var.access_point is not None \
+               or var.scope is not ELVARSCOPE.EXIS or var.value in names:
+                return False
+            names.add(var.value)
+            self.var_positions.append((var.value, i))
+        return True
+
+    def results(self, frame):
+        """ Get the result of the query for each slice of the frame,
+        as ELTrie.query would give for the query bound to that slice.
+        Returns None if the frame should be probed instead """
+        if not self.joinable or len(frame) < MIN_JOIN_SLICES:
+            return None
+        rows = self.rows(len(frame) * (len(self.pattern) + 1) * PROBE_COST)
+        if rows is None:
+            logging.debug("Probing instead of joining: {}".format(self.query))
+            return None
+        indices = {}
+        results = []
+        for binding_slice in frame:
+            #which variables the slice binds, as a tuple of flags by position
+            bound = tuple([name in binding_slice for name, i in self.var_positions])
+            if bound not in indices:
+                bound_names = [name for (name, i), is_bound in zip(self.var_positions, bound) if is_bound]
+                free = [(j, name) for j, ((name, i), is_bound)
+                        in enumerate(zip(self.var_positions, bound)) if not is_bound]
+                indices[bound] = (self.index(rows, bound), bound_names, free)
+            index, bound_names, free = indices[bound]
+            key = tuple([SYMBOLS.lookup(binding_slice[name].value) for name in bound_names])
+            results.append(self.result(binding_slice, free, index.get(key, [])))
+        return results
+
+    def rows(self, limit):
+        """ Match the pattern with every variable free, in depth first order,
+        as [(nodes at the variables, final node)].
+        Returns None if matching takes more than limit steps """
+        pattern = self.pattern
+        length = len(pattern)
+        rows = []
+        steps = 0
+        stack = [(self.trie.root, 0, ())]
+        while bool(stack):
+            current, index, chosen = stack.pop()
+            while index < length:
+                steps += 1
+                if steps > limit:
+                    return None
+                pair = pattern[index]
+                index += 1
+                if pair.isVar():
+                    children = list(current.children.values())
+                    steps += len(children)
+                    for child in reversed(children):
+                        stack.append((child, index, chosen + (child,)))
+                    current = None
+                    break
+                child = current.children.get(pair.sym)
+                if child is None or (index < length and pair.elop != child.elop):
+                    current = None
+                    break
+                current = child
+            if current is not None:
+                rows.append((chosen, current))
+        return rows
+
+    def index(self, rows, bound):
+        """ Hash the rows on the symbols of their bound variables,
+        keeping only rows that match the elops the bound pairs would need """
+        last = len(self.pattern) - 1
+        checks = [(j, self.pattern[i].elop) for j, ((name, i), is_bound)
+                  in enumerate(zip(self.var_positions, bound)) if is_bound and i != last]
+        positions = [j for j, is_bound in enumerate(bound) if is_bound]
+        index = {}
+        for row in rows:
+            chosen = row[0]
+            for j, elop in checks:
+                if chosen[j].elop != elop:
+                    break
+            else:
+                key = tuple([chosen[j].sym for j in positions])
+                index.setdefault(key, []).append(row)
+        return index
+
+    def result(self, binding_slice, free, matches):
+        """ The result for a slice, from its joined rows,
+        binding the free variables, as [(position among the variables, name)] """
+        base_bindings = ELBindingSlice(self.query.filled_bindings)
+        base_bindings.update(binding_slice)
+        if self.query.negated:
+            if bool(matches):
+                return ELFail()
+            return ELSuccess(path=self.query,
+                             bindings=ELBindingFrame([base_bindings]),
+                             nodes=None)
+        if not bool(matches):
+            return ELFail()
+        slices = []
+        for chosen, node in matches:
+            match = ELBindingSlice(base_bindings, node.uuid)
+            for j, name in free:
+                match[name] = ELBindingEntry(name, chosen[j].uuid, chosen[j].value)
+            slices.append(match)
+        return ELSuccess(path=self.query,
+                         bindings=ELBindingFrame(slices),
+                         nodes=[x.uuid for x in slices])
+
+
+class ELFactoredProbe:
+    """ A query probed once per distinct binding of its variables,
+    from the end of its ground prefix. Results are the same, in the same order,
+    as querying the query bound to each slice """
+
+    def __init__(self, trie, query):
+        assert isinstance(query[-1], ELQUERY)
+        self.trie = trie
+        self.query = query
+        self.pattern = query.data[1:-1]
+        self.root_var = None
+        if query[0].isVar():
+            self.root_var = query[0].value
+        #var_positions :: [index into the pattern]
+        self.var_positions = [i for i, pair in enumerate(self.pattern)
+                              if isinstance(pair, ELPAIR) and pair.isVar()]
+        #the ground prefix ends at the first variable
+        self.prefix_length = len(self.pattern)
+        if bool(self.var_positions):
+            self.prefix_length = self.var_positions[0]
+        if (bool(trie.indexes) or trie.path_index is not None) and self.root_var is None:
+            #match from the root, where the trie's indexes apply
+            self.prefix_length = 0
+        self.usable = not query.hasForAllBinding() and \
+            all([isinstance(x, ELPAIR) for x in self.pattern])
+
+    def results(self, frame):
+        """ Get the result of the query for each slice of the frame,
+        or None if the query has to be bound to each slice """
+        if not self.usable:
+            return None
+        prefixes = {}
+        matches = {}
+        results = []
+        for binding_slice in frame:
+            key = self.key(binding_slice)
+            try:
+                if key is not None and key not in matches:
+                    matches[key] = self.match(key, prefixes)
+            except TypeError:
+                key = None
+            if key is None:
+                #unhashable values, or an unbound root, are probed alone
+                results.append(self.trie.query(self.query.bind(binding_slice)))
+                continue
+            results.append(self.result(binding_slice, matches[key]))
+        return results
+
+    def key(self, binding_slice):
+        """ The root and values a slice substitutes into the query,
+        or None if its root is unbound """
+        root = None
+        if self.root_var is not None:
+            if self.root_var.value not in binding_slice:
+                return None
+            root = self.root_var.get_val(binding_slice)
+        values = []
+        for i in self.var_positions:
+            var = self.pattern[i].value
+            if var.value in binding_slice:
+                values.append(var.get_val(binding_slice))
+            else:
+                values.append(FREE)
+        return (root, tuple(values))
+
+    def match(self, key, prefixes):
+        """ Walk the query for a key, returning [(node uuid, [(var, node uuid, value)])],
+        or None if it doesn't match """
+        root, values = key
+        if root not in prefixes:
+            prefixes[root] = self.walk_prefix(root)
+        current = prefixes[root]
+        if current is None:
+            return None
+        suffix = self.pattern[self.prefix_length:]
+        if any([x is not FREE for x in values]):
+            suffix = suffix[:]
+            for i, value in zip(self.var_positions, values):
+                if value is not FREE:
+                    suffix[i - self.prefix_length] = ELPAIR(value, self.pattern[i].elop)
+        found = self.trie.sub_get(current, suffix)
+        if isinstance(found[0], ELFail):
+            return None
+        first_keys = found[0].keys()
+        if not all([first_keys == x.keys() for x in found]):
+            return None
+        return [(x.uuid, [(k, v.uuid, v.value) for k, v in x.items()]) for x in found]
+
+    def walk_prefix(self, root):
+        """ Get the node at the end of the ground prefix, or None """
+        if root is None:
+            current = self.trie.root
+        elif root in self.trie.allNodes:
+            current = self.trie.allNodes[root]
+        else:
+            raise ELE.ELRuleException('Root Value not found in allnodes')
+        last = len(self.pattern) - 1
+        for i, pair in enumerate(self.pattern[:self.prefix_length]):
+            child = current.children.get(pair.sym)
+            if child is None or (i < last and pair.elop != child.elop):
+                return None
+            current = child
+        return current
+
+    def result(self, binding_slice, matches):
+        """ The result for a slice, from the matches of its key """
+        base_bindings = ELBindingSlice(self.query.filled_bindings)
+        base_bindings.update(binding_slice)
+        if self.query.negated:
+            if matches is not None:
+                return ELFail()
+            return ELSuccess(path=self.query,
+                             bindings=ELBindingFrame([base_bindings]),
+                             nodes=None)
+        if matches is None:
+            return ELFail()
+        slices = []
+        for uuid, entries in matches:
+            match = ELBindingSlice(base_bindings, uuid)
+            for name, node_uuid, value in entries:
+                match[name] = ELBindingEntry(name, node_uuid, value)
+            slices.append(match)
+        return ELSuccess(path=self.query,
+                         bindings=ELBindingFrame(slices),
+                         nodes=[x.uuid for x in slices])
@@ -0,0 +1,485 @@
+"""
+A read only trie in a file, used in place through mmap,
+for large fact bases that don't change after they are loaded.
+Write one with ELTrie.freeze(path), open it with ELTrie.open_frozen(path).
+
+Nodes are laid out breadth first, so the children of a node are a contiguous
+range of positions, and the tree is held as the first child position of each
+node, as in a LOUDS encoding, with parents found by bisecting those ranges.
+Each node is a value id, into a table of the trie's distinct values,
+and an elop. Each child range also has an order sorted by value id,
+so a child is found by bisecting it, while iteration keeps insertion order.
+Values are found in the table through an open addressed hash of their encoding.
+
+The file is: a header, then sections of
+    first :: uint32[nodes + 1], the position of each node's first child
+    order :: uint32[nodes - 1], each child range sorted by value id
+    values :: uint32[nodes], the value id of each node
+    elops :: uint8[nodes]
+    leaves :: uint32[nodes], the leaves under each node, for stats
+    table :: uint64[number of values + 1], offsets into the encoded values,
+    which follow, in the order of their encoding
+    slots :: uint32[a power of two], value id + 1 by crc32 of the encoding, or 0
+    stats :: marshalled (nodes, leaves, depths, fanout)
+
+Opening a file reads only its header, and the sections are used as views
+of the mapped pages, which are shared by every process opening the file.
+Nodes are handed out as ELMappedNode views, with node ids from a block
+reserved when the file is opened, so node ids differ between openings.
+"""
+import logging as root_logger
+import marshal
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from zlib import crc32
+from collections.abc import Mapping
+from fractions import Fraction
+from math import isfinite
+from weakref import WeakKeyDictionary
+from .ELTrie import ELTrie
+from .ELTrieNode import ELTrieNode
+from .ELTrieStats import ELTrieStats
+from .ELSymbols import SYMBOLS
+from .ELUtil import EL, ELNodeId, reserve_node_ids
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+MAGIC = b'ELM'
+#Bump when the layout or the value encoding changes
+FORMAT_VERSION = 1
+#magic, version, little endian, nodes, values, hash slots, then the offset of each section
+HEADER = struct.Struct('=3sBB3xQQQ8Q')
+SECTIONS = ['first', 'order', 'values', 'elops', 'leaves', 'table', 'slots', 'stats']
+ALIGNMENT = 8
+EL_MEMBERS = { x.value : x for x in EL }
+NONE = -1
+
+##############################
+# Values
+####################
+def encode_value(value):
+    """ Encode a trie value as bytes, the same for equal values of a type """
+    if value is None:
+        return b'n'
+    elif isinstance(value, bool):
+        return b't' if value else b'f'
+    elif isinstance(value, int):
+        return b'i' + str(int(value)).encode()
+    elif isinstance(value, float):
+        return b'd' + struct.pack('<d', value)
+    elif isinstance(value, Fraction):
+        return b'q' + "{}/{}".format(value.numerator, value.denominator).encode()
+    elif isinstance(value, str):
+        return b's' + value.encode('utf-8', 'surrogatepass')
+    raise ELE.ELTrieException("Can't freeze a value of type: {}".format(type(value)))
+
+def decode_value(data):
+    tag, body = data[:1], data[1:]
+    if tag == b's':
+        return str(body, 'utf-8', 'surrogatepass')
+    elif tag == b'i':
+        return int(body)
+    elif tag == b'd':
+        return struct.unpack('<d', body)[0]
+    elif tag == b'q':
+        return Fraction(str(body, 'ascii'))
+    elif tag == b'n':
+        return None
+    return tag == b't'
+
+def equivalents(value):
+    """ The values of other types equal to a value, which share its symbol,
+    such as 1, 1.0 and True """
+    if value is None or isinstance(value, str):
+        return [value]
+    found = [value]
+    try:
+        alternatives = [float(value)]
+    except OverflowError:
+        alternatives = []
+    if isinstance(value, int) or isfinite(value):
+        alternatives.append(Fraction(value))
+        if value == int(value):
+            alternatives.append(int(value))
+    if value in (0, 1):
+        alternatives.append(bool(value))
+    for alternative in alternatives:
+        if alternative == value and all([type(x) is not type(alternative) for x in found]):
+            found.append(alternative)
+    return found
+
+##############################
+# Writing
+####################
+def write_mapped(trie, path):
+    """ Write a trie, or a snapshot of one, to a file to open as an ELMappedTrie.
+    Returns the number of nodes written, including the root """
+    nodes = [trie.root]
+    depths = [0]
+    first = array('I', [1])
+    for node in nodes:
+        children = list(node.children.values())
+        nodes.extend(children)
+        depths.extend([depths[len(first) - 1] + 1] * len(children))
+        first.append(first[-1] + len(children))
+    encoded = [encode_value(x.value) for x in nodes]
+    table = sorted(set(encoded))
+    ids = { x : i for i, x in enumerate(table) }
+    values = array('I', [ids[x] for x in encoded])
+    order = array('I', [0])
+    for i in range(len(nodes)):
+        order.extend(sorted(range(first[i], first[i + 1]), key=values.__getitem__))
+    elops = bytes([x.elop.value for x in nodes])
+    #leaves under each node, counted from the last node back
+    leaves = array('I', [0]) * len(nodes)
+    for i in reversed(range(len(nodes))):
+        if first[i] == first[i + 1]:
+            leaves[i] = 1
+        else:
+            leaves[i] = sum(leaves[first[i]:first[i + 1]])
+    depth_counts = [0] * (max(depths) + 1)
+    for depth in depths:
+        depth_counts[depth] += 1
+    fanout = {}
+    for i in range(len(nodes)):
+        size = first[i + 1] - first[i]
+        fanout[size] = fanout.get(size, 0) + 1
+    leaf_count = sum([1 for i in range(1, len(nodes)) if first[i] == first[i + 1]])
+    offsets = array('Q', [0])
+    for data in table:
+        offsets.append(offsets[-1] + len(data))
+    slots = array('I', [0]) * hash_size(len(table))
+    for i, data in enumerate(table):
+        slot = crc32(data) & (len(slots) - 1)
+        while slots[slot] != 0:
+            slot = (slot + 1) & (len(slots) - 1)
+        slots[slot] = i + 1
+    stats = marshal.dumps((len(nodes) - 1, leaf_count, depth_counts, fanout))
+    sections = [first.tobytes(), order[1:].tobytes(), values.tobytes(), elops,
+                leaves.tobytes(), offsets.tobytes() + b''.join(table), slots.tobytes(), stats]
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        position = aligned(position)
+        positions.append(position)
+        position += len(section)
+    #written beside the file then moved over it, as open frozen tries may map the file,
+    #and truncating it under them would change, or unmap, what they read
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(temp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, sys.byteorder == 'little',
+                                len(nodes), len(table), len(slots), *positions))
+            for section, position in zip(sections, positions):
+                f.write(bytes(position - f.tell()))
+                f.write(section)
+        os.replace(temp, path)
+    except:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    logging.info("Froze %s nodes and %s values to %s", len(nodes), len(table), path)
+    return len(nodes)
+
+def hash_size(values):
+    """ The number of hash slots for a table, at most half full """
+    size = 1
+    while size < 2 * values:
+        size *= 2
+    return size
+
+def aligned(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+##############################
+# Reading
+####################
+class ELMappedTrie(ELTrie):
+    """ A read only ELTrie over a file written by ELTrie.freeze """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self.map)
+        if header[0] != MAGIC:
+            self.close()
+            raise ELE.ELTrieException("Not a frozen trie: {}".format(path))
+        if header[1] != FORMAT_VERSION or header[2] != (sys.byteorder == 'little'):
+            self.close()
+            raise ELE.ELTrieException("Frozen trie is from another version or platform: {}".format(path))
+        self.size, self.value_count, slot_count = header[3:6]
+        positions = dict(zip(SECTIONS, header[6:]))
+        self.data = data = memoryview(self.map)
+        self.first = data[positions['first']:positions['first'] + 4 * (self.size + 1)].cast('I')
+        self.order = data[positions['order']:positions['order'] + 4 * (self.size - 1)].cast('I')
+        self.values = data[positions['values']:positions['values'] + 4 * self.size].cast('I')
+        self.elops = data[positions['elops']:positions['elops'] + self.size]
+        self.leaf_counts = data[positions['leaves']:positions['leaves'] + 4 * self.size].cast('I')
+        table_end = positions['table'] + 8 * (self.value_count + 1)
+        self.offsets = data[positions['table']:table_end].cast('Q')
+        self.table = data[table_end:positions['slots']]
+        self.slots = data[positions['slots']:positions['slots'] + 4 * slot_count].cast('I')
+        #decoded :: { value id : value }, ids :: { sym : value id, or NONE },
+        #weakly keyed, so symbols queried for aren't kept alive
+        self.decoded = {}
+        self.ids = WeakKeyDictionary()
+        self.base = reserve_node_ids(self.size)
+        super().__init__()
+        #stats are written with the trie, so are read rather than counted
+        self.kept_stats = stats = ELTrieStats(self)
+        (stats.nodes, stats.leaves,
+         stats.depths, stats.fanout) = marshal.loads(data[positions['stats']:])
+        stats.under = ELMappedLeaves(self)
+
+    def build_root(self):
+        self.root = ELMappedNode(self, 0)
+        self.allNodes = ELMappedNodes(self)
+
+    def __repr__(self):
+        return "Frozen trie {}: {}".format(self.path, self.root)
+
+    def __len__(self):
+        return self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Unmap the file. Nodes of the trie mustn't be used after """
+        for name in ['first', 'order', 'values', 'elops', 'leaf_counts', 'offsets', 'table', 'slots', 'data']:
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self.map.close()
+
+    def encoded(self, value_id):
+        return self.table[self.offsets[value_id]:self.offsets[value_id + 1]]
+
+    def value_of(self, index):
+        value_id = self.values[index]
+        if value_id not in self.decoded:
+            self.decoded[value_id] = decode_value(bytes(self.encoded(value_id)))
+        return self.decoded[value_id]
+
+    def value_id(self, sym):
+        """ The id of a symbol's value in the table, or NONE """
+        found = self.ids.get(sym)
+        if found is None:
+            value = sym.value
+            found = self.lookup(value)
+            if found == NONE:
+                for alternative in equivalents(value)[1:]:
+                    found = self.lookup(alternative)
+                    if found != NONE:
+                        break
+            self.ids[sym] = found
+        return found
+
+    def lookup(self, value):
+        """ The id of a value in the table, or NONE """
+        try:
+            data = encode_value(value)
+        except ELE.ELTrieException:
+            return NONE
+        mask = len(self.slots) - 1
+        slot = crc32(data) & mask
+        while self.slots[slot] != 0:
+            if self.encoded(self.slots[slot] - 1) == data:
+                return self.slots[slot] - 1
+            slot = (slot + 1) & mask
+        return NONE
+
+    def child(self, index, sym):
+        """ The position of a node's child by symbol, or None """
+        if sym is None:
+            return None
+        value_id = self.value_id(sym)
+        if value_id == NONE:
+            return None
+        start, end = self.first[index], self.first[index + 1]
+        i = bisect_left(self.order, value_id, start - 1, end - 1, key=self.values.__getitem__)
+        if i < end - 1 and self.values[self.order[i]] == value_id:
+            return self.order[i]
+        return None
+
+    def parent_of(self, index):
+        if index == 0:
+            return None
+        return bisect_right(self.first, index) - 1
+
+    def node_id(self, index):
+        return ELNodeId(self.base + index)
+
+    def index_of(self, node_id):
+        """ The position of a node by id, or None """
+        if isinstance(node_id, int) and 0 <= node_id - self.base < self.size:
+            return node_id - self.base
+        return None
+
+    def immutable(self, *args, **kwargs):
+        raise ELE.ELConsistencyException("Frozen tries can't be changed")
+
+    push = pop = push_many = add_node = new_node = attach = immutable
+    set_elop = remove_node = update_value = detach = release = immutable
+    add_index = add_path_index = compact = enable_timeline = immutable
+
+
+class ELMappedNode(ELTrieNode):
+    """ A view of a node of an ELMappedTrie, behaving as an ELTrieNode """
+    __slots__ = ['trie', 'index']
+
+    def __init__(self, trie, index):
+        self.trie = trie
+        self.index = index
+
+    @property
+    def uuid(self):
+        return self.trie.node_id(self.index)
+
+    @property
+    def elop(self):
+        return EL_MEMBERS[self.trie.elops[self.index]]
+
+    @property
+    def value(self):
+        return self.trie.value_of(self.index)
+
+    @property
+    def sym(self):
+        return SYMBOLS.canonical(self.value)[1]
+
+    @property
+    def parent(self):
+        parent = self.trie.parent_of(self.index)
+        if parent is None:
+            return None
+        return ELMappedNode(self.trie, parent)
+
+    @property
+    def children(self):
+        return ELMappedChildren(self.trie, self.index)
+
+    def __len__(self):
+        return self.trie.first[self.index + 1] - self.trie.first[self.index]
+
+    def __eq__(self, other):
+        if isinstance(other, ELMappedNode) and other.trie is self.trie:
+            return other.index == self.index
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+    def __getitem__(self, key):
+        index = self.trie.child(self.index, self.key_of(key))
+        if index is None:
+            raise KeyError(key)
+        return ELMappedNode(self.trie, index)
+
+    def __contains__(self, key):
+        return self.trie.child(self.index, self.key_of(key)) is not None
+
+    def __setitem__(self, key, value):
+        self.trie.immutable()
+
+    def __delitem__(self, key):
+        self.trie.immutable()
+
+    def update_value(self, value):
+        self.trie.immutable()
+
+    def update_elop(self, elop):
+        self.trie.immutable()
+
+    def values(self):
+        return self.children.values()
+
+    def is_empty(self):
+        return len(self) == 0
+
+    def __iter__(self):
+        return iter(self.values())
+
+
+class ELMappedChildren(Mapping):
+    """ The children of a frozen node, by symbol """
+
+    def __init__(self, trie, index):
+        self.trie = trie
+        self.index = index
+
+    def __getitem__(self, sym):
+        index = self.trie.child(self.index, sym)
+        if index is None:
+            raise KeyError(sym)
+        return ELMappedNode(self.trie, index)
+
+    def __contains__(self, sym):
+        return self.trie.child(self.index, sym) is not None
+
+    def get(self, sym, default=None):
+        index = self.trie.child(self.index, sym)
+        if index is None:
+            return default
+        return ELMappedNode(self.trie, index)
+
+    def __iter__(self):
+        return iter([x.sym for x in self.values()])
+
+    def __len__(self):
+        return self.trie.first[self.index + 1] - self.trie.first[self.index]
+
+    def values(self):
+        return [ELMappedNode(self.trie, x)
+                for x in range(self.trie.first[self.index], self.trie.first[self.index + 1])]
+
+
+class ELMappedNodes(Mapping):
+    """ The allNodes index of an ELMappedTrie, computed from node ids """
+
+    def __init__(self, trie):
+        self.trie = trie
+
+    def __getitem__(self, node_id):
+        index = self.trie.index_of(node_id)
+        if index is None:
+            raise KeyError(node_id)
+        return ELMappedNode(self.trie, index)
+
+    def __contains__(self, node_id):
+        return self.trie.index_of(node_id) is not None
+
+    def __iter__(self):
+        return (self.trie.node_id(x) for x in range(self.trie.size))
+
+    def __len__(self):
+        return self.trie.size
+
+
+class ELMappedLeaves(Mapping):
+    """ The leaves under each internal node of an ELMappedTrie, as ELTrieStats.under """
+
+    def __init__(self, trie):
+        self.trie = trie
+
+    def __getitem__(self, node_id):
+        index = self.trie.index_of(node_id)
+        if index is None or self.trie.first[index] == self.trie.first[index + 1]:
+            raise KeyError(node_id)
+        return self.trie.leaf_counts[index]
+
+    def __iter__(self):
+        trie = self.trie
+        return (trie.node_id(x) for x in range(trie.size) if trie.first[x] != trie.first[x + 1])
+
+    def __len__(self):
+        return sum([1 for x in self])
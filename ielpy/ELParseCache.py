@@ -0,0 +1,93 @@
+"""
+A Bounded LRU cache in front of the parser,
+so repeated statements skip the grammar entirely.
+Statements the fast parser accepts are parsed afresh instead of cached,
+as that is cheaper than copying the cached IR.
+"""
+import logging as root_logger
+from collections import OrderedDict
+from copy import deepcopy
+
+logging = root_logger.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+
+class ELParseCache:
+    """ Wraps a parse function (ie: ELPARSE), keyed on the source string.
+    Entries are stored privately and handed out as deep copies,
+    so binding, expanding or mutating a returned IR can't corrupt the cache.
+    Parse errors are not cached.
+    fast_func (ie: ELFASTPARSE), if given, is tried before the cache,
+    and returns None for strings parse_func is needed for.
+    """
+
+    def __init__(self, parse_func, maxsize=DEFAULT_CACHE_SIZE, fast_func=None):
+        assert callable(parse_func)
+        assert maxsize is None or maxsize >= 0
+        assert fast_func is None or callable(fast_func)
+        self.parse_func = parse_func
+        self.fast_func = fast_func
+        #maxsize of None is unbounded, 0 disables caching
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        #strings parsed by fast_func, which aren't cached
+        self.fast = 0
+        #entries :: OrderedDict<str, [IR]>, least recently used first
+        self.entries = OrderedDict()
+
+    def __call__(self, string):
+        """ Parse a string, using the cached IR if available """
+        if self.fast_func is not None:
+            results = self.fast_func(string)
+            if results is not None:
+                self.fast += 1
+                return results
+        if string in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(string)
+            return deepcopy(self.entries[string])
+
+        self.misses += 1
+        results = self.parse_func(string)
+        if self.maxsize == 0:
+            return results
+        #store a private copy, the caller gets the original
+        self.entries[string] = deepcopy(results)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            evicted, _ = self.entries.popitem(last=False)
+            self.evictions += 1
+            logging.debug("Evicted from parse cache: %s", evicted)
+        return results
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, string):
+        return string in self.entries
+
+    def __repr__(self):
+        return "(ELParseCache: {}/{} , hits: {}, misses: {})".format(len(self),
+                                                                  self.maxsize,
+                                                                  self.hits,
+                                                                  self.misses)
+
+    def clear(self):
+        """ Empty the cache and reset the counters """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fast = 0
+
+    def stats(self):
+        """ Get the counters of the cache """
+        return {
+            'hits'      : self.hits,
+            'misses'    : self.misses,
+            'evictions' : self.evictions,
+            'fast'      : self.fast,
+            'size'      : len(self.entries),
+            'maxsize'   : self.maxsize
+        }
@@ -0,0 +1,88 @@
+"""
+Prepared statements: queries parsed once, and run many times
+with different pre-bound variables
+"""
+import logging as root_logger
+from .ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
+from .ELStructure import ELPAIR, ELQUERY
+from .ELFactStructure import ELFACT
+from .ELResults import ELSuccess, ELFail
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+class ELPreparedStatement:
+    """ A query resolved into its pair sequence and variable positions.
+    Running it substitutes the supplied values into those positions
+    and walks the trie, without re-parsing or going through ELFACT.bind:
+    rt.prepare(".agents.$a.energy.$e?").run(a="bob")
+    """
+
+    def __init__(self, runtime, query):
+        if not (isinstance(query, ELFACT) and isinstance(query[-1], ELQUERY)):
+            raise ELE.ELConsistencyException("Only queries can be prepared: {}".format(query))
+        #the runtime, not its trie, as the trie can be replaced after preparing
+        self.runtime = runtime
+        self.query = query
+        self.negated = query.negated
+        self.root_var = None
+        if query[0].isVar():
+            self.root_var = query[0].value.value
+        #the pairs between the root and the query terminal
+        self.pairs = query.data[1:-1]
+        #var_positions :: { var name : [indices into self.pairs] }
+        self.var_positions = {}
+        for i, pair in enumerate(self.pairs):
+            if isinstance(pair, ELPAIR) and pair.isVar():
+                self.var_positions.setdefault(pair.value.value, []).append(i)
+
+    def variables(self):
+        """ The names of the variables that can be pre-bound """
+        names = list(self.var_positions.keys())
+        if self.root_var is not None:
+            names.insert(0, self.root_var)
+        return names
+
+    def run(self, **kwargs):
+        """ Run the statement, binding variables by keyword.
+        A root variable is bound to a node id.
+        Returns ELSuccess | ELFail, as ELTrie.query would
+        """
+        unknown = [x for x in kwargs if x not in self.var_positions and x != self.root_var]
+        if bool(unknown):
+            raise ELE.ELConsistencyException("Unknown variables for prepared statement: {}".format(unknown))
+        binding_slice = ELBindingSlice(self.query.filled_bindings)
+        for key, value in kwargs.items():
+            binding_slice[key] = ELBindingEntry(key, None, value)
+
+        pairs = self.pairs
+        if bool(kwargs):
+            pairs = pairs[:]
+            for key in kwargs:
+                for i in self.var_positions.get(key, []):
+                    original = pairs[i]
+                    pairs[i] = ELPAIR(original.value.get_val(binding_slice), original.elop)
+
+        trie = self.runtime.trie
+        if self.root_var is None:
+            root = trie.root
+        elif self.root_var in kwargs and kwargs[self.root_var] in trie.allNodes:
+            root = trie.allNodes[kwargs[self.root_var]]
+        else:
+            raise ELE.ELRuleException('Root Value not found in allnodes')
+
+        result = trie.get_from(root, pairs, binding_slice, path=self.query)
+        if bool(result) and not self.negated:
+            return result
+        elif not bool(result) and self.negated:
+            return ELSuccess(path=self.query,
+                             bindings=ELBindingFrame([binding_slice]),
+                             nodes=None)
+        else:
+            return ELFail()
+
+    def __call__(self, **kwargs):
+        return self.run(**kwargs)
+
+    def __repr__(self):
+        return "(ELPrepared: {})".format(str(self.query))
@@ -0,0 +1,271 @@
+"""
+Tracking of loaded EL files, so an edited file can be reloaded
+by applying only the difference to the trie.
+
+Each tracked file keeps its statements in order, with their IR,
+and a path index of the facts they assert and retract.
+On reload the statements are diffed as text, only new statements are parsed,
+removed assertions are pruned from the trie where nothing else
+in the file still needs them, and the added statements are
+replayed alongside any kept statements they could interact with
+(through prefixes, retraction, or exclusion), and those the replayed
+statements could interact with in turn, in file order.
+"""
+import logging as root_logger
+from difflib import SequenceMatcher
+from .ELUtil import EL
+from .ELStructure import ELPAIR
+from .ELFactStructure import ELFACT
+from .ELStream import EL_STATEMENTS
+from .ELParser import ELPARSE
+from . import ELWal
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+
+def fact_paths(ir):
+    """ Get the paths a statement asserts or retracts, as tuples of (value, elop),
+    returning (assertions, retractions).
+    Queries, and facts not rooted at the trie root, have no paths """
+    if not isinstance(ir, ELFACT) or ir.root().isVar():
+        return ([], [])
+    if isinstance(ir[-1], ELPAIR) or isinstance(ir[-1], list):
+        expanded = ir.expand()
+    else:
+        return ([], [])
+    paths = []
+    for fact in expanded:
+        path = tuple([(x.value, x.elop) for x in fact.data[1:] if isinstance(x, ELPAIR)])
+        if bool(path):
+            paths.append(path)
+    if ir.negated:
+        return ([], paths)
+    return (paths, [])
+
+
+class ELStatementRecord:
+    """ A single statement of a tracked file """
+
+    def __init__(self, text, irs):
+        self.text = text
+        self.irs = irs
+        self.position = 0
+        self.assertions = []
+        self.retractions = []
+        for ir in irs:
+            assertions, retractions = fact_paths(ir)
+            self.assertions += assertions
+            self.retractions += retractions
+
+    def paths(self):
+        return self.assertions + self.retractions
+
+    def __repr__(self):
+        return "ELStatementRecord({}: {})".format(self.position, self.text.strip())
+
+
+class ELPathIndexNode:
+    """ A node of a file's path index. Counts the paths passing through it,
+    how many of them are assertions, how many make it exclusive,
+    and how many retractions end on it """
+    __slots__ = ['children', 'records', 'count', 'asserted', 'exclusive', 'retracted']
+
+    def __init__(self):
+        self.children = {}
+        #records whose path ends here
+        self.records = set()
+        self.count = 0
+        self.asserted = 0
+        self.exclusive = 0
+        self.retracted = 0
+
+
+class ELLoadedFile:
+    """ The statements of a loaded file, and an index of the paths they touch """
+
+    def __init__(self, path, record_history=False):
+        self.path = path
+        #whether acting on the file's statements records them in the runtime's history
+        self.record_history = record_history
+        self.records = []
+        self.index = ELPathIndexNode()
+
+    def add(self, record):
+        for path in record.paths():
+            asserted = int(path in record.assertions)
+            node = self.index
+            node.count += 1
+            for value, elop in path:
+                if value not in node.children:
+                    node.children[value] = ELPathIndexNode()
+                node = node.children[value]
+                node.count += 1
+                node.asserted += asserted
+                if elop is EL.EX:
+                    node.exclusive += 1
+            node.retracted += 1 - asserted
+            node.records.add(record)
+
+    def remove(self, record):
+        for path in record.paths():
+            asserted = int(path in record.assertions)
+            node = self.index
+            node.count -= 1
+            for value, elop in path:
+                child = node.children[value]
+                child.count -= 1
+                child.asserted -= asserted
+                if elop is EL.EX:
+                    child.exclusive -= 1
+                if child.count == 0:
+                    #nothing else passes through, so drop the whole branch
+                    del node.children[value]
+                    break
+                node = child
+            else:
+                node.retracted -= 1 - asserted
+                node.records.discard(record)
+
+    def needed_depth(self, path):
+        """ The length of the prefix of the path still asserted by indexed statements """
+        node = self.index
+        for depth, (value, elop) in enumerate(path):
+            if value not in node.children or node.children[value].asserted == 0:
+                return depth
+            node = node.children[value]
+        return len(path)
+
+    def interacting(self, path):
+        """ Get the indexed statements which could interact with the path.
+        Statements ending on its prefixes, extending it, or extending
+        a prefix that is exclusive or retracted """
+        found = set()
+        node = self.index
+        for value, elop in path:
+            found.update(node.records)
+            if value not in node.children:
+                return found
+            node = node.children[value]
+            if elop is EL.EX or node.exclusive > 0 or node.retracted > 0:
+                break
+        self.collect(node, found)
+        return found
+
+    def collect(self, node, found):
+        queue = [node]
+        while bool(queue):
+            current = queue.pop()
+            found.update(current.records)
+            queue.extend(current.children.values())
+
+
+class ELReloader:
+    """ Loads and reloads tracked files into a runtime """
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.files = {}
+
+    def load(self, path, record_history=False):
+        """ Load a file, keeping the records needed to reload it """
+        loaded = ELLoadedFile(path, record_history)
+        with open(path) as f:
+            for line_number, text in EL_STATEMENTS(f):
+                record = self.parse(text, path, line_number)
+                record.position = len(loaded.records)
+                loaded.records.append(record)
+                loaded.add(record)
+                for ir in record.irs:
+                    self.runtime.act(ir, record=record_history)
+        self.files[path] = loaded
+        return { 'kept' : 0, 'added' : len(loaded.records), 'removed' : 0, 'replayed' : len(loaded.records) }
+
+    def parse(self, text, path, line_number):
+        try:
+            return ELStatementRecord(text, ELPARSE(text))
+        except ELE.ELParseException as pe:
+            raise ELE.ELParseException("{} ({}: line {})".format(pe, path, line_number))
+
+    def reload(self, path):
+        """ Apply the difference between the loaded and current versions of a file """
+        if path not in self.files:
+            return self.load(path)
+        loaded = self.files[path]
+        with open(path) as f:
+            statements = list(EL_STATEMENTS(f))
+        old_texts = [x.text for x in loaded.records]
+        new_texts = [x[1] for x in statements]
+
+        #diff only the region between the common prefix and suffix:
+        start = 0
+        limit = min(len(old_texts), len(new_texts))
+        while start < limit and old_texts[start] == new_texts[start]:
+            start += 1
+        end = 0
+        while end < limit - start and old_texts[-1 - end] == new_texts[-1 - end]:
+            end += 1
+        matcher = SequenceMatcher(None, old_texts[start:len(old_texts) - end],
+                                  new_texts[start:len(new_texts) - end], autojunk=False)
+
+        records = loaded.records[:start]
+        removed = []
+        added = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                records += loaded.records[start + i1:start + i2]
+                continue
+            removed += loaded.records[start + i1:start + i2]
+            for line_number, text in statements[start + j1:start + j2]:
+                record = self.parse(text, path, line_number)
+                added.append(record)
+                records.append(record)
+        records += loaded.records[len(loaded.records) - end:]
+        for position, record in enumerate(records):
+            record.position = position
+
+        for record in removed:
+            loaded.remove(record)
+        for record in added:
+            loaded.add(record)
+        for record in removed:
+            for fact_path in record.assertions:
+                self.prune(fact_path, loaded.needed_depth(fact_path))
+
+        #replay what was added, and anything it could interact with, in order.
+        #Replaying a kept statement re-applies all of its paths, so what those
+        #interact with is replayed too, until nothing new is found:
+        replay = set(added)
+        pending = removed + added
+        while bool(pending):
+            found = set()
+            for record in pending:
+                for fact_path in record.paths():
+                    found.update(loaded.interacting(fact_path))
+            pending = found - replay
+            replay.update(pending)
+        for record in sorted(replay, key=lambda x: x.position):
+            for ir in record.irs:
+                self.runtime.act(ir, record=loaded.record_history)
+
+        loaded.records = records
+        logging.info("Reloaded {}: +{} -{}, replayed {}".format(path, len(added), len(removed), len(replay)))
+        return { 'kept' : len(records) - len(added), 'added' : len(added),
+                 'removed' : len(removed), 'replayed' : len(replay) }
+
+    def prune(self, path, depth):
+        """ Remove the branch of a path below the depth the file still needs """
+        if depth >= len(path):
+            return
+        node = self.runtime.trie.root
+        for value, elop in path[:depth]:
+            if value not in node:
+                return
+            node = node[value]
+        if path[depth][0] in node:
+            with self.runtime.writing():
+                target = node[path[depth][0]]
+                record = None if self.runtime.wal is None else ELWal.remove_record(target)
+                self.runtime.trie.remove_node(target)
+                if record is not None:
+                    self.runtime.log(record)
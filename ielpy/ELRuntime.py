@@ -4,14 +4,14 @@
 import logging as root_logger
 logging = root_logger.getLogger(__name__)
 
+import os
 from enum import Enum
 from collections import namedtuple
+from contextlib import nullcontext
 from fractions import Fraction
+from functools import partial
 from random import choice
-from uuid import UUID
-import IPython
-import uuid
-from .ELUtil import EL, ELEXT, ELCOMP
+from .ELUtil import EL, ELEXT, ELCOMP, ELNodeId
 from .ELBinding import ELBindingStack, ELBindingFrame
 from .ELTrieNode import ELTrieNode
 from .ELResults import ELFail, ELSuccess
@@ -19,7 +19,16 @@ from .ELActions import ELBIND
 from .ELStructure import ELQUERY, ELVAR
 from .ELFactStructure import ELFACT, ELARITH_FACT
 from .ELFunctions import COMP_FUNCS, get_EL_FUNC
-from . import ELParser, ELTrie
+from .ELFastParser import ELFASTPARSE
+from .ELParseCache import ELParseCache, DEFAULT_CACHE_SIZE
+from .ELPrepared import ELPreparedStatement
+from .ELBulkLoader import ELBulkLoader, DEFAULT_CHUNK_SIZE
+from .ELReload import ELReloader
+from .ELSnapshot import ELSnapshot
+from .ELVersions import ELVersions
+from .ELWal import ELDURABILITY, DEFAULT_WINDOW
+from .ELJoin import ELJoin, ELFactoredProbe, MIN_JOIN_SLICES
+from . import ELParser, ELTrie, ELCompiled, ELDump, ELWal
 from . import ELExceptions as ELE
 
 
@@ -28,13 +37,27 @@ class ELRuntime:
     Parses strings into IRs, which are acted upon.
     """
 
-    def __init__(self):
-        self.parser = ELParser.ELPARSE
-        self.trie = ELTrie.ELTrie()
+    def __init__(self, parse_cache_size=DEFAULT_CACHE_SIZE, trie=None):
+        #parser :: str -> [IR], cached on the source string where the full grammar is needed
+        self.parser = ELParseCache(partial(ELParser.ELPARSE, fast_path=False),
+                                   maxsize=parse_cache_size, fast_func=ELFASTPARSE)
+        #trie :: ELTrie, or another storage engine with its interface, such as ELArrayTrie
+        if trie is None:
+            trie = ELTrie.ELTrie()
+        self.trie = trie
         #list of tuples (asserted, retracted) for each action?
         self.history = []
         #bindings :: stack<ELBindingFrame>
         self.bindings = ELBindingStack()
+        #files loaded as reloadable
+        self.reloader = ELReloader(self)
+        #evaluate queries over frames by joining, where possible
+        self.use_joins = True
+        #the current time step, recorded on changes by the trie's timeline
+        self.step = 0
+        #ELWal, see enable_wal, and the number of the last change logged or replayed
+        self.wal = None
+        self.logged = 0
 
         #todo: add default type structures
 
@@ -55,6 +78,141 @@ class ELRuntime:
         else:
             return actResults
 
+    def load_file(self, path, record_history=False, use_compiled=False, reloadable=False):
+        """ Stream a file of EL into the runtime, parsing and acting
+        on a statement at a time, so memory doesn't depend on the file size.
+        With use_compiled, IR is read from the file's compiled cache (path + 'c') if it
+        is up to date, and otherwise the cache is rewritten as the file is parsed.
+        Reloadable files keep their statements instead, for use by reload,
+        so can't use a compiled cache.
+        Statements are only kept in the history if asked.
+        Returns the number of statements acted upon """
+        if reloadable:
+            if use_compiled:
+                raise ELE.ELRuntimeException("Reloadable files can't use compiled caches: {}".format(path))
+            return self.reloader.load(path, record_history)['added']
+        if not use_compiled:
+            with open(path) as f:
+                return self.act_all(ELParser.ELPARSE_iter(f), record_history)
+
+        digest = ELCompiled.source_digest(path)
+        compiled = ELCompiled.read_compiled(path, digest)
+        if compiled is not None:
+            return self.act_all(compiled, record_history)
+
+        try:
+            writer = ELCompiled.ELCompiledWriter(path, digest)
+        except OSError as e:
+            logging.warning("Can't write compiled file for {}: {}".format(path, e))
+            return self.load_file(path, record_history=record_history, use_compiled=False)
+        count = 0
+        try:
+            with open(path) as f:
+                for action in ELParser.ELPARSE_iter(f):
+                    if writer is not None:
+                        try:
+                            writer.add(action)
+                        except ELE.ELSerialiseException as e:
+                            logging.warning("Not compiling {}: {}".format(path, e))
+                            writer.abort()
+                            writer = None
+                    self.act(action, record=record_history)
+                    count += 1
+        except:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.commit()
+        return count
+
+    def reload(self, path):
+        """ Reload an edited file, applying only the statements that changed,
+        and those they could interact with. A file not yet loaded as
+        reloadable is loaded in full. Returns counts of the statements
+        kept, added, removed, and replayed """
+        return self.reloader.reload(path)
+
+    def act_all(self, actions, record_history=False):
+        """ Act on an iterable of IR, returning the number of actions """
+        count = 0
+        for action in actions:
+            self.act(action, record=record_history)
+            count += 1
+        return count
+
+    def load_files(self, paths, workers=0, chunk_size=DEFAULT_CHUNK_SIZE, record_history=False):
+        """ Load many files, acting in order. Workers > 0 parses in a process pool,
+        None in one the size of the cpu count. Returns the throughput of each stage """
+        loader = ELBulkLoader(self, workers=workers, chunk_size=chunk_size)
+        return loader.load(paths, record_history=record_history)
+
+    def save(self, path):
+        """ Write the trie and current step to a binary dump, to restore with load.
+        Returns the number of nodes written """
+        return ELDump.write_dump(self.trie, path, self.step, self.logged)
+
+    @classmethod
+    def load(cls, path, parse_cache_size=DEFAULT_CACHE_SIZE):
+        """ Make a runtime from a dump written by save, without parsing.
+        The trie is rebuilt as an ELTrie, with new node ids """
+        trie, step, logged = ELDump.read_dump(path)
+        runtime = cls(parse_cache_size, trie=trie)
+        runtime.step = step
+        runtime.logged = logged
+        return runtime
+
+    def enable_wal(self, path, durability=ELDURABILITY.GROUP, window=DEFAULT_WINDOW):
+        """ Log every change to a file, to recover from after a crash, see ELWal.
+        Changes already in the log, after those this runtime was loaded with, are replayed first.
+        Returns the ELWal, to close when done """
+        if self.wal is not None:
+            raise ELE.ELRuntimeException("Already logging to {}".format(self.wal.path))
+        wal = ELWal.ELWal(path, durability, window)
+        replayed = 0
+        for record in wal.records():
+            if record[0] > self.logged:
+                ELWal.replay(self, record)
+                self.logged = record[0]
+                replayed += 1
+        logging.info("Replayed {} changes from {}".format(replayed, path))
+        wal.open()
+        self.wal = wal
+        return wal
+
+    def log(self, record):
+        """ Number a change, and append it to the log """
+        self.logged += 1
+        self.wal.append((self.logged,) + record)
+
+    def checkpoint(self, path):
+        """ Save the trie, then empty the log of the changes the save holds.
+        Returns the number of nodes saved """
+        with self.writing():
+            count = self.save(path)
+            if self.wal is not None:
+                self.wal.truncate()
+        return count
+
+    @classmethod
+    def recover(cls, checkpoint_path, wal_path, durability=ELDURABILITY.GROUP,
+                window=DEFAULT_WINDOW, parse_cache_size=DEFAULT_CACHE_SIZE):
+        """ Restore a runtime from its last checkpoint, if there is one,
+        and the changes logged since, then carry on logging to the same file """
+        if os.path.exists(checkpoint_path):
+            runtime = cls.load(checkpoint_path, parse_cache_size)
+        else:
+            runtime = cls(parse_cache_size)
+        runtime.enable_wal(wal_path, durability, window)
+        return runtime
+
+    def prepare(self, string):
+        """ Parse a single query once, for running repeatedly
+        with different pre-bound variables """
+        parsed = self.parser(string)
+        if len(parsed) != 1:
+            raise ELE.ELConsistencyException("Prepare takes a single query: {}".format(string))
+        return ELPreparedStatement(self, parsed[0])
     
     def push_stack(self): #Binding state operations:
         self.bindings.push_stack()
@@ -73,6 +231,29 @@ class ELRuntime:
         """ run the simulation """
         None
 
+    def advance(self, steps=1):
+        """ Move the current time step on """
+        self.step += steps
+        return self.step
+
+    def enable_timeline(self):
+        """ Record the trie's changes against the current step,
+        for queries as of a past step, see query """
+        return self.trie.enable_timeline(lambda: self.step)
+
+    def query(self, string, at=None, between=None):
+        """ Query the trie as of the step at,
+        or whether the query held at any step in the inclusive range between.
+        Needs the timeline enabled before the steps queried """
+        results = []
+        for query in self.parser(string):
+            if not isinstance(query, ELFACT) or not isinstance(query[-1], ELQUERY):
+                raise ELE.ELConsistencyException("Not a query: {}".format(query))
+            results.append(self.trie.query(query, at=at, between=between))
+        if len(results) == 1:
+            return results[0]
+        return results
+
     def execute(self, etype, data):
         return_val = []
         if etype is ELEXT.TRIE:
@@ -135,10 +316,10 @@ class ELRuntime:
         return output
 
     def get_location(self,location, bindings=None):
-        """ Utility to get a trie node based on string, fact, uuid, or trie node """
+        """ Utility to get a trie node based on string, fact, node id, or trie node """
         if isinstance(location, ELTrieNode):
             return location
-        elif isinstance(location, UUID):
+        elif isinstance(location, ELNodeId):
             return self.trie[location]
         elif isinstance(location, str): #str -> ELFACT
             location = self.parser(location)[0]
@@ -202,10 +383,21 @@ class ELRuntime:
         result = operator(val1, val2)
 
         if p1.is_path_var:
-            node.update_value(result)
+            with self.writing():
+                path = None if self.wal is None else ELWal.path_of(node)
+                self.trie.update_value(node, result)
+                if path is not None:
+                    self.log(ELWal.update_record(path, result))
         binding[p1.value].value = result
         return binding
     
+    def add_index(self, pattern):
+        """ Declare a secondary index on the trie, from a string or fact,
+        such as ".agents.$a.location!$l" """
+        if isinstance(pattern, str):
+            pattern = self.parser(pattern)[0]
+        return self.trie.add_index(pattern)
+
     def run_conditions(self, location, bindings=None):
         logging.info("Running Conditions: {}".format(location))
         if bindings is None:
@@ -260,12 +452,13 @@ class ELRuntime:
 
 
         
-    def act(self,action): #Action functions:
+    def act(self,action, record=True): #Action functions:
         """ Given an action (one of ELBDs action types),
         perform it
         """
         #Store in the history
-        self.history.append(action)
+        if record:
+            self.history.append(action)
         
         result = ELFail()
         #Perform based on parsed type
@@ -280,17 +473,23 @@ class ELRuntime:
                 logging.debug('Query Result: {}'.format(result))
             elif action.negated:                                      #RETRACT
                 logging.debug("Hit a negation, retracting")
-                result = self.fact_retract(action) 
+                with self.writing():
+                    result = self.fact_retract(action)
             else:                                                     #ASSERT
                 logging.debug("Hit an assertion")
-                result = self.fact_assert(action)
+                with self.writing():
+                    result = self.fact_assert(action)
         elif isinstance(action, ELBIND):                              #BIND
             raise ELE.ELRuntimeException("Not Implemented")
             #self.set_binding(action.var,action.root)
         elif isinstance(action, ELARITH_FACT):                        #ARITH
             #Get the designated leaf.
             node = self.trie[action.data]
-            result = action.apply(node)
+            with self.writing():
+                path = None if self.wal is None else ELWal.path_of(node)
+                result = action.apply(node, self.trie)
+                if path is not None:
+                    self.log(ELWal.update_record(path, node.value))
         else:
             raise ELE.ELRuntimeException("Unrecognised Action: {}".format(action))
         return result
@@ -298,23 +497,55 @@ class ELRuntime:
 
     def fact_assert(self,fact): #Fact operations:
         """ Add a fact """
+        record = None if self.wal is None else ELWal.fact_record(fact, self.trie)
         return_val = []
         expanded = fact.expand()
         for f in expanded:
             return_val.append(self.trie.push(f))
+        if record is not None:
+            self.log(record)
         return all(return_val)
             
+    def assert_many(self, facts, record_history=False):
+        """ Assert an iterable of facts, or strings of them, in order,
+        sharing the walk of common prefixes between consecutive facts,
+        see ELTrie.push_many. Sorting facts first shares the most """
+        with self.writing():
+            return self.trie.push_many(self.assertions(facts, record_history))
+
+    def assertions(self, facts, record_history=False):
+        """ Expand facts to assert, checking they are assertions """
+        for fact in facts:
+            if isinstance(fact, str):
+                parsed = self.parser(fact)
+            else:
+                parsed = [fact]
+            for action in parsed:
+                if not isinstance(action, ELFACT) or action.negated or isinstance(action[-1], ELQUERY):
+                    raise ELE.ELConsistencyException("Not an assertion: {}".format(action))
+                if record_history:
+                    self.history.append(action)
+                record = None if self.wal is None else ELWal.fact_record(action, self.trie)
+                yield from action.expand()
+                #push_many asks for the next fact once it has pushed the last,
+                #so reaching here means the action is applied, and can be logged
+                if record is not None:
+                    self.log(record)
+
     def fact_retract(self,fact):
         """ Remove a fact """
+        record = None if self.wal is None else ELWal.fact_record(fact, self.trie)
         return_val = []
         expanded = fact.expand()
         for f in expanded:
             return_val.append(self.trie.pop(fact))
+        if record is not None:
+            self.log(record)
         return all(return_val)
             
     def fact_query(self,query, bindingFrame=None):
         """ Test a fact, BE CAREFUL IT MODIFES THE TOP OF THE VAR STACK  """
-        logging.debug('Recieved Query: {}'.format(query))
+        logging.debug('Recieved Query: %s', query)
         if bindingFrame is None:
             bindingFrame = self.top_stack()
         assert isinstance(bindingFrame, ELBindingFrame)
@@ -324,17 +555,25 @@ class ELRuntime:
         if len(current_frame) == 0:
             logging.debug("Nothing in the current frame")
             return (False, None)
-        #fill in any variables from the current bindings
-        bound_queries = [query.bind(slice) for slice in current_frame]
-        logging.debug('Bound: {}'.format(bound_queries))
-        
-        #then query
-        results = [self.trie.query(query) for query in bound_queries]
-        logging.debug("Trie Query results: {}".format(results))
+        #join the query against the frame, if that is cheaper than probing:
+        results = None
+        if self.use_joins and len(current_frame) >= MIN_JOIN_SLICES:
+            results = ELJoin(self.trie, query).results(current_frame)
+        if results is None:
+            #otherwise share the walk of the query between slices binding the same values:
+            results = ELFactoredProbe(self.trie, query).results(current_frame)
+        if results is None:
+            #fill in any variables from the current bindings
+            bound_queries = [query.bind(slice) for slice in current_frame]
+            logging.debug('Bound: %s', bound_queries)
+
+            #then query
+            results = [self.trie.query(query) for query in bound_queries]
+        logging.debug("Trie Query results: %s", results)
         
         #then integrate into bindings:
         successes = [success for success in results if bool(success) is True]
-        logging.debug("Trie Query Successes: {}".format(successes))
+        logging.debug("Trie Query Successes: %s", successes)
         
         #Flatten the frame
         updated_frame = ELBindingFrame([bind_slice for success in successes for bind_slice in success.bindings])
@@ -374,12 +613,36 @@ class ELRuntime:
         #todo: Take a string of "this is a $x test", and replace $x with the variable val
         return raw_string
 
+    def snapshot(self):
+        """ Get an immutable view of the trie as it is now, in O(1),
+        which can be queried as a trie while the runtime carries on """
+        if self.trie.versions is not None:
+            return self.trie.versions.pin()
+        return ELSnapshot(self.trie)
+
+    def enable_versions(self):
+        """ Let other threads query snapshots of the trie while this runtime changes it.
+        Each reader takes a snapshot, and queries it directly, or through a runtime of its own,
+        as ELRuntime(trie=snapshot), releasing it when done. See ELVersions """
+        if self.trie.versions is None:
+            ELVersions(self.trie)
+        return self.trie.versions
+
+    def writing(self):
+        """ Hold the trie for a change, if other threads read versions of it """
+        if self.trie.versions is None:
+            return nullcontext()
+        return self.trie.versions.write()
+
     #### METRICS
     def max_depth(self):
-        return self.trie.dfs_for_metrics()['maxDepth']
+        return self.trie.stats.max_depth()
 
     def num_leaves(self):
-        return len(self.trie.dfs_for_metrics()['leaves'])
+        return self.trie.stats.leaves
+
+    def num_nodes(self):
+        return self.trie.stats.nodes
         
     def num_assertions(self):
         return len([x for x in self.history if isinstance(x, ELFACT) and not x.negated])
@@ -390,6 +653,5 @@ class ELRuntime:
         
     #EXPORTING
     def __str__(self):
-        leaves = self.trie.dfs_for_metrics()['leaves']
-        strings = [str(x) for x in leaves]
+        strings = [str(x) for x in self.trie.leaves()]
         return "\n".join(strings)
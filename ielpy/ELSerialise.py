@@ -0,0 +1,199 @@
+"""
+A compact binary encoding of parsed IR.
+IR is flattened into tagged tuples of primitive values, which marshal
+can write and read without any python level reconstruction,
+then rebuilt directly, without going through the IR constructors.
+
+ie: .a.b!c -> (T_FACT, False, [0, (T_ROOT, 1, None), 1, 'a', 2, 'b', 1, 'c'], [])
+"""
+import logging as root_logger
+import marshal
+from fractions import Fraction
+from .ELUtil import EL, ELVARSCOPE
+from .ELFunctions import ELCOMP, ELARITH
+from .ELStructure import ELVAR, ELPAIR, ELROOT, ELQUERY
+from .ELFactStructure import ELFACT, ELARITH_FACT, ELComparison
+from .ELActions import ELBIND
+from .ELBinding import ELBindingSlice
+from .ELSymbols import SYMBOLS
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+#Bump when the encoding, or the IR the parser produces, changes
+FORMAT_VERSION = 1
+#marshal versions are stable within a python version:
+MARSHAL_VERSION = 4
+
+##############################
+# Tags
+####################
+(T_FACT, T_PAIR, T_ROOT, T_VAR, T_QUERY, T_ARITH, T_COMP, T_BIND,
+ T_FRACTION, T_EL, T_SCOPE, T_COMP_OP, T_ARITH_OP) = range(13)
+
+ENUM_TAGS = { EL : T_EL, ELVARSCOPE : T_SCOPE, ELCOMP : T_COMP_OP, ELARITH : T_ARITH_OP }
+#Enum members by value, indexed by tag:
+ENUM_MEMBERS = { tag : { x.value : x for x in enum } for enum, tag in ENUM_TAGS.items() }
+EL_MEMBERS = ENUM_MEMBERS[T_EL]
+PRIMITIVES = (str, int, float, bool, type(None))
+#Construction without __init__:
+new_object = object.__new__
+new_slice = dict.__new__
+canonical = SYMBOLS.canonical
+
+##############################
+# Encoding
+####################
+def encode(ir):
+    """ Flatten IR into marshallable tuples """
+    ir_type = type(ir)
+    if ir_type in PRIMITIVES:
+        return ir
+    elif ir_type is ELPAIR:
+        return (T_PAIR, encode(ir.value), ir.elop.value)
+    elif ir_type is ELFACT:
+        if bool(ir.filled_bindings):
+            raise ELE.ELSerialiseException("Can't encode a bound fact: {}".format(ir))
+        return (T_FACT, ir.negated, encode_fact_data(ir.data),
+                [encode(x) for x in ir.bindings])
+    elif ir_type is ELVAR:
+        return (T_VAR, ir.value, encode(ir.access_point), ir.is_path_var, ir.scope.value)
+    elif ir_type is ELROOT:
+        return (T_ROOT, ir.elop.value, encode(ir.value))
+    elif ir_type is ELQUERY:
+        return (T_QUERY,)
+    elif ir_type is list:
+        return [encode(x) for x in ir]
+    elif ir_type is Fraction:
+        return (T_FRACTION, ir.numerator, ir.denominator)
+    elif ir_type in ENUM_TAGS:
+        return (ENUM_TAGS[ir_type], ir.value)
+    elif ir_type is ELARITH_FACT:
+        return (T_ARITH, encode(ir.data), ir.op.value, encode(ir.val),
+                [encode(x) for x in ir.bindings])
+    elif ir_type is ELComparison:
+        return (T_COMP, encode(ir.b1), ir.op.value, encode(ir.nearVal), encode(ir.b2))
+    elif ir_type is ELBIND:
+        return (T_BIND, encode(ir.var), encode(ir.root))
+    raise ELE.ELSerialiseException("Can't encode IR of type: {}".format(ir_type))
+
+def encode_fact_data(data):
+    """ Flatten the components of a fact into [elop, value, elop, value...],
+    where an elop of 0 marks a component that isn't a pair """
+    flat = []
+    for x in data:
+        if type(x) is ELPAIR:
+            flat.append(x.elop.value)
+            flat.append(encode(x.value))
+        else:
+            flat.append(0)
+            flat.append(encode(x))
+    return flat
+
+def dumps(irs):
+    """ Encode a list of IR to bytes """
+    return marshal.dumps([encode(x) for x in irs], MARSHAL_VERSION)
+
+##############################
+# Decoding
+####################
+def decode(data):
+    """ Rebuild IR from its flattened form """
+    data_type = type(data)
+    if data_type is tuple:
+        return DECODERS[data[0]](data)
+    elif data_type is list:
+        return [decode(x) for x in data]
+    return data
+
+def loads(data):
+    """ Decode bytes from dumps back to a list of IR """
+    return [decode(x) for x in marshal.loads(data)]
+
+def decode_fact(data):
+    #pairs are the bulk of all IR, so they are built inline
+    components = []
+    append = components.append
+    flat = iter(data[2])
+    for elop, value in zip(flat, flat):
+        value_type = type(value)
+        if value_type is tuple:
+            value = DECODERS[value[0]](value)
+        elif value_type is list:
+            value = [decode(x) for x in value]
+        if elop:
+            pair = new_object(ELPAIR)
+            pair.value, pair.sym = canonical(value)
+            pair.elop = EL_MEMBERS[elop]
+            append(pair)
+        else:
+            append(value)
+    filled_bindings = new_slice(ELBindingSlice)
+    filled_bindings.uuid = None
+    fact = new_object(ELFACT)
+    fact.data = components
+    fact.negated = data[1]
+    fact.bindings = [decode_var(x) for x in data[3]]
+    fact.filled_bindings = filled_bindings
+    return fact
+
+def decode_pair(data):
+    pair = new_object(ELPAIR)
+    pair.value, pair.sym = canonical(decode(data[1]))
+    pair.elop = EL_MEMBERS[data[2]]
+    return pair
+
+def decode_var(data):
+    var = new_object(ELVAR)
+    var.__dict__ = { 'is_path_var' : data[3],
+                     'scope' : ENUM_MEMBERS[T_SCOPE][data[4]],
+                     'value' : data[1],
+                     'access_point' : decode(data[2]) }
+    return var
+
+def decode_root(data):
+    root = new_object(ELROOT)
+    root.__dict__ = { 'elop' : EL_MEMBERS[data[1]], 'value' : decode(data[2]) }
+    return root
+
+def decode_arith(data):
+    arith = new_object(ELARITH_FACT)
+    arith.__dict__ = { 'data' : decode(data[1]),
+                       'op' : ENUM_MEMBERS[T_ARITH_OP][data[2]],
+                       'val' : decode(data[3]),
+                       'bindings' : [decode(x) for x in data[4]] }
+    return arith
+
+def decode_comp(data):
+    comp = new_object(ELComparison)
+    comp.__dict__ = { 'op' : ENUM_MEMBERS[T_COMP_OP][data[2]],
+                      'nearVal' : decode(data[3]),
+                      'b1' : decode(data[1]),
+                      'b2' : decode(data[4]) }
+    return comp
+
+def decode_bind(data):
+    bind = new_object(ELBIND)
+    bind.__dict__ = { 'var' : decode(data[1]), 'root' : decode(data[2]) }
+    return bind
+
+def decode_enum(data):
+    return ENUM_MEMBERS[data[0]][data[1]]
+
+DECODERS = {
+    T_FACT : decode_fact,
+    T_PAIR : decode_pair,
+    T_ROOT : decode_root,
+    T_VAR : decode_var,
+    T_QUERY : lambda data: ELQUERY(),
+    T_ARITH : decode_arith,
+    T_COMP : decode_comp,
+    T_BIND : decode_bind,
+    T_FRACTION : lambda data: Fraction(data[1], data[2]),
+    T_EL : decode_enum,
+    T_SCOPE : decode_enum,
+    T_COMP_OP : decode_enum,
+    T_ARITH_OP : decode_enum
+}
+#tags are dense, so index a list instead of hashing:
+DECODERS = [DECODERS[x] for x in range(len(DECODERS))]
@@ -0,0 +1,273 @@
+"""
+Immutable snapshots of a trie, taken in O(1), sharing its unchanged nodes.
+
+Taking a snapshot starts a new generation of the trie.
+While any snapshot is alive, the first change to a node in a generation
+first preserves the node's previous state as an ELFrozenNode,
+and removed subtrees are preserved before they are released.
+A snapshot sees a node as its first preserved state from a later generation,
+or, if it hasn't changed since, as the live node.
+So memory grows with the nodes changed since the oldest live snapshot,
+and is freed once no snapshots are left, or by ELVersions.reclaim.
+
+With ELVersions, snapshots are read from other threads as the trie changes.
+A node is preserved before it is changed, so a read of a live node is
+checked by looking for a preserved state again afterwards, see read.
+"""
+import logging as root_logger
+from bisect import bisect_right
+from collections.abc import Mapping
+from .ELTrie import ELTrie
+from .ELTrieNode import ELTrieNode, ELFrozenNode
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+
+class ELSnapshot(ELTrie):
+    """ A read only view of a trie as it was when the snapshot was taken.
+    Queried through the usual ELTrie get and query """
+
+    def __init__(self, trie):
+        self.trie = trie
+        super().__init__()
+        #changes from here on are in a new generation
+        self.generation = trie.generation
+        trie.generation += 1
+        trie.snapshots.add(self)
+
+    def build_root(self):
+        self.root = ELSnapshotNode(self, self.trie.root.uuid)
+        self.allNodes = ELSnapshotNodes(self)
+
+    def __repr__(self):
+        return "Snapshot {}: {}".format(self.generation, self.root)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def release(self):
+        """ Stop keeping changes for this snapshot, which mustn't be used after """
+        versions = self.trie.versions
+        if versions is None:
+            self.trie.snapshots.discard(self)
+            return
+        with versions.lock:
+            self.trie.snapshots.discard(self)
+
+    def state(self, uuid):
+        """ Get the state of a node as of this snapshot:
+        an ELFrozenNode, the live node, or None """
+        frozen = self.frozen_state(uuid)
+        if frozen is not None:
+            return frozen
+        node = self.trie.allNodes.get(uuid)
+        if node is None and self.trie.versions is not None:
+            #it may have been preserved and released since it was looked for
+            return self.frozen_state(uuid)
+        return node
+
+    def frozen_state(self, uuid):
+        versions = self.trie.frozen.get(uuid)
+        if versions is not None:
+            i = bisect_right(versions[0], self.generation)
+            if i < len(versions[0]):
+                return versions[1][i]
+        return None
+
+    def read(self, uuid, reader):
+        """ Apply reader to the state of a node as of this snapshot.
+        A live node read while it is preserved and changed is read again,
+        as it is then preserved """
+        while True:
+            state = self.state(uuid)
+            if state is None:
+                raise ELE.ELConsistencyException("Node {} isn't in the snapshot".format(uuid))
+            if self.trie.versions is None or isinstance(state, ELFrozenNode):
+                return reader(state)
+            try:
+                result = reader(state)
+            except (RuntimeError, AttributeError):
+                #its children changed as they were read, or an array trie released it
+                if self.state(uuid) is state:
+                    raise
+                continue
+            if self.state(uuid) is state:
+                return result
+
+    def node(self, uuid):
+        return ELSnapshotNode(self, uuid)
+
+    def immutable(self, *args, **kwargs):
+        raise ELE.ELConsistencyException("Snapshots can't be changed")
+
+    push = pop = add_node = set_elop = remove_node = update_value = immutable
+    add_index = add_path_index = compact = enable_timeline = immutable
+
+
+class ELSnapshotNode(ELTrieNode):
+    """ A node of a snapshot. Its state is looked up on each use,
+    as the live node may change, or be preserved, after it is made """
+    __slots__ = ['snapshot', 'node_id']
+
+    def __init__(self, snapshot, uuid):
+        self.snapshot = snapshot
+        self.node_id = uuid
+
+    @property
+    def state(self):
+        return self.snapshot.read(self.node_id, lambda x: x)
+
+    @property
+    def uuid(self):
+        return self.node_id
+
+    @property
+    def value(self):
+        return self.snapshot.read(self.node_id, lambda x: x.value)
+
+    @property
+    def elop(self):
+        return self.snapshot.read(self.node_id, lambda x: x.elop)
+
+    @property
+    def sym(self):
+        return self.snapshot.read(self.node_id, lambda x: x.sym)
+
+    @property
+    def parent(self):
+        parent = self.snapshot.read(self.node_id, parent_of)
+        if parent is None:
+            return None
+        return ELSnapshotNode(self.snapshot, parent)
+
+    @property
+    def children(self):
+        return ELSnapshotChildren(self.snapshot, self.node_id)
+
+    def __eq__(self, other):
+        if isinstance(other, ELSnapshotNode):
+            return other.node_id == self.node_id and other.snapshot is self.snapshot
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash(self.node_id)
+
+    def __setitem__(self, key, value):
+        self.snapshot.immutable()
+
+    def __delitem__(self, key):
+        self.snapshot.immutable()
+
+    def update_value(self, value):
+        self.snapshot.immutable()
+
+    def update_elop(self, elop):
+        self.snapshot.immutable()
+
+
+class ELSnapshotChildren(Mapping):
+    """ The children of a snapshot node, by symbol """
+
+    def __init__(self, snapshot, uuid):
+        self.snapshot = snapshot
+        self.uuid = uuid
+
+    def child_id(self, sym):
+        return self.snapshot.read(self.uuid, lambda x: child_of(x, sym))
+
+    def __getitem__(self, sym):
+        uuid = self.child_id(sym)
+        if uuid is None:
+            raise KeyError(sym)
+        return ELSnapshotNode(self.snapshot, uuid)
+
+    def __contains__(self, sym):
+        return self.child_id(sym) is not None
+
+    def get(self, sym, default=None):
+        uuid = self.child_id(sym)
+        if uuid is None:
+            return default
+        return ELSnapshotNode(self.snapshot, uuid)
+
+    def ids(self):
+        return self.snapshot.read(self.uuid, child_ids)
+
+    def __iter__(self):
+        return iter(self.snapshot.read(self.uuid, child_syms))
+
+    def __len__(self):
+        return self.snapshot.read(self.uuid, lambda x: len(x.children))
+
+    def values(self):
+        return [ELSnapshotNode(self.snapshot, x) for x in self.ids()]
+
+
+def child_of(state, sym):
+    """ The id of a child of a frozen or live node, or None """
+    if isinstance(state, ELFrozenNode):
+        return state.children.get(sym)
+    child = state.children.get(sym)
+    if child is None:
+        return None
+    return child.uuid
+
+def parent_of(state):
+    """ The id of the parent of a frozen or live node, or None """
+    parent = state.parent
+    if parent is None or isinstance(parent, int):
+        return parent
+    return parent.uuid
+
+def child_ids(state):
+    if isinstance(state, ELFrozenNode):
+        return list(state.children.values())
+    return [x.uuid for x in state.children.values()]
+
+def child_syms(state):
+    if isinstance(state, ELFrozenNode):
+        return list(state.children)
+    return [x.sym for x in state.children.values()]
+
+
+class ELSnapshotNodes(Mapping):
+    """ The allNodes index of a snapshot: the nodes reachable from its root """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, uuid):
+        if uuid not in self:
+            raise KeyError(uuid)
+        return ELSnapshotNode(self.snapshot, uuid)
+
+    def __contains__(self, uuid):
+        """ Check a node is reachable, by its chain of parents """
+        snapshot = self.snapshot
+        root = snapshot.trie.root.uuid
+        current = uuid
+        while current != root:
+            if snapshot.state(current) is None:
+                return False
+            parent, sym = snapshot.read(current, lambda x: (parent_of(x), x.sym))
+            if parent is None:
+                return False
+            if snapshot.state(parent) is None or \
+               ELSnapshotChildren(snapshot, parent).child_id(sym) != current:
+                return False
+            current = parent
+        return True
+
+    def __iter__(self):
+        queue = [self.snapshot.root.uuid]
+        while bool(queue):
+            current = queue.pop()
+            yield current
+            queue.extend(ELSnapshotChildren(self.snapshot, current).ids())
+
+    def __len__(self):
+        return sum([1 for x in self])
@@ -0,0 +1,117 @@
+"""
+Incremental splitting of EL source into statements,
+so files can be parsed a statement at a time
+"""
+import logging as root_logger
+import re
+
+logging = root_logger.getLogger(__name__)
+
+#lines without these can be split on commas directly
+SPECIAL_CHARS = re.compile(r'[\[\]()"#]')
+#the grammar's variables swallow following newlines,
+#so a line ending in one continues onto the next
+TRAILING_VAR = re.compile(r'[$@][a-zA-Z0-9]+\s*$')
+OPEN = '[('
+CLOSE = '])'
+
+def EL_STATEMENTS(lines):
+    """ Given an iterable of lines (ie: a file object),
+    yield (line_number, statement_string) for each top level statement.
+    Statements end at a newline or comma outside of brackets, strings and comments,
+    matching the separators of the grammar's ROOT.
+    Memory use depends only on the longest statement.
+    """
+    buffer = []
+    start_line = None
+    depth = 0
+    for line_number, line in enumerate(lines, 1):
+        if start_line is None:
+            start_line = line_number
+        if depth == 0 and SPECIAL_CHARS.search(line) is None:
+            pieces = split_plain_line(line)
+        else:
+            pieces, depth = split_line(line, depth)
+
+        #all but the last piece end in a separator comma:
+        for piece in pieces[:-1]:
+            buffer.append(piece)
+            statement = "".join(buffer)
+            buffer = []
+            if not is_blank(statement):
+                yield (start_line, statement)
+            start_line = line_number
+        buffer.append(pieces[-1])
+
+        if depth > 0 or TRAILING_VAR.search(strip_comment(pieces[-1])) is not None:
+            continue
+        statement = "".join(buffer)
+        first_line = start_line
+        buffer = []
+        start_line = None
+        if not is_blank(statement):
+            yield (first_line, statement)
+
+    statement = "".join(buffer)
+    if not is_blank(statement):
+        yield (start_line, statement)
+
+def split_plain_line(line):
+    """ Split a line without brackets, strings or comments on its commas.
+    A comma touching a following dot isn't a separator in the grammar """
+    if ',' not in line:
+        return [line]
+    pieces = []
+    current = 0
+    for i, char in enumerate(line):
+        if char == ',' and line[i+1:i+2] != '.':
+            pieces.append(line[current:i])
+            current = i + 1
+    pieces.append(line[current:])
+    return pieces
+
+def split_line(line, depth):
+    """ Split a line on top level commas, tracking bracket depth,
+    strings and comments. Returns the pieces and the new depth """
+    pieces = []
+    current = 0
+    in_string = False
+    i = 0
+    length = len(line)
+    while i < length:
+        char = line[i]
+        if in_string:
+            if char == '\\':
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '#':
+            break
+        elif char in OPEN:
+            depth += 1
+        elif char in CLOSE and depth > 0:
+            depth -= 1
+        elif char == ',' and depth == 0 and line[i+1:i+2] != '.':
+            pieces.append(line[current:i])
+            current = i + 1
+        i += 1
+    pieces.append(line[current:])
+    return pieces, depth
+
+def is_blank(text):
+    """ True if a statement is only whitespace and comments """
+    return all([strip_comment(x).strip() == "" for x in text.split('\n')])
+
+def strip_comment(text):
+    """ Remove a trailing comment from a single line statement """
+    if '#' not in text:
+        return text
+    in_string = False
+    for i, char in enumerate(text):
+        if char == '"':
+            in_string = not in_string
+        elif char == '#' and not in_string:
+            return text[:i]
+    return text
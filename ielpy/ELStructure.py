@@ -3,6 +3,7 @@ Internal Structure of EL Statements
 """
 from .ELUtil import EL, ELVARSCOPE, ELOP2STR
 from .ELBinding import ELBindingSlice
+from .ELSymbols import SYMBOLS
 
 ##########
 # Internal Fact Structure
@@ -57,7 +58,8 @@ class ELPAIR(ELSTRUCTURE):
     Does not represent terminals
     """
     def __init__(self, value, elop=EL.DOT, ex=False):
-        self.value = value
+        #sym :: the interned symbol of the value, used as a trie key
+        self.value, self.sym = SYMBOLS.canonical(value)
         if not ex:
             self.elop = elop
         else:
@@ -80,6 +82,16 @@ class ELPAIR(ELSTRUCTURE):
     def __eq__(self, other):
         return self.elop == other.elop and self.value == other.value
 
+    def __getstate__(self):
+        #symbols are only meaningful within a process
+        state = self.__dict__.copy()
+        del state['sym']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.value, self.sym = SYMBOLS.canonical(self.value)
+
     def copy(self):
         try:
             return ELPAIR(self.value.copy(), self.elop)
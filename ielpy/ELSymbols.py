@@ -0,0 +1,144 @@
+"""
+A process wide table interning the atom values of facts into symbols.
+Trie nodes key their children by symbol, and pairs carry the symbol
+of their value, so matching a pair against a node is a dict hit on
+an object hashed by identity, and each distinct string is stored once
+however many nodes hold it.
+
+Symbols follow python equality, as the value keyed dicts did before:
+1, 1.0 and Fraction(1) share a symbol.
+
+The table only holds symbols weakly. Whatever keys by a symbol,
+a node, a pair, a preserved node state, or a timeline, holds it,
+so once nothing does, it is freed, and its integer id can be reused.
+So values that are asserted and retracted, such as counters and timestamps,
+don't accumulate in the table.
+"""
+import logging as root_logger
+import sys
+from threading import Lock
+from weakref import ref
+
+logging = root_logger.getLogger(__name__)
+
+#immutable types whose interned copy can stand in for an equal value
+SHAREABLE = (str, int, float)
+
+
+class ELSymbol:
+    """ The interned symbol of a value. Hashed and compared by identity.
+    id is a small integer, unique among live symbols, for packing into keys """
+    __slots__ = ['id', 'value', '__weakref__']
+
+    def __init__(self, sym_id, value):
+        self.id = sym_id
+        self.value = value
+
+    def __repr__(self):
+        return "ELSymbol({}: {})".format(self.id, repr(self.value))
+
+    def __reduce__(self):
+        #symbols are only meaningful within a process, so unpickle by interning
+        return (intern_symbol, (self.value,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ELSymbolRef(ref):
+    """ The table's weak reference to a symbol, remembering what to free """
+    __slots__ = ['id', 'key']
+
+
+class ELSymbols:
+    """ Interns hashable values into symbols, while they are held """
+
+    def __init__(self):
+        #value -> ELSymbolRef
+        self.ids = {}
+        #ids of freed symbols, for reuse
+        self.free = []
+        self.next_id = 0
+        #refs of symbols that have died, to free under the lock.
+        #Appended to by the weakref callback, which can run in any thread
+        self.dead = []
+        self.lock = Lock()
+
+    def __len__(self):
+        """ The number of live symbols """
+        with self.lock:
+            self.sweep()
+            return len(self.ids)
+
+    def __contains__(self, value):
+        return self.lookup(value) is not None
+
+    def sweep(self):
+        """ Free the ids of dead symbols. Called with the lock held """
+        while bool(self.dead):
+            dead = self.dead.pop()
+            if self.ids.get(dead.key) is dead:
+                del self.ids[dead.key]
+            self.free.append(dead.id)
+
+    def intern(self, value):
+        """ Get the symbol of a value, adding it if necessary """
+        found = self.ids.get(value)
+        if found is not None:
+            sym = found()
+            if sym is not None:
+                return sym
+        with self.lock:
+            self.sweep()
+            found = self.ids.get(value)
+            sym = None if found is None else found()
+            if sym is None:
+                if type(value) is str:
+                    value = sys.intern(value)
+                if bool(self.free):
+                    sym_id = self.free.pop()
+                else:
+                    sym_id = self.next_id
+                    self.next_id += 1
+                sym = ELSymbol(sym_id, value)
+                found = ELSymbolRef(sym, self.dead.append)
+                found.id = sym_id
+                found.key = value
+                self.ids[value] = found
+        return sym
+
+    def lookup(self, value):
+        """ Get the symbol of a value, or None if it isn't interned """
+        try:
+            found = self.ids.get(value)
+        except TypeError:
+            return None
+        if found is None:
+            return None
+        return found()
+
+    def value(self, sym):
+        return sym.value
+
+    def canonical(self, value):
+        """ Intern a value, returning (the shared copy of the value, its symbol).
+        The shared copy is only used for immutable atoms of the same type,
+        so 1.0 stays a float after 1 was interned, and variables keep their scope.
+        Unhashable values, such as arrays, get no symbol """
+        try:
+            sym = self.intern(value)
+        except TypeError:
+            return (value, None)
+        value_type = type(value)
+        if value_type in SHAREABLE and type(sym.value) is value_type:
+            return (sym.value, sym)
+        return (value, sym)
+
+
+SYMBOLS = ELSymbols()
+
+def intern_symbol(value):
+    return SYMBOLS.intern(value)
@@ -0,0 +1,205 @@
+"""
+A timeline of a trie's changes, for queries as of a past step,
+or of whether something held at any step in a range.
+
+Each node keeps its states by the step they were made in,
+and each child symbol of a node keeps the nodes attached under it by step,
+so the trie as of a step is found by binary search on those lists,
+instead of replaying the runtime's history.
+Changes made in the same step replace each other, so a step's state is
+the state at its end.
+
+Queries walk the trie once for a whole range of steps, carrying the steps
+each partial match held for, and narrowing them at each pair.
+A query at a single step is a range of one step.
+"""
+import logging as root_logger
+from bisect import bisect_right
+from .ELBinding import ELBindingFrame, ELBindingSlice
+from .ELStructure import ELPAIR
+from .ELResults import ELFail
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+
+class ELNodeHistory:
+    """ The changes to a node, by step """
+    __slots__ = ['parent', 'steps', 'states', 'children']
+
+    def __init__(self, parent):
+        #parent :: ELNodeId | None, as nodes don't move between parents
+        self.parent = parent
+        #states :: [(value, elop)], each from its step in steps, on
+        self.steps = []
+        self.states = []
+        #children :: { sym : ([step], [(order, ELNodeId) | None]) }
+        self.children = {}
+
+
+class ELTimeline:
+    """ An observer of a trie's structural changes, see ELTrie.enable_timeline.
+    Records each change at the step clock() returns, which must not go backwards """
+
+    def __init__(self, trie, clock):
+        self.trie = trie
+        self.clock = clock
+        #histories :: { ELNodeId : ELNodeHistory }, kept for released nodes
+        self.histories = {}
+        #the order children were attached in, across the trie
+        self.order = 0
+        self.record_subtree(trie.root, clock())
+
+    def __len__(self):
+        return len(self.histories)
+
+    def record(self, steps, entries, step, entry):
+        """ Add an entry from a step on, replacing any entry from the same step """
+        if bool(steps) and steps[-1] == step:
+            entries[-1] = entry
+            return
+        if bool(steps) and step < steps[-1]:
+            raise ELE.ELTrieException("Timeline steps can't go backwards: {} after {}".format(step, steps[-1]))
+        if bool(entries) and entries[-1] == entry:
+            return
+        steps.append(step)
+        entries.append(entry)
+
+    def attach(self, history, node, step):
+        events = history.children.get(node.sym)
+        if events is None:
+            events = history.children[node.sym] = ([], [])
+        self.order += 1
+        self.record(events[0], events[1], step, (self.order, node.uuid))
+
+    def record_subtree(self, node, step):
+        """ Start the histories of a subtree new to the timeline """
+        parent = node.parent
+        queue = [(node, None if parent is None else parent.uuid)]
+        while bool(queue):
+            current, parent = queue.pop()
+            history = ELNodeHistory(parent)
+            self.histories[current.uuid] = history
+            self.record(history.steps, history.states, step, (current.value, current.elop))
+            for child in current.children.values():
+                self.attach(history, child, step)
+            queue.extend([(x, current.uuid) for x in current.children.values()])
+
+    def node_added(self, node):
+        step = self.clock()
+        history = self.histories.get(node.uuid)
+        if history is None:
+            self.record_subtree(node, step)
+        else:
+            #moved to a new value
+            self.record(history.steps, history.states, step, (node.value, node.elop))
+        if node.parent is not None:
+            self.attach(self.histories[node.parent.uuid], node, step)
+
+    def node_removed(self, node):
+        events = self.histories[node.parent.uuid].children[node.sym]
+        self.record(events[0], events[1], self.clock(), None)
+
+    def node_changed(self, node):
+        """ Record a change of a node's elop """
+        history = self.histories[node.uuid]
+        self.record(history.steps, history.states, self.clock(), (node.value, node.elop))
+
+    def periods(self, steps, entries, intervals):
+        """ Yield (start, end, entry) for each entry in effect during the intervals,
+        clipped to them. Intervals are sorted, disjoint, inclusive (start, end) pairs """
+        for start, end in intervals:
+            i = max(bisect_right(steps, start) - 1, 0)
+            while i < len(steps) and steps[i] <= end:
+                period_end = end if i + 1 == len(steps) else min(end, steps[i + 1] - 1)
+                period_start = max(start, steps[i])
+                if period_start <= period_end:
+                    yield (period_start, period_end, entries[i])
+                i += 1
+
+    def state_at(self, uuid, step):
+        """ The (value, elop) of a node at a step, or None before it existed """
+        history = self.histories[uuid]
+        i = bisect_right(history.steps, step) - 1
+        if i < 0:
+            return None
+        return history.states[i]
+
+    def with_elop(self, uuid, elop, intervals):
+        """ Narrow intervals to those the node had an elop in """
+        history = self.histories[uuid]
+        return self.merge([(start, end) for start, end, state
+                           in self.periods(history.steps, history.states, intervals) if state[1] == elop])
+
+    def merge(self, intervals):
+        """ Join sorted intervals that meet """
+        merged = []
+        for start, end in intervals:
+            if bool(merged) and merged[-1][1] + 1 >= start:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def attached(self, history, syms, intervals):
+        """ The children of a node under syms during the intervals,
+        as [(order, ELNodeId, intervals)] in the order they were first attached """
+        #found :: { (sym, ELNodeId) : (order, ELNodeId, [interval]) },
+        #as a node moves between symbols when its value is updated
+        found = {}
+        for sym in syms:
+            events = history.children.get(sym)
+            if events is None:
+                continue
+            for start, end, event in self.periods(events[0], events[1], intervals):
+                if event is None:
+                    continue
+                order, uuid = event
+                if (sym, uuid) in found:
+                    found[(sym, uuid)][2].append((start, end))
+                else:
+                    found[(sym, uuid)] = (order, uuid, [(start, end)])
+        return sorted([(order, uuid, self.merge(sorted(spans)))
+                       for order, uuid, spans in found.values()])
+
+    def sub_get(self, root, el_string, start, end, current_bindings=None):
+        """ Match a sequence of pairs from the node with id root,
+        at any step from start to end inclusive, returning an ELBindingFrame
+        of a slice for each match, as ELTrie.sub_get does """
+        if root not in self.histories:
+            raise ELE.ELTrieException("Node {} isn't in the timeline".format(root))
+        if current_bindings is None:
+            base_bindings = ELBindingSlice()
+        else:
+            base_bindings = ELBindingSlice(current_bindings)
+        results = ELBindingFrame([])
+        length = len(el_string)
+        #stack :: [(ELNodeId, index of the next pair, bound chain, intervals)]
+        stack = [(root, 0, None, [(start, end)])]
+        while bool(stack):
+            current, index, bound, intervals = stack.pop()
+            if index == length:
+                results.append(self.trie.bind_match(base_bindings, bound, current))
+                continue
+            statement = el_string[index]
+            if not isinstance(statement, ELPAIR):
+                raise ELE.ELConsistencyException('Getting something that is not a pair: {}'.format(statement))
+            history = self.histories[current]
+            syms = list(history.children) if statement.isVar() else [statement.sym]
+            branches = self.attached(history, syms, intervals)
+            for order, child, child_intervals in reversed(branches):
+                #as in ELTrie.sub_get, only ground pairs before the last check elops
+                if index + 1 < length and not statement.isVar():
+                    child_intervals = self.with_elop(child, statement.elop, child_intervals)
+                    if not bool(child_intervals):
+                        continue
+                child_bound = bound
+                if statement.isVar():
+                    varKey = statement.value.value
+                    value = self.state_at(child, child_intervals[0][0])[0]
+                    child_bound = (varKey, child, value, bound)
+                stack.append((child, index + 1, child_bound, child_intervals))
+
+        if not bool(results):
+            results = ELBindingFrame([ ELFail() ])
+        return results
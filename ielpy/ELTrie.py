@@ -1,15 +1,20 @@
 """
 A Simple Trie for EL
 """
-import IPython
 import logging as root_logger
+from collections import deque
+from weakref import WeakSet
 from .ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
 from .ELStructure import ELROOT
 from .ELFactStructure import ELFACT, ELPAIR, ELQUERY
-from .ELTrieNode import ELTrieNode
+from .ELTrieNode import ELTrieNode, ELFrozenNode
+from .ELTrieIndex import ELTrieIndex, ELPathIndex
+from .ELTrieStats import ELTrieStats
+from .ELTimeline import ELTimeline
 from .ELResults import ELSuccess, ELFail
+from .ELUtil import EL, ELNodeId
+from .ELSymbols import SYMBOLS
 from . import ELExceptions as ELE
-import uuid
 
 
 logging = root_logger.getLogger(__name__)
@@ -17,15 +22,39 @@ logging = root_logger.getLogger(__name__)
 class ELTrie:
     """ A Simple Python Trie implementation for EL """
     def __init__(self):
+        #root and allNodes, see build_root
+        self.build_root()
+        #secondary indexes, see add_index
+        self.indexes = []
+        #ELPathIndex, see add_path_index
+        self.path_index = None
+        #ELTrieStats, built on first use, see stats
+        self.kept_stats = None
+        #observers :: [obj], told of structural changes through node_added(node),
+        #and node_removed(node), each covering the node's subtree
+        self.observers = []
+        #snapshots, see ELSnapshot
+        self.generation = 0
+        self.snapshots = WeakSet()
+        #frozen :: { ELNodeId : ([generation], [ELFrozenNode]) }
+        self.frozen = {}
+        #ELTimeline, see enable_timeline
+        self.timeline = None
+        #ELVersions, for snapshots read from other threads
+        self.versions = None
+
+
+    def build_root(self):
+        """ Create the root, and the index of nodes by id.
+        Overridden by tries whose nodes are views of other storage """
         #The root element of the trie, everything starts here.
         #Is essentially the opening '.'
         self.root = ELTrieNode('ROOT')
-        #all nodes indexed by uuid
+        #all nodes indexed by their ELNodeId
         self.allNodes = {self.root.uuid : self.root}
-        
 
     def __getitem__(self,key):
-        if isinstance(key, uuid.UUID) and key in self.allNodes:
+        if isinstance(key, ELNodeId) and key in self.allNodes:
             return self.allNodes[key]
         elif key in self.root:
             return self.root[key]
@@ -58,14 +87,217 @@ class ELTrie:
             'leaves'  : leaves,
         }
     
+    def leaves(self):
+        """ Yield the leaves of the trie, breadth first """
+        queue = deque(self.root)
+        while bool(queue):
+            current = queue.popleft()
+            if current.is_empty():
+                yield current
+            else:
+                queue.extend(current)
+
     def is_empty(self):
         return self.root.is_empty()
+
+    def sibling_order(self, node):
+        """ A key ordering a node among its siblings, as a walk visits them.
+        Children are kept in the order they were added, which follows their ids,
+        unless their value has been updated since """
+        return node.uuid
+
+    def new_node(self, value, parent):
+        """ Create a node, and register it by id """
+        node = ELTrieNode(value, parent=parent)
+        self.allNodes[node.uuid] = node
+        return node
+
+    #Structural changes go through these, so observers can follow them,
+    #and removed subtrees are released.
+    #Observers are told of a subtree once it is attached, or once it is detached,
+    #one subtree at a time. A detached node keeps its parent and children.
+    def add_node(self, value, parent):
+        """ Create a child node of parent. An exclusive parent loses its other children """
+        node = self.new_node(value, parent)
+        self.attach(node, parent)
+        return node
+
+    def attach(self, node, parent):
+        """ Add a node, with any subtree, to parent, which loses its other children
+        if it is exclusive. The node's subtree mustn't be attached yet """
+        self.preserve(parent)
+        dropped = []
+        if parent.elop is EL.EX:
+            dropped = list(parent)
+            for child in dropped:
+                self.detach(child)
+        parent[node] = node
+        for child in dropped:
+            self.release(child)
+        self.notify_added(node)
+
+    def set_elop(self, node, elop):
+        """ Change the elop of a node, which clears its children """
+        if node.elop is elop:
+            return
+        self.preserve(node)
+        dropped = list(node)
+        for child in dropped:
+            self.detach(child)
+        node.update_elop(elop)
+        if self.timeline is not None:
+            self.timeline.node_changed(node)
+        for child in dropped:
+            self.release(child)
+
+    def remove_node(self, node):
+        """ Detach a node, and its subtree, from its parent """
+        self.detach(node)
+        self.release(node)
+
+    def update_value(self, node, value):
+        """ Change the value of a node, rekeying it in its parent,
+        where it replaces any sibling with the new value """
+        value, sym = SYMBOLS.canonical(value)
+        if sym is None:
+            raise ELE.ELTrieException("Trie values must be hashable: {}".format(value))
+        self.preserve(node)
+        parent = node.parent
+        sibling = parent.children.get(sym)
+        if sibling is not None and sibling.uuid != node.uuid:
+            self.detach(sibling)
+        else:
+            sibling = None
+        self.detach(node)
+        node.value = value
+        node.sym = sym
+        parent[node] = node
+        if sibling is not None:
+            self.release(sibling)
+        self.notify_added(node)
+
+    def detach(self, node):
+        """ Remove a node from its parent, and tell the observers """
+        self.preserve(node.parent)
+        del node.parent[node]
+        self.notify_removed(node)
+
+    def notify_added(self, node):
+        for observer in self.observers:
+            observer.node_added(node)
+
+    def notify_removed(self, node):
+        for observer in self.observers:
+            observer.node_removed(node)
+
+    def release(self, node):
+        """ Unregister a detached subtree, so it can be freed """
+        self.preserve_subtree(node)
+        queue = [node]
+        while bool(queue):
+            current = queue.pop()
+            self.allNodes.pop(current.uuid, None)
+            queue.extend(current.children.values())
+
+    def preserve(self, node):
+        """ Keep the state of a node before its first change in this generation,
+        for snapshots taken before it """
+        if not bool(self.snapshots):
+            if bool(self.frozen):
+                self.frozen = {}
+            return
+        versions = self.frozen.get(node.uuid)
+        if versions is None:
+            self.frozen[node.uuid] = ([self.generation], [ELFrozenNode(node)])
+        elif versions[0][-1] != self.generation:
+            #states first, as snapshots in other threads search the generations
+            versions[1].append(ELFrozenNode(node))
+            versions[0].append(self.generation)
+
+    def preserve_subtree(self, node):
+        if not bool(self.snapshots):
+            return
+        queue = [node]
+        while bool(queue):
+            current = queue.pop()
+            self.preserve(current)
+            queue.extend(current.children.values())
+
+    def compact(self):
+        """ Release nodes registered in allNodes, but no longer reachable from the root,
+        such as those detached before removals released their subtrees.
+        Returns the number of nodes released """
+        reachable = set()
+        queue = [self.root]
+        while bool(queue):
+            current = queue.pop()
+            reachable.add(current.uuid)
+            queue.extend(current.children.values())
+        orphans = [x for x in self.allNodes if x not in reachable]
+        for uuid in orphans:
+            del self.allNodes[uuid]
+        if self.kept_stats is not None:
+            self.kept_stats.rebuild()
+        logging.info("Compacted trie, released %s orphans", len(orphans))
+        return len(orphans)
+
+    @property
+    def stats(self):
+        """ Counts of nodes, leaves, depths and fanout. Counted from the trie
+        when first read, then kept current as it changes, see ELTrieStats """
+        if self.kept_stats is None:
+            self.kept_stats = ELTrieStats(self)
+            self.kept_stats.rebuild()
+            self.observers.append(self.kept_stats)
+        return self.kept_stats
+
+    def add_index(self, pattern):
+        """ Declare a secondary index of the nodes at the last pair of a pattern,
+        by value, for queries with variables before that pair. ie:
+        .agents.$a.location!$l indexes locations, so .agents.$a.location!market?
+        looks up the market nodes instead of scanning every agent """
+        index = ELTrieIndex(self, pattern)
+        index.node_added(self.root)
+        self.indexes.append(index)
+        self.observers.append(index)
+        return index
         
+    def add_path_index(self):
+        """ Index every node by its full path,
+        so ground queries are a single lookup instead of a walk """
+        if self.path_index is None:
+            self.path_index = ELPathIndex(self)
+            self.path_index.node_added(self.root)
+            self.observers.append(self.path_index)
+        return self.path_index
+
+    def enable_timeline(self, clock):
+        """ Record each change against the step clock() returns,
+        so queries can be made as of a past step, see ELTimeline """
+        if self.timeline is None:
+            self.timeline = ELTimeline(self, clock)
+            self.observers.append(self.timeline)
+        return self.timeline
+
+    def freeze(self, path):
+        """ Write the trie to a file, to open read only with open_frozen.
+        Returns the number of nodes written, see ELMappedTrie """
+        #imported here, as ELMappedTrie extends ELTrie
+        from .ELMappedTrie import write_mapped
+        return write_mapped(self, path)
+
+    @staticmethod
+    def open_frozen(path):
+        """ Map a file written by freeze as a read only trie,
+        which can be queried as any trie, ie: ELRuntime(trie=ELTrie.open_frozen(path)) """
+        from .ELMappedTrie import ELMappedTrie
+        return ELMappedTrie(path)
+
     def push(self,el_string):
         """ Take an ELFact of [ROOT, [PAIRS]],
         and attempt to add to the trie
         """
-        logging.debug("Starting to push: {}".format(repr(el_string)))
+        logging.debug("Starting to push: %r", el_string)
         assert isinstance(el_string, ELFACT)
         assert isinstance(el_string.data[0], ELROOT)
         try:
@@ -75,7 +307,7 @@ class ELTrie:
             for statement in el_string:
                 if isinstance(statement, ELROOT) and current is None:
                     logging.debug("Hit Root")
-                    if isinstance(statement.value, uuid.UUID) and statement.value in self.allNodes:
+                    if isinstance(statement.value, ELNodeId) and statement.value in self.allNodes:
                         current = self.allNodes[statement.value]
                     elif statement.value is None and current is None:
                         current = self.root
@@ -85,20 +317,16 @@ class ELTrie:
                 elif isinstance(statement, ELROOT) and current is not None and \
                      statement not in current:
                     logging.debug("Adding a pseudo-root")
-                    newNode = ELTrieNode(statement, parent=current)
-                    current[newNode] = newNode
-                    self.allNodes[newNode.uuid] = newNode
+                    self.add_node(statement, current)
                 elif isinstance(statement, ELPAIR) and statement not in current:
                     #came to a pair, and it is missing
-                    logging.debug("Missing PAIR: {}".format(repr(statement)))
-                    newNode = ELTrieNode(statement, parent=current)
-                    current[newNode] = newNode
-                    self.allNodes[newNode.uuid] = newNode
+                    logging.debug("Missing PAIR: %r", statement)
+                    self.add_node(statement, current)
                 #for everything but finding the root:
-                logging.debug("-> {}".format(repr(statement)))
+                logging.debug("-> %r", statement)
                 current = current[statement]
                 #update the elop if necessary:
-                current.update_elop(statement.elop)                    
+                self.set_elop(current, statement.elop)
                 
             returnVal = ELSuccess()
         except ELE.ELException as e:
@@ -107,6 +335,91 @@ class ELTrie:
         finally:
             return returnVal
         
+    def push_many(self, facts):
+        """ Push an iterable of ELFacts in order, with the same result as pushing
+        each in turn, but starting each from the end of the prefix it shares
+        with the fact before it, so facts grouped by prefix, such as sorted ones,
+        walk each shared prefix once.
+        The shared nodes can't have changed since the previous fact made or
+        walked them, as a push only changes nodes below those it walks.
+        New subtrees are built before they are attached, once no later fact
+        extends them, so observers are told of each once.
+        Facts from another root go through push """
+        returnVal = ELSuccess()
+        #the previous fact's pairs as (sym, elop), and the nodes they reached
+        path = []
+        nodes = []
+        #pending :: the index in nodes of a new subtree not yet attached
+        pending = None
+        try:
+            for fact in facts:
+                assert isinstance(fact, ELFACT)
+                pairs = fact.data[1:]
+                if fact.data[0].value is not None or not all([isinstance(x, ELPAIR) for x in pairs]):
+                    if pending is not None:
+                        self.attach(nodes[pending], nodes[pending].parent)
+                        pending = None
+                    path = []
+                    nodes = []
+                    if not self.push(fact):
+                        returnVal = ELFail()
+                    continue
+                shared = 0
+                limit = min(len(path), len(pairs))
+                while shared < limit and path[shared][0] == pairs[shared].sym \
+                      and path[shared][1] is pairs[shared].elop:
+                    shared += 1
+                if pending is not None and shared <= pending:
+                    self.attach(nodes[pending], nodes[pending].parent)
+                    pending = None
+                del path[shared:]
+                del nodes[shared:]
+                current = nodes[-1] if bool(nodes) else self.root
+                try:
+                    for pair in pairs[shared:]:
+                        child = current.children.get(pair.sym)
+                        if child is None and pending is None:
+                            pending = len(nodes)
+                            child = self.new_node(pair, current)
+                        elif child is None:
+                            child = self.grow(pair, current)
+                        elif pending is not None and child.elop is not pair.elop:
+                            self.discard_children(child)
+                            child.update_elop(pair.elop)
+                        elif pending is None:
+                            self.set_elop(child, pair.elop)
+                        path.append((pair.sym, pair.elop))
+                        nodes.append(child)
+                        current = child
+                except ELE.ELException as e:
+                    logging.critical(e)
+                    returnVal = ELFail()
+                    if pending is not None:
+                        self.attach(nodes[pending], nodes[pending].parent)
+                        pending = None
+                    path = []
+                    nodes = []
+        finally:
+            #attached even if facts raises partway, so the facts before stay pushed
+            if pending is not None:
+                self.attach(nodes[pending], nodes[pending].parent)
+        return returnVal
+
+    def grow(self, value, parent):
+        """ Add a child to a node not yet attached, see push_many """
+        node = self.new_node(value, parent)
+        if parent.elop is EL.EX and not parent.is_empty():
+            self.discard_children(parent)
+        parent.children[node.sym] = node
+        return node
+
+    def discard_children(self, node):
+        """ Remove the children of a node not yet attached, see push_many """
+        dropped = list(node)
+        for child in dropped:
+            del node[child]
+            self.release(child)
+
     def pop(self,el_string):
         """ Remove an EL String from the Trie """
         returnVal = ELFail()
@@ -121,18 +434,18 @@ class ELTrie:
         if theTarget is None:
             return ELFail()
         
-        target_parent = theTarget.parent
-        
-        del target_parent[theTarget]
+        self.remove_node(theTarget)
         return ELSuccess()
         
         
-    def query(self,query):
-        """ Given an EL String, test the Trie to see if it is true """
+    def query(self,query, at=None, between=None):
+        """ Given an EL String, test the Trie to see if it is true.
+        With a timeline, at=step tests it as of that step,
+        and between=(start, end) tests whether it was true at any step in that range """
         assert isinstance(query[-1], ELQUERY)
         #result :: ELFail | ELSuccess
-        result = self.get(query)
-        logging.debug('Get Result: {}'.format(result))
+        result = self.get(query, at=at, between=between)
+        logging.debug('Get Result: %s', result)
         if isinstance(result, ELSuccess) and not query.negated:
             return result
         elif isinstance(result, ELFail) and query.negated:
@@ -145,8 +458,10 @@ class ELTrie:
             return ELFail()
         
         
-    def get(self,el_string):
+    def get(self,el_string, at=None, between=None):
         assert isinstance(el_string, ELFACT)
+        if at is not None or between is not None:
+            return self.get_during(el_string, at, between)
         if not el_string[0].isVar():
             root = self.root
         elif el_string[0].value in self.allNodes: 
@@ -158,10 +473,35 @@ class ELTrie:
             search_string = el_string[1:-1]
         else:
             search_string = el_string[1:]
-                    
+
+        return self.get_from(root, search_string, el_string.filled_bindings, path=el_string)
+
+    def get_from(self, root, search_string, bindings=None, path=None):
+        """ Match an already resolved sequence of pairs, starting at root.
+        The shared body of get, for callers that hold the pairs themselves
+        """
         #results :: ELBindingFrame< ELBindingSlice | ELFail >
-        results = self.sub_get(root, search_string, el_string.filled_bindings)
-        logging.debug("Sub Get Results: {}".format(results))
+        results = self.sub_get(root, search_string, bindings)
+        return self.success_of(results, path)
+
+    def get_during(self, el_string, at=None, between=None):
+        """ Match a fact against the timeline, as of the step at,
+        or at any step in the inclusive range between """
+        if self.timeline is None:
+            raise ELE.ELTrieException("Querying a past step needs a timeline, see enable_timeline")
+        start, end = (at, at) if between is None else between
+        root = el_string[0].value if el_string[0].isVar() else self.root.uuid
+        if isinstance(el_string[-1], ELQUERY):
+            search_string = el_string[1:-1]
+        else:
+            search_string = el_string[1:]
+        results = self.timeline.sub_get(root, search_string, start, end, el_string.filled_bindings)
+        return self.success_of(results, el_string)
+
+    def success_of(self, results, path=None):
+        """ The result of a frame of matches, which succeeds if it has any """
+        #formatted lazily, as a frame can hold many matches
+        logging.debug("Sub Get Results: %s", results)
         returnVal = ELFail()
         if isinstance(results,list) and not isinstance(results[0], ELFail):
             #verify all bindings are the same:
@@ -169,72 +509,118 @@ class ELTrie:
             firstKeys = results[0].keys()
             allSame = all([firstKeys == bindings.keys() for bindings in results])
             if allSame:
-                returnVal = ELSuccess(path=el_string,
+                returnVal = ELSuccess(path=path,
                                            bindings=results,
                                            nodes=[x.uuid for x in results if x.uuid is not None])
 
         # returnVal :: ELSuccess | ELFail
         return returnVal
                 
-    #the recursive call of get where most of the work goes on
     def sub_get(self, root, el_string, current_bindings=None, new_binding=None):
+        """ Match a sequence of pairs from root, returning an ELBindingFrame
+        of a slice for each match, in depth first order, or of a single ELFail.
+        Walks the pattern by index, with an explicit stack of branches for variables.
+        Bindings are shared between branches as a linked chain of
+        (key, uuid, value, previous), and only copied into a slice on a match
+        """
         assert isinstance(root, ELTrieNode)
         assert isinstance(el_string, list)
+        if self.path_index is not None and new_binding is None and root.uuid == self.root.uuid:
+            key = self.path_index.key(el_string)
+            if key is not None:
+                return self.path_get(key, current_bindings)
+        if bool(self.indexes) and new_binding is None and root.uuid == self.root.uuid:
+            indexed = self.indexed_get(el_string, current_bindings)
+            if indexed is not None:
+                return indexed
         if current_bindings is None:
-            internal_bindings = ELBindingSlice()
+            base_bindings = ELBindingSlice()
         else:
-            internal_bindings = ELBindingSlice(current_bindings)
+            base_bindings = ELBindingSlice(current_bindings)
         if new_binding is not None:
             assert len(new_binding) == 3
-            internal_bindings[new_binding[0]] = ELBindingEntry(*new_binding)
-        current = root
+            base_bindings[new_binding[0]] = ELBindingEntry(*new_binding)
         results = ELBindingFrame([])
-        remaining_string = el_string[:]
-        while len(remaining_string) > 0:
-            statement = remaining_string.pop(0)
-            logging.debug("Sub Getting: {}".format(statement))
-            #if a var
-            if isinstance(statement, ELPAIR) and statement.isVar():
-                logging.debug("Dealing with a Variable")
-                #Trigger a recursion
-                #todo: complain on duplicate keys
-                varKey = statement.value.value
-                for child in current.children.values():
-                    results.extend(self.sub_get(self[child.uuid],
-                                                remaining_string,
-                                                current_bindings=internal_bindings,
-                                                new_binding=(varKey, child.uuid, child.value)))
-                #clear so only the recursions continue
-                remaining_string = []
-                current = None
-            #not a var
-            elif isinstance(statement, ELPAIR) and \
-                 statement in current and \
-                 (len(remaining_string) == 0 or \
-                  statement.elop == current[statement].elop):
-                logging.debug("ELPair matches")
-                current = current[statement]
-            elif isinstance(statement, ELROOT) and statement in current:
-                logging.debug("Retrieved ROOT")
-                current = current[statement]
-            elif not isinstance(statement, ELPAIR):
-                raise ELE.ELConsistencyException('Getting something that is not a pair: {}'.format(statement))
-            else:
-                logging.debug("Failing out")
-                logging.debug("Remaining: {}".format(remaining_string))
-                results.append(ELFail())
-                remaining_string = []
-
-        #cleanup after looping:
-        #remove all ELBD.ELFails
-        containsAFail = any([isinstance(x, ELFail) for x in results])
-        results = ELBindingFrame([x for x in results if not isinstance(x, ELFail)])
-        #if nothing remains, return just an ELFail
-        if len(results) == 0 and containsAFail:
+        length = len(el_string)
+        #stack :: [(node, index of the next pair, bound chain)]
+        stack = [(root, 0, None)]
+        while bool(stack):
+            current, index, bound = stack.pop()
+            while index < length:
+                statement = el_string[index]
+                index += 1
+                if isinstance(statement, ELPAIR):
+                    if statement.isVar():
+                        #branch on every child, the first child on top of the stack
+                        varKey = statement.value.value
+                        for child in reversed(list(current.children.values())):
+                            stack.append((child, index, (varKey, child.uuid, child.value, bound)))
+                        current = None
+                        break
+                    child = current.children.get(statement.sym)
+                    if child is None or (index < length and statement.elop != child.elop):
+                        current = None
+                        break
+                    current = child
+                elif isinstance(statement, ELROOT) and statement in current:
+                    current = current[statement]
+                else:
+                    raise ELE.ELConsistencyException('Getting something that is not a pair: {}'.format(statement))
+            if current is not None:
+                results.append(self.bind_match(base_bindings, bound, current.uuid))
+
+        #a variable over a leaf, like any mismatch, is a failure
+        if not bool(results):
             results = ELBindingFrame([ ELFail() ])
-        elif len(results) == 0:
-            #if successful, store the internal bindings and where this node is
-            results = ELBindingFrame([ ELBindingSlice(internal_bindings, current.uuid) ])
         #Results :: ELBindingFrame
         return results
-        
+
+    def indexed_get(self, el_string, current_bindings=None):
+        """ Match a sequence of pairs from the root using a secondary index,
+        if one covers it and it has variables before the indexed pair.
+        Returns None if no index applies """
+        index = None
+        for candidate in self.indexes:
+            if candidate.covers(el_string) and \
+               any([x.isVar() for x in el_string[:candidate.depth - 1]]):
+                index = candidate
+                break
+        if index is None:
+            return None
+        depth = index.depth
+        last = len(el_string) - 1
+        base_bindings = ELBindingSlice(current_bindings) if current_bindings is not None else ELBindingSlice()
+        results = ELBindingFrame([])
+        for chain in index.candidates(el_string[depth - 1].sym):
+            bindings = ELBindingSlice(base_bindings)
+            for i, (pair, node) in enumerate(zip(el_string, chain)):
+                if pair.isVar():
+                    varKey = pair.value.value
+                    bindings[varKey] = ELBindingEntry(varKey, node.uuid, node.value)
+                elif pair.sym != node.sym or (i < last and pair.elop != node.elop):
+                    break
+            else:
+                matched = self.sub_get(chain[-1], el_string[depth:], current_bindings=bindings)
+                results.extend([x for x in matched if not isinstance(x, ELFail)])
+        if not bool(results):
+            results = ELBindingFrame([ ELFail() ])
+        return results
+
+    def path_get(self, key, current_bindings=None):
+        """ Match a ground path from the root by its key in the path index """
+        node = self.path_index.get(key)
+        if node is None:
+            return ELBindingFrame([ ELFail() ])
+        return ELBindingFrame([ ELBindingSlice(current_bindings, node.uuid) ])
+
+    def bind_match(self, base_bindings, bound, uuid):
+        """ Create the slice of a match, from the base bindings
+        and its chain of bound variables """
+        chain = []
+        while bound is not None:
+            chain.append(bound)
+            bound = bound[3]
+        match = ELBindingSlice(base_bindings, uuid)
+        for key, node_uuid, value, previous in reversed(chain):
+            match[key] = ELBindingEntry(key, node_uuid, value)
+        return match
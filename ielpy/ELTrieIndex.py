@@ -0,0 +1,224 @@
+"""
+Secondary indexes of trie nodes.
+ELTrieIndex holds nodes by value, at a fixed depth under a path pattern.
+An index of .agents.$a.location!$l holds every node at the position of $l
+whose ancestors match agents and location, keyed by its symbol.
+A query such as .agents.$a.location!market? then starts from the market
+nodes and checks their ancestors, instead of scanning every agent.
+
+Indexes observe the trie's structural changes (see ELTrie.add_node),
+and candidates are checked against the trie when used,
+so a node changed behind the trie's back is never wrongly matched.
+
+ELPathIndex holds every node by its full path of symbols and elops,
+so a ground query is a single lookup instead of a walk.
+"""
+import logging as root_logger
+from .ELStructure import ELPAIR
+from .ELUtil import EL
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+
+class ELTrieIndex:
+    """ Nodes at the last pair of a pattern, by symbol """
+
+    def __init__(self, trie, pattern):
+        if pattern[0].isVar():
+            raise ELE.ELConsistencyException("Indexes start at the trie root: {}".format(pattern))
+        self.trie = trie
+        self.source = pattern
+        #pairs :: [ELPAIR], from the root's child to the indexed pair
+        self.pairs = pattern.data[1:]
+        if not bool(self.pairs) or not all([isinstance(x, ELPAIR) for x in self.pairs]) \
+           or not self.pairs[-1].isVar():
+            raise ELE.ELConsistencyException("Indexes need a path ending in a variable: {}".format(pattern))
+        self.depth = len(self.pairs)
+        #entries :: { sym : { ELNodeId : None } }, ordered sets of node ids
+        self.entries = {}
+
+    def __repr__(self):
+        return "ELTrieIndex({})".format(self.source)
+
+    def __len__(self):
+        return sum([len(x) for x in self.entries.values()])
+
+    def at_depth(self, node):
+        """ Get the nodes of node's subtree that are at the indexed depth
+        under a path matching the pattern """
+        chain = []
+        current = node
+        while current.parent is not None:
+            chain.append(current)
+            current = current.parent
+        chain.reverse()
+        depth = len(chain)
+        if depth > self.depth or not self.matches(chain):
+            return []
+        found = []
+        queue = [(node, depth)]
+        while bool(queue):
+            current, current_depth = queue.pop()
+            if current_depth == self.depth:
+                found.append(current)
+                continue
+            pair = self.pairs[current_depth]
+            if pair.isVar():
+                queue.extend([(x, current_depth + 1) for x in current])
+            else:
+                child = current.children.get(pair.sym)
+                if child is not None:
+                    queue.append((child, current_depth + 1))
+        return found
+
+    def matches(self, chain):
+        """ Check a chain of nodes from the root's child has the pattern's ground values """
+        for pair, node in zip(self.pairs, chain):
+            if not pair.isVar() and pair.sym != node.sym:
+                return False
+        return True
+
+    def node_added(self, node):
+        for found in self.at_depth(node):
+            self.entries.setdefault(found.sym, {})[found.uuid] = None
+
+    def node_removed(self, node):
+        for found in self.at_depth(node):
+            nodes = self.entries.get(found.sym)
+            if nodes is None:
+                continue
+            nodes.pop(found.uuid, None)
+            if not bool(nodes):
+                del self.entries[found.sym]
+
+    def covers(self, pattern):
+        """ Check the index holds every node a pattern of pairs could match at its depth """
+        if len(pattern) < self.depth:
+            return False
+        indexed = pattern[self.depth - 1]
+        if not isinstance(indexed, ELPAIR) or indexed.isVar():
+            return False
+        for pair, own in zip(pattern, self.pairs[:-1]):
+            if not isinstance(pair, ELPAIR):
+                return False
+            if not own.isVar() and (pair.isVar() or pair.sym != own.sym):
+                return False
+        return True
+
+    def candidates(self, sym):
+        """ The nodes indexed under a symbol, as chains of nodes from the root's child,
+        in the order a walk of the trie would reach them.
+        Nodes no longer attached to the trie are dropped """
+        nodes = self.entries.get(sym)
+        if nodes is None:
+            return []
+        found = []
+        stale = []
+        for uuid in nodes:
+            chain = self.attached_chain(uuid)
+            if chain is None:
+                stale.append(uuid)
+            else:
+                found.append(chain)
+        for uuid in stale:
+            del nodes[uuid]
+        order = self.trie.sibling_order
+        found.sort(key=lambda chain: [order(x) for x in chain])
+        return found
+
+    def attached_chain(self, uuid):
+        """ Get the chain of nodes from the root's child to a node,
+        or None if it isn't attached to the trie """
+        if uuid not in self.trie.allNodes:
+            return None
+        node = self.trie.allNodes[uuid]
+        chain = []
+        current = node
+        while current.parent is not None:
+            parent = current.parent
+            sibling = parent.children.get(current.sym)
+            if sibling is None or sibling.uuid != current.uuid:
+                return None
+            chain.append(current)
+            current = parent
+        if current.uuid != self.trie.root.uuid or len(chain) != self.depth:
+            return None
+        chain.reverse()
+        return chain
+
+
+class ELPathIndex:
+    """ Every node of a trie, keyed by its path from the root's child.
+    A key is a tuple of ints, (symbol id << 1) | exclusive for each ancestor,
+    then the node's own symbol id, as matching doesn't check the last pair's elop """
+
+    def __init__(self, trie):
+        self.trie = trie
+        #paths :: { path key : node }
+        self.paths = {}
+        #(uuid, key) of the last node added alone, as a push adds a chain of nodes
+        self.last = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def key(self, pairs):
+        """ Get the path key of a sequence of ground pairs,
+        or None if they aren't all ground pairs """
+        if not bool(pairs):
+            return None
+        for pair in pairs:
+            if not isinstance(pair, ELPAIR) or pair.isVar():
+                return None
+        key = [(x.sym.id << 1) | (x.elop is EL.EX) for x in pairs]
+        key[-1] = pairs[-1].sym.id
+        return tuple(key)
+
+    def key_of(self, node):
+        """ Get the path key of a node, which may have just been detached """
+        parent = node.parent
+        if self.last is not None and parent is not None and parent.uuid == self.last[0]:
+            prefix = self.last[1]
+            return prefix[:-1] + ((prefix[-1] << 1) | (parent.elop is EL.EX), node.sym.id)
+        key = [node.sym.id]
+        current = node.parent
+        while current is not None and current.parent is not None:
+            key.append((current.sym.id << 1) | (current.elop is EL.EX))
+            current = current.parent
+        key.reverse()
+        return tuple(key)
+
+    def subtree(self, node):
+        """ Yield (path key, node) for a node and its descendants """
+        if node.parent is None:
+            queue = [((x.sym.id,), x) for x in node]
+        else:
+            queue = [(self.key_of(node), node)]
+        while bool(queue):
+            key, current = queue.pop()
+            yield (key, current)
+            if bool(len(current)):
+                prefix = key[:-1] + ((key[-1] << 1) | (current.elop is EL.EX),)
+                queue.extend([(prefix + (x.sym.id,), x) for x in current])
+
+    def get(self, key):
+        return self.paths.get(key)
+
+    def node_added(self, node):
+        paths = self.paths
+        if node.parent is not None and node.is_empty():
+            key = self.key_of(node)
+            paths[key] = node
+            self.last = (node.uuid, key)
+            return
+        for key, current in self.subtree(node):
+            paths[key] = current
+
+    def node_removed(self, node):
+        paths = self.paths
+        self.last = None
+        for key, current in self.subtree(node):
+            found = paths.get(key)
+            if found is not None and found.uuid == current.uuid:
+                del paths[key]
@@ -1,11 +1,11 @@
 """
 The Node Structure used in ELTrie
 """
-import uuid
-from .ELUtil import EL, ELOP2STR
+from .ELUtil import EL, ELOP2STR, new_node_id
 from .ELStructure import ELPAIR
 from .ELFactStructure import ELFACT
 from .ELFunctions import get_EL_FUNC
+from .ELSymbols import SYMBOLS
 from . import ELExceptions as ELE
 import logging as root_logger
 
@@ -15,27 +15,38 @@ logging = root_logger.getLogger(__name__)
 #----------------------------------------
 class ELTrieNode:
     """ The internal node used for the Trie.
-    Nominally an EL Operator (DOT or EX), and a value, usually a dict
+    Nominally an EL Operator (DOT or EX), and a value, usually a dict.
+    Children are keyed by the interned symbol of their value.
     """
+    #nodes are the bulk of a trie's memory, so they don't get a __dict__
+    __slots__ = ['uuid', 'elop', 'value', 'sym', 'parent', 'children']
 
     def __init__(self, val, parent=None):
-        self.uuid = uuid.uuid1()
+        #uuid :: ELNodeId
+        self.uuid = new_node_id()
         #Default to Dot, update later if necessary
         #Add an int time step stack, and then index elop, value, child edges by it
         #so self.change_time_steps: [0, 4, 6, 7, 8]
         self.elop = EL.DOT
-        self.value = None
         self.parent = parent
+        #children :: { sym : ELTrieNode }
         self.children = {}
-        if isinstance(val, ELPAIR):
+        if isinstance(val, ELPAIR) and val.sym is not None:
             self.elop = val.elop
             self.value = val.value
+            self.sym = val.sym
+        elif isinstance(val, ELPAIR):
+            self.elop = val.elop
+            self.value, self.sym = SYMBOLS.canonical(val.value)
         else:
-            self.value = val
+            self.value, self.sym = SYMBOLS.canonical(val)
+        if self.sym is None:
+            raise ELE.ELTrieException("Trie values must be hashable: {}".format(self.value))
 
     def update_value(self,value):
+        """ Change the value of the node, rekeying it in its parent """
         del self.parent[self]
-        self.value = value
+        self.value, self.sym = SYMBOLS.canonical(value)
         self.parent[self] = self
             
     def child_value(self):
@@ -67,7 +78,7 @@ class ELTrieNode:
     def __repr__(self):
         return "EL_Trie_Node({},{} > {})".format(repr(self.value), \
                                                  repr(self.elop), \
-                                                 repr(self.children.keys()))
+                                                 repr([x.value for x in self.children.values()]))
 
     def __str__(self):
         """ Get the Str representation, treating this
@@ -95,33 +106,34 @@ class ELTrieNode:
         else: #else compare to the internal vaue
             return self.value == other
 
+    def key_of(self, key):
+        """ Get the child symbol for a node, pair, or raw value """
+        if isinstance(key, (ELTrieNode, ELPAIR)):
+            return key.sym
+        return SYMBOLS.lookup(key)
+
     def __delitem__(self, key):
-        if isinstance(key, ELTrieNode):
-            del self.children[key.value]
-        elif isinstance(key, ELPAIR):
-            del self.children[key.value]
-        else:
-            del self.children[key]
+        try:
+            del self.children[self.key_of(key)]
+        except KeyError:
+            raise KeyError(key)
 
 
     def __getitem__(self, key):
-        logging.info("Getting: {}".format(key))
-        if isinstance(key, ELTrieNode):
-            return self.children[key.value]
-        elif isinstance(key, ELPAIR):
-            return self.children[key.value]
-        else:
-            return self.children[key]
+        try:
+            return self.children[self.key_of(key)]
+        except KeyError:
+            raise KeyError(key)
 
     def __setitem__(self, key, value):
         assert isinstance(value, ELTrieNode)
-        logging.info("Setting: {}".format(key))
+        logging.debug("Setting: %s", key)
         #an exclusion removes all else
         if self.elop == EL.EX:
             self.children.clear()
         #now process the key val pair:
         if isinstance(key, ELTrieNode) and isinstance(value, ELTrieNode): 
-            self.children[key.value] = value
+            self.children[key.sym] = value
             value.parent = self
         else:
             raise ELE.ELConsistencyException('Setting a TrieNode requires passing in a trie node')
@@ -132,18 +144,7 @@ class ELTrieNode:
             self.elop = elop
             
     def __contains__(self, key):
-        result = False
-        if isinstance(key, ELTrieNode):
-            result = key.value in self.children
-        if isinstance(key, ELPAIR):
-            #check the key is right, and the elop is right
-            logging.debug("TrieNode: {}".format(key.value in self.children))
-            logging.debug("{}".format(list(self.children.keys())))
-            result = key.value in self.children
-        else:
-            result = key in self.children
-        logging.debug("TrieNode __contains__: {} --- {}".format(result, key))
-        return result
+        return self.key_of(key) in self.children
 
 
     def values(self):
@@ -199,4 +200,18 @@ class ELTrieNode:
         a = set([x for x in self.children.keys()])
         b = set([x for x in other.children.keys()])
         return a.issuperset(b)
-    
+
+
+class ELFrozenNode:
+    """ The preserved state of a node, with its children by id """
+    __slots__ = ['uuid', 'value', 'elop', 'sym', 'parent', 'children']
+
+    def __init__(self, node):
+        self.uuid = node.uuid
+        self.value = node.value
+        self.elop = node.elop
+        self.sym = node.sym
+        parent = node.parent
+        self.parent = None if parent is None else parent.uuid
+        #children :: { sym : ELNodeId }, in the node's order
+        self.children = { x.sym : x.uuid for x in node.children.values() }
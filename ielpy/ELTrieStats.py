@@ -0,0 +1,159 @@
+"""
+Statistics of a trie, kept current as it changes,
+so reading them doesn't need a traversal.
+
+Counts the attached nodes and leaves (not counting the root),
+the nodes at each depth, the nodes with each number of children,
+and the leaves under each internal node.
+"""
+import logging as root_logger
+
+logging = root_logger.getLogger(__name__)
+
+
+class ELTrieStats:
+    """ An observer of a trie's structural changes, see ELTrie.add_node """
+
+    def __init__(self, trie):
+        self.trie = trie
+        self.nodes = 0
+        self.leaves = 0
+        #depths :: [number of nodes], by depth, the root at 0
+        self.depths = [1]
+        #fanout :: { number of children : number of nodes }
+        self.fanout = { 0 : 1 }
+        #under :: { ELNodeId : leaves in its subtree }, for internal nodes
+        self.under = {}
+        #(uuid, depth) of the last node added alone, as a push adds a chain of nodes
+        self.last = None
+
+    def __repr__(self):
+        return "ELTrieStats(nodes: {}, leaves: {}, max depth: {})".format(self.nodes, self.leaves,
+                                                                        self.max_depth())
+
+    def max_depth(self):
+        return len(self.depths) - 1
+
+    def max_fanout(self):
+        return max(self.fanout)
+
+    def mean_fanout(self):
+        """ The mean number of children of internal nodes """
+        internal = self.nodes + 1 - self.fanout.get(0, 0)
+        if internal == 0:
+            return 0
+        return self.nodes / internal
+
+    def leaves_under(self, node):
+        """ The number of leaves in a node's subtree """
+        if node.uuid in self.under:
+            return self.under[node.uuid]
+        if node.parent is None:
+            return 0
+        return 1
+
+    def depth_of(self, node):
+        parent = node.parent
+        if self.last is not None and parent is not None and parent.uuid == self.last[0]:
+            return self.last[1] + 1
+        depth = 0
+        while parent is not None:
+            depth += 1
+            parent = parent.parent
+        return depth
+
+    def bump(self, counts, key, amount):
+        counts[key] = counts.get(key, 0) + amount
+        if counts[key] == 0:
+            del counts[key]
+
+    def count(self, node, depth, sign):
+        """ Add (sign 1) or remove (sign -1) a subtree's nodes from the counts,
+        returning (the number of nodes, the number of leaves) """
+        depths = self.depths
+        under = self.under
+        nodes = 0
+        leaves = 0
+        #an internal node is revisited after its children, to total its leaves
+        queue = [(node, depth, None)]
+        while bool(queue):
+            current, current_depth, leaves_before = queue.pop()
+            if leaves_before is not None:
+                if sign > 0:
+                    under[current.uuid] = leaves - leaves_before
+                else:
+                    under.pop(current.uuid, None)
+                continue
+            nodes += 1
+            children = len(current)
+            if current_depth == len(depths):
+                depths.append(0)
+            depths[current_depth] += sign
+            self.bump(self.fanout, children, sign)
+            if children == 0:
+                leaves += 1
+                continue
+            queue.append((current, current_depth, leaves))
+            queue.extend([(x, current_depth + 1, None) for x in current])
+        return (nodes, leaves)
+
+    def node_added(self, node):
+        depth = self.depth_of(node)
+        if node.is_empty():
+            #a new leaf, as a push adds
+            if depth == len(self.depths):
+                self.depths.append(0)
+            self.depths[depth] += 1
+            self.fanout[0] = self.fanout.get(0, 0) + 1
+            self.nodes += 1
+            leaves = 1
+            self.last = (node.uuid, depth)
+        else:
+            nodes, leaves = self.count(node, depth, 1)
+            self.nodes += nodes
+        parent = node.parent
+        self.reparent(parent, len(parent) - 1, len(parent), leaves)
+
+    def node_removed(self, node):
+        self.last = None
+        nodes, leaves = self.count(node, self.depth_of(node), -1)
+        self.nodes -= nodes
+        depths = self.depths
+        while len(depths) > 1 and depths[-1] <= 0:
+            depths.pop()
+        parent = node.parent
+        self.reparent(parent, len(parent) + 1, len(parent), -leaves)
+
+    def reparent(self, parent, before, after, leaves):
+        """ Update the counts of a parent whose children went from before to after,
+        and of its ancestors, for a subtree with a (signed) number of leaves """
+        self.bump(self.fanout, before, -1)
+        self.bump(self.fanout, after, 1)
+        #the change to the number of leaves above the parent:
+        change = leaves
+        if parent.parent is not None and before == 0:
+            #the parent stops being a leaf
+            change -= 1
+        elif parent.parent is not None and after == 0:
+            #the parent becomes a leaf
+            change += 1
+        self.leaves += change
+        under = self.under
+        if after == 0:
+            under.pop(parent.uuid, None)
+        else:
+            under[parent.uuid] = under.get(parent.uuid, 0) + leaves
+        current = parent.parent
+        while current is not None:
+            under[current.uuid] = under.get(current.uuid, 0) + change
+            current = current.parent
+
+    def rebuild(self):
+        """ Recount everything from the trie, such as after changes made behind its back """
+        self.__init__(self.trie)
+        self.depths = []
+        self.fanout = {}
+        root = self.trie.root
+        nodes, leaves = self.count(root, 0, 1)
+        self.nodes = nodes - 1
+        self.leaves = leaves if bool(len(root)) else 0
@@ -2,6 +2,8 @@
 Utilities for ielpy
 """
 from enum import Enum
+from itertools import count
+from threading import Lock
 from .ELFunctions import ELCOMP, ELARITH
 from . import ELExceptions as ELE
 
@@ -17,6 +19,35 @@ ELVARSCOPE = Enum('ELVARSCOPE', 'EXIS FORALL')
 #Execution Types:
 ELEXT = Enum('EL_Ex_t','TRIE TREE FSM SEL INS')
 
+##############################
+# Node Ids
+####################
+class ELNodeId(int):
+    """ The id of a trie node. A distinct type so ids can be told apart
+    from integer values in facts, while hashing and comparing as plain ints """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "NodeId({})".format(int(self))
+
+#Monotonic source of node ids, shared by every trie in the process.
+#Replaced to reserve blocks, so only used under the lock
+NODE_IDS = count(1)
+NODE_IDS_LOCK = Lock()
+
+def new_node_id():
+    with NODE_IDS_LOCK:
+        return ELNodeId(next(NODE_IDS))
+
+def reserve_node_ids(amount):
+    """ Take a contiguous block of node ids, returning the first.
+    For tries that derive ids from storage positions instead of holding them """
+    global NODE_IDS
+    with NODE_IDS_LOCK:
+        first = next(NODE_IDS)
+        NODE_IDS = count(first + amount)
+    return first
+
 ##############################
 # Enum Utilities
 ####################
@@ -0,0 +1,78 @@
+"""
+Multi-version reads of a trie, for queries from other threads
+while one thread changes it.
+
+A reader pins a version of the trie, an ELSnapshot taken in O(1),
+and queries it without locking, while the writer carries on.
+The lock is held by the writer for each change, and by readers only
+to pin or release a version, so readers never wait on each other,
+and the writer only waits on a pin, not on reads.
+
+Preserved states are dropped once no pinned version can see them, see reclaim.
+The writer reclaims them after a number of versions are pinned that grows
+with the nodes preserved, so the cost of reclaiming is constant per pin.
+"""
+import logging as root_logger
+from bisect import bisect_right
+from contextlib import contextmanager
+from threading import Lock
+from .ELSnapshot import ELSnapshot
+
+logging = root_logger.getLogger(__name__)
+
+#reclaim after at least this many versions are pinned,
+#or a fraction 1 / RECLAIM_RATIO of the nodes preserved
+MIN_RECLAIM = 64
+RECLAIM_RATIO = 16
+
+
+class ELVersions:
+    """ The versions of a trie pinned by readers """
+
+    def __init__(self, trie):
+        self.trie = trie
+        self.lock = Lock()
+        #the generation to reclaim at
+        self.reclaim_at = trie.generation + MIN_RECLAIM
+        trie.versions = self
+
+    def __len__(self):
+        return len(self.trie.snapshots)
+
+    def pin(self):
+        """ Get the current version of the trie, which doesn't change.
+        Use it as a context manager, or release it, when done """
+        with self.lock:
+            return ELSnapshot(self.trie)
+
+    @contextmanager
+    def write(self):
+        """ Hold the trie for a change """
+        with self.lock:
+            yield
+            if self.trie.generation >= self.reclaim_at:
+                self.reclaim()
+                self.reclaim_at = self.trie.generation + \
+                    max(MIN_RECLAIM, len(self.trie.frozen) // RECLAIM_RATIO)
+
+    def reclaim(self):
+        """ Drop the preserved states older than every pinned version, with the lock held.
+        A version sees the first state preserved in a later generation,
+        so states preserved up to the oldest version's generation are unused.
+        Returns the number of nodes no longer preserved """
+        frozen = self.trie.frozen
+        oldest = min([x.generation for x in self.trie.snapshots], default=None)
+        if oldest is None:
+            self.trie.frozen = {}
+            return len(frozen)
+        dropped = 0
+        for uuid, (generations, states) in list(frozen.items()):
+            unused = bisect_right(generations, oldest)
+            if unused == len(generations):
+                del frozen[uuid]
+                dropped += 1
+            elif unused > 0:
+                #replaced whole, as readers may be searching the old lists
+                frozen[uuid] = (generations[unused:], states[unused:])
+        logging.debug("Reclaimed %s preserved nodes, %s kept", dropped, len(frozen))
+        return dropped
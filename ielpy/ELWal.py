@@ -0,0 +1,233 @@
+"""
+A write ahead log of a runtime's changes, for recovery after a crash.
+See ELRuntime.enable_wal, checkpoint and recover.
+
+Each change the runtime makes, an assertion, retraction, arithmetic update,
+or reload pruning, is appended as a record once it is applied,
+so recovery loads the last checkpoint, then replays the records after it.
+Records are numbered by the runtime, and a checkpoint's dump holds the number
+of the last record it includes, so records are never applied twice.
+Node ids don't survive a restart, so facts rooted at a node,
+and nodes updated or removed, are recorded by their path from the root.
+
+Records are marshalled, and framed by their length and crc32,
+so a record torn by a crash ends the log, and is cut off when it is next opened.
+
+Durability is chosen by a level:
+    SYNC: each record is written and fsynced before the change returns.
+    GROUP: records are written and fsynced together by a background thread,
+    within window seconds of the first of them, so a crash of the machine
+    loses at most that window of changes.
+    OS: each record is written to the operating system before the change returns,
+    which survives the process crashing, but not the machine.
+"""
+import logging as root_logger
+import marshal
+import os
+import struct
+from enum import Enum
+from threading import Condition, Lock, Thread
+from zlib import crc32
+from .ELSerialise import encode, decode, encode_fact_data, T_FACT, MARSHAL_VERSION
+from .ELStructure import ELROOT
+from .ELUtil import ELNodeId
+from . import ELExceptions as ELE
+
+logging = root_logger.getLogger(__name__)
+
+ELDURABILITY = Enum('ELDURABILITY', 'OS GROUP SYNC')
+#seconds to gather records before a group commit
+DEFAULT_WINDOW = 0.01
+#length and crc32 of each record
+FRAME = struct.Struct('<II')
+#kinds of record, after its number, where a path or fact is
+#the elops of its components as bytes, and their encoded values:
+#(n, W_FACT, negated, elops, values), (n, W_UPDATE, elops, values, encoded value),
+#(n, W_REMOVE, elops, values)
+W_FACT, W_UPDATE, W_REMOVE = range(3)
+ROOT = encode(ELROOT())
+
+##############################
+# Records
+####################
+def path_of(node):
+    """ The flattened [elop, value...] pairs from the root to a node """
+    pairs = []
+    while node.parent is not None:
+        pairs.append(encode(node.value))
+        pairs.append(node.elop.value)
+        node = node.parent
+    pairs.reverse()
+    return pairs
+
+def split(flat):
+    """ Flattened [elop, value...] pairs as (elops, values), which marshal smaller """
+    return (bytes(flat[0::2]), flat[1::2])
+
+def join(elops, values):
+    flat = [None] * (2 * len(values))
+    flat[0::2] = elops
+    flat[1::2] = values
+    return flat
+
+def fact_record(fact, trie):
+    """ A record of a fact to assert or retract, without its root.
+    A fact rooted at a node is recorded from the trie's root, by the node's path """
+    data = fact.data
+    if not isinstance(data[0], ELROOT):
+        raise ELE.ELConsistencyException("Logging a fact without a root: {}".format(fact))
+    if isinstance(data[0].value, ELNodeId):
+        if data[0].value not in trie.allNodes:
+            raise ELE.ELConsistencyException("Issue with the root: {}".format(fact))
+        flat = path_of(trie.allNodes[data[0].value]) + encode_fact_data(data[1:])
+    else:
+        flat = encode_fact_data(data[1:])
+    return (W_FACT, fact.negated) + split(flat)
+
+def update_record(path, value):
+    return (W_UPDATE,) + split(path) + (encode(value),)
+
+def remove_record(node):
+    return (W_REMOVE,) + split(path_of(node))
+
+def find(trie, values):
+    """ The node at a path of encoded values, or None """
+    node = trie.root
+    for value in values:
+        value = decode(value)
+        if value not in node:
+            return None
+        node = node[value]
+    return node
+
+def replay(runtime, record):
+    """ Apply a record to a runtime, which isn't logging """
+    kind = record[1]
+    if kind == W_FACT:
+        fact = decode((T_FACT, record[2], [0, ROOT] + join(record[3], record[4]), []))
+        if fact.negated:
+            runtime.fact_retract(fact)
+        else:
+            runtime.fact_assert(fact)
+        return
+    node = find(runtime.trie, record[3])
+    if node is None:
+        raise ELE.ELConsistencyException("Logged change {} is to a missing node".format(record[0]))
+    if kind == W_UPDATE:
+        runtime.trie.update_value(node, decode(record[4]))
+    else:
+        runtime.trie.remove_node(node)
+
+
+
+class ELWal:
+    """ An append only log of changes, see ELRuntime.enable_wal """
+
+    def __init__(self, path, durability=ELDURABILITY.GROUP, window=DEFAULT_WINDOW):
+        self.path = path
+        self.durability = durability
+        self.window = window
+        #pending :: [bytes], framed records waiting for a group commit
+        self.pending = []
+        self.waiting = Condition()
+        #held to write or sync the file
+        self.io = Lock()
+        self.file = None
+        self.flusher = None
+        self.closed = False
+
+    def __repr__(self):
+        return "ELWal({}, {})".format(self.path, self.durability.name)
+
+    def records(self):
+        """ Read the records in the log, cutting off a record torn by a crash """
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        found = []
+        position = 0
+        while position + FRAME.size <= len(data):
+            length, checksum = FRAME.unpack_from(data, position)
+            start = position + FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or crc32(payload) != checksum:
+                break
+            try:
+                found.append(marshal.loads(payload))
+            except (EOFError, ValueError, TypeError):
+                break
+            position = start + length
+        if position < len(data):
+            logging.warning("Cutting off %s bytes of a torn record from %s",
+                            len(data) - position, self.path)
+            with open(self.path, 'r+b') as f:
+                f.truncate(position)
+                f.flush()
+                os.fsync(f.fileno())
+        return found
+
+    def open(self):
+        """ Start appending to the log """
+        self.file = open(self.path, 'ab')
+        if self.durability is ELDURABILITY.GROUP:
+            self.flusher = Thread(target=self.group_commits, daemon=True)
+            self.flusher.start()
+
+    def append(self, record):
+        """ Add a numbered record, durable as the log's level promises """
+        payload = marshal.dumps(record, MARSHAL_VERSION)
+        frame = FRAME.pack(len(payload), crc32(payload)) + payload
+        if self.durability is ELDURABILITY.GROUP:
+            with self.waiting:
+                self.pending.append(frame)
+                if len(self.pending) == 1:
+                    self.waiting.notify()
+            return
+        with self.io:
+            self.file.write(frame)
+            self.file.flush()
+            if self.durability is ELDURABILITY.SYNC:
+                os.fsync(self.file.fileno())
+
+    def group_commits(self):
+        """ Write and sync pending records, a window after the first arrives """
+        while True:
+            with self.waiting:
+                while not bool(self.pending) and not self.closed:
+                    self.waiting.wait()
+                if self.closed:
+                    return
+                #gather whatever else arrives in the window
+                self.waiting.wait(self.window)
+            self.flush()
+
+    def flush(self):
+        """ Write and sync every pending record now """
+        with self.io:
+            with self.waiting:
+                pending = self.pending
+                self.pending = []
+            if bool(pending):
+                self.file.write(b''.join(pending))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def truncate(self):
+        """ Empty the log, once a checkpoint holds its records """
+        self.flush()
+        with self.io:
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """ Sync any pending records, and stop logging """
+        if self.file is None or self.closed:
+            return
+        with self.waiting:
+            self.closed = True
+            self.waiting.notify()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        self.file.close()
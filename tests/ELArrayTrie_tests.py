@@ -0,0 +1,150 @@
+"""
+	Testing of the array backed trie storage engine.
+	Reruns the trie and runtime tests against it.
+"""
+import unittest
+import logging as root_logger
+import ELTrie_tests
+import ELRuntime_tests
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELArrayTrie import ELArrayTrie, ELArrayNode, BLOCK_SIZE
+from ielpy.ELTrie import ELTrie
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELUtil import EL, ELNodeId, new_node_id, reserve_node_ids
+from threading import Event, Thread
+
+
+class ELArrayTrie_Trie_Tests(ELTrie_tests.ELParser_Tests):
+
+    def setUp(self):
+        self.trie = ELArrayTrie()
+
+
+class ELArrayTrie_Runtime_Tests(ELRuntime_tests.ELRuntime_Tests):
+
+    def setUp(self):
+        self.runtime = ELR(trie=ELArrayTrie())
+
+
+class ELArrayTrie_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = ELArrayTrie()
+
+    def test_nodes_are_views(self):
+        self.trie.push(ELFACT(r=True).pair('a').pair('b'))
+        node = self.trie.root['a']['b']
+        self.assertIsInstance(node, ELArrayNode)
+        self.assertIs(self.trie.root['a']['b'], node)
+        self.assertEqual(node.value, 'b')
+        self.assertEqual(str(node), '.a.b')
+        self.assertEqual(len(self.trie), 3)
+
+    def test_has_base_trie_state(self):
+        """ Check the engine keeps all the state a base trie has """
+        for name, value in vars(ELTrie()).items():
+            self.assertTrue(hasattr(self.trie, name), name)
+        self.assertIsInstance(self.trie.root, ELArrayNode)
+        self.assertIn(self.trie.root.uuid, self.trie.allNodes)
+        self.assertEqual(len(self.trie.allNodes), 1)
+
+    def test_ids_across_blocks(self):
+        """ Check node ids resolve once they span several reserved blocks """
+        for i in range(BLOCK_SIZE + 10):
+            self.trie.push(ELFACT(r=True).pair('a').pair(i))
+        last = self.trie.root['a'][BLOCK_SIZE + 9]
+        self.assertIsInstance(last.uuid, ELNodeId)
+        self.assertIs(self.trie[last.uuid], last)
+        self.assertNotIn(ELNodeId(last.uuid + 1), self.trie.allNodes)
+        #another trie's nodes don't resolve:
+        other = ELArrayTrie()
+        self.assertNotIn(last.uuid, other.allNodes)
+        self.assertNotIn(other.root.uuid, self.trie.allNodes)
+
+    def test_exact_values_kept(self):
+        """ Check values sharing a symbol keep their own type """
+        self.trie.push(ELFACT(r=True).pair('a').pair(1))
+        self.trie.push(ELFACT(r=True).pair('b').pair(1.0))
+        self.assertIsInstance(self.trie.root['a'][1].value, int)
+        self.assertIsInstance(self.trie.root['b'][1].value, float)
+
+    def test_removal_unlinks_siblings(self):
+        for x in ['a', 'b', 'c', 'd']:
+            self.trie.push(ELFACT(r=True).pair(x))
+        self.assertTrue(self.trie.pop(ELFACT(r=True).pair('b')))
+        self.assertTrue(self.trie.pop(ELFACT(r=True).pair('d')))
+        self.assertEqual([x.value for x in self.trie.root], ['a', 'c'])
+        self.assertEqual(len(self.trie.root), 2)
+        self.trie.push(ELFACT(r=True).pair('b'))
+        self.assertEqual([x.value for x in self.trie.root], ['a', 'c', 'b'])
+
+    def test_exclusion_clears_children(self):
+        self.trie.push(ELFACT(r=True).pair('a').pair('b'))
+        self.trie.push(ELFACT(r=True).pair('a').pair('c'))
+        self.trie.push(ELFACT(r=True).epair('a').pair('d'))
+        self.assertEqual([x.value for x in self.trie.root['a']], ['d'])
+        self.assertEqual(self.trie.root['a'].elop, EL.EX)
+
+    def test_matches_object_trie(self):
+        """ Check both engines hold the same facts after the same runtime actions """
+        statements = ['.a.b.c', '.a.b.d', '.c!e.f', '.x.y.$z?', '~.a.b.c', '.c!g',
+                      '.n.1', '.n.2d5', '.a.b.e.[1, 2, 3]', '~.a.b.e.2', '.a.b.$x?']
+        runtimes = [ELR(), ELR(trie=ELArrayTrie())]
+        for runtime in runtimes:
+            for statement in statements:
+                runtime(statement)
+        self.assertEqual(sorted(str(runtimes[0]).split('\n')),
+                         sorted(str(runtimes[1]).split('\n')))
+
+
+    def test_released_slots_are_reused(self):
+        """ Check removed slots are reused under fresh ids, and old ids don't resolve """
+        self.trie.push(ELFACT(r=True).pair('a').pair('b'))
+        old = self.trie.root['a']['b']
+        old_id = old.uuid
+        self.trie.pop(ELFACT(r=True).pair('a').pair('b'))
+        self.assertIsNone(old.trie)
+        self.trie.push(ELFACT(r=True).pair('a').pair('c'))
+        new = self.trie.root['a']['c']
+        self.assertEqual(len(self.trie.parents), 3)
+        self.assertNotEqual(new.uuid, old_id)
+        self.assertNotIn(old_id, self.trie.allNodes)
+        self.assertIs(self.trie[new.uuid], new)
+        self.assertEqual(list(self.trie.allNodes), [self.trie.root.uuid, self.trie.root['a'].uuid, new.uuid])
+
+    def test_reserved_ids_are_unique_across_threads(self):
+        """ Check ids taken one at a time in another thread never fall in a reserved block """
+        taken = []
+        blocks = []
+        done = Event()
+        def take():
+            while not done.is_set():
+                taken.append(new_node_id())
+        thread = Thread(target=take)
+        thread.start()
+        try:
+            for i in range(200):
+                blocks.append(reserve_node_ids(1000))
+        finally:
+            done.set()
+            thread.join()
+        reserved = set()
+        for first in blocks:
+            reserved.update(range(first, first + 1000))
+        self.assertEqual(len(reserved), 200 * 1000)
+        self.assertEqual(len(set(taken)), len(taken))
+        self.assertTrue(reserved.isdisjoint(taken))
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELArrayTrie.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+	Testing of parallel bulk loading
+"""
+import unittest
+import logging as root_logger
+import os
+import shutil
+import tempfile
+from test_context import ielpy
+from ielpy import ELExceptions as ELE
+from ielpy import ELRuntime as ELR
+
+
+class ELBulkLoader_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = ELR()
+        self.directory = tempfile.mkdtemp()
+    def tearDown(self):
+        self.runtime = None
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_parallel_load(self):
+        """ Check files are parsed in workers and all statements ingested """
+        first = self.write_file('first.el', "\n".join([".agents.a{}.energy!{}".format(chr(97 + x % 26), x)
+                                                       for x in range(100)]))
+        second = self.write_file('second.el', ".institution.rules.[ .a.b.$x?, .a.c ]\n.a.b.c\n")
+        stats = self.runtime.load_files([first, second], workers=2, chunk_size=7)
+        self.assertEqual(stats['statements'], 102)
+        self.assertEqual(stats['chunks'], 15)
+        for stage in ['split', 'parse', 'ingest']:
+            self.assertIn('statements_per_second', stats[stage])
+        self.assertTrue(self.runtime('.institution.rules.a.c?'))
+        self.assertTrue(self.runtime('.a.b.c?'))
+
+    def test_ordered_ingestion(self):
+        """ Check exclusions and retractions apply in source order across chunks """
+        text = "\n".join([".a!{}".format(x) for x in range(50)] +
+                         [".b.c.d", "~.b.c", ".b.e"])
+        path = self.write_file('ordered.el', text)
+        self.runtime.load_files([path], workers=3, chunk_size=4)
+        self.assertTrue(self.runtime('.a!49?'))
+        self.assertTrue(self.runtime('~.a.48?'))
+        self.assertTrue(self.runtime('~.b.c?'))
+        self.assertTrue(self.runtime('.b.e?'))
+
+    def test_local_load_matches_sequential(self):
+        """ Check loading without workers gets the same trie as load_file """
+        text = ".a.b.c, .a.d!e\n.a.d!f\n.x.[1,2,3]\n"
+        path = self.write_file('local.el', text)
+        self.runtime.load_files([path], workers=0)
+        sequential = ELR()
+        sequential.load_file(path)
+        self.assertEqual(str(self.runtime), str(sequential))
+
+    def test_parse_error_location(self):
+        """ Check a parse error in a worker reports its file and line """
+        path = self.write_file('broken.el', ".a.b\n.a.b.\n")
+        with self.assertRaises(ELE.ELParseException) as cm:
+            self.runtime.load_files([path], workers=1)
+        self.assertIn('broken.el: line 2', str(cm.exception))
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELBulkLoader.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
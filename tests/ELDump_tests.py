@@ -0,0 +1,122 @@
+"""
+	Testing of saving and loading a runtime's trie as a binary dump
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import logging as root_logger
+from fractions import Fraction
+from random import Random
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELUtil import new_node_id
+from ielpy import ELExceptions as ELE
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement(rng):
+    pairs = "." + str(rng.choice(VALUES)) + "".join([rng.choice(['.', '.', '.', '!']) + str(rng.choice(VALUES))
+                                                     for x in range(int(rng.random() * 4))])
+    if rng.random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+QUERIES = ['.$x?', '.$x.$y?', '.a.$x!$y?', '.a.b.c?', '.$x!$y.$z?', '~.b.$x?', '.c!a?']
+
+def describe(runtime, query):
+    result = runtime.trie.query(runtime.parser(query)[0])
+    if not bool(result):
+        return None
+    return [(None if x.uuid is None else str(runtime.trie[x.uuid]),
+             sorted([(k, v.value) for k, v in x.items()])) for x in result.bindings]
+
+
+class ELDump_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "runtime.eld")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_random_tries_load_as_saved(self):
+        """ Check loaded runtimes hold the same facts, in the same order, as were saved """
+        rng = Random(11)
+        for trial in range(10):
+            for engine in [ELTrie, ELArrayTrie]:
+                runtime = ELR(trie=engine())
+                for i in range(40):
+                    runtime(random_statement(rng))
+                runtime.save(self.path)
+                loaded = ELR.load(self.path)
+                self.assertEqual(str(loaded), str(runtime))
+                for query in QUERIES:
+                    self.assertEqual(describe(loaded, query), describe(runtime, query))
+                self.assertEqual(loaded.num_nodes(), runtime.num_nodes())
+                self.assertEqual(loaded.num_leaves(), runtime.num_leaves())
+                self.assertEqual(loaded.max_depth(), runtime.max_depth())
+                self.assertEqual(loaded.trie.stats.fanout, runtime.trie.stats.fanout)
+                self.assertEqual(loaded.trie.stats.depths, runtime.trie.stats.depths)
+                self.assertEqual(sorted(loaded.trie.stats.under.values()),
+                                 sorted(runtime.trie.stats.under.values()))
+                self.assertEqual(len(loaded.trie.allNodes), runtime.num_nodes() + 1)
+
+    def test_loaded_runtimes_carry_on(self):
+        runtime = ELR()
+        runtime('.a.b!c, .a.d.1/3, .a.d.-2d5, .a.d."some text"')
+        runtime.step = 5
+        self.assertEqual(runtime.save(self.path), 8)
+        loaded = ELR.load(self.path)
+        self.assertEqual(loaded.step, 5)
+        self.assertTrue(loaded('.a.d.1/3?'))
+        self.assertTrue(loaded('.a.d.-2d5?'))
+        self.assertTrue(loaded('.a.d."some text"?'))
+        self.assertIsInstance(loaded.get_location('.a.d.1/3?').value, Fraction)
+        #loaded nodes are in allNodes, and keep their ids apart from new nodes
+        for uuid, node in loaded.trie.allNodes.items():
+            self.assertEqual(node.uuid, uuid)
+        self.assertLess(max(loaded.trie.allNodes), new_node_id())
+        loaded('.a.b!e, .a.f')
+        self.assertFalse(loaded('.a.b!c?'))
+        self.assertTrue(loaded('.a.b!e?'))
+        self.assertEqual(len(loaded.trie.allNodes), 9)
+        loaded('~.a.d')
+        self.assertEqual(loaded.num_nodes(), 4)
+
+    def test_empty(self):
+        ELR().save(self.path)
+        loaded = ELR.load(self.path)
+        self.assertTrue(loaded.trie.is_empty())
+        self.assertEqual(loaded.num_nodes(), 0)
+
+    def test_bad_files(self):
+        runtime = ELR()
+        runtime('.a.b.c')
+        runtime.save(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(ELE.ELSerialiseException):
+            ELR.load(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(b'not a dump')
+        with self.assertRaises(ELE.ELSerialiseException):
+            ELR.load(self.path)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELDump.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
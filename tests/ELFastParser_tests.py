@@ -0,0 +1,147 @@
+"""
+	Differential testing of the fast path parser against the full grammar
+"""
+import unittest
+import logging as root_logger
+from random import random, choice
+from test_context import ielpy
+from ielpy import ELParser
+from ielpy import ELExceptions as ELE
+from ielpy.ELFastParser import ELFASTPARSE
+from ielpy.ELStructure import ELVAR, ELPAIR, ELROOT, ELQUERY
+from ielpy.ELFactStructure import ELFACT
+from fractions import Fraction
+
+gen_n = lambda: 1 + int(random()*10)
+
+def ir_signature(ir):
+    """ A structural description of parsed IR, covering
+    the fields that __eq__ and __repr__ skip """
+    if isinstance(ir, ELFACT):
+        return ('FACT', ir.negated,
+                tuple(ir_signature(x) for x in ir.data),
+                tuple(ir_signature(x) for x in ir.bindings),
+                tuple(sorted(ir.filled_bindings.keys())))
+    elif isinstance(ir, ELROOT):
+        return ('ROOT', ir.elop, ir_signature(ir.value))
+    elif isinstance(ir, ELPAIR):
+        return ('PAIR', ir.elop, ir_signature(ir.value))
+    elif isinstance(ir, ELVAR):
+        return ('VAR', ir.value, ir.access_point, ir.is_path_var, ir.scope)
+    elif isinstance(ir, ELQUERY):
+        return ('QUERY',)
+    elif isinstance(ir, list):
+        return tuple(ir_signature(x) for x in ir)
+    else:
+        return (type(ir).__name__, ir)
+
+def gen_element():
+    return choice([lambda: choice(['a', 'blah', 'AgentS', 'x']),
+                   lambda: str(int(random() * 1000)),
+                   lambda: "-{}".format(int(random() * 1000)),
+                   lambda: "{}d{}".format(int(random() * 10), int(random() * 100)),
+                   lambda: "{}/{}".format(gen_n(), gen_n()),
+                   lambda: "1_000_{}".format(int(random() * 900) + 100),
+                   lambda: '"a string {}"'.format(gen_n()),
+                   lambda: "$v{}".format(gen_n()),
+                   lambda: "@v{}".format(gen_n())])()
+
+def gen_statement():
+    pairs = "".join(["{}{}".format(gen_element(), choice(['.', '!'])) for x in range(gen_n())])
+    negation = choice(['', '', '~'])
+    query = choice(['', '?'])
+    return "{}.{}{}{}".format(negation, pairs, gen_element(), query)
+
+
+class ELFastParser_Tests(unittest.TestCase):
+
+    def assertSameIR(self, string):
+        fast = ELFASTPARSE(string)
+        self.assertIsNotNone(fast, string)
+        full = ELParser.ELPARSE(string, fast_path=False)
+        self.assertEqual(ir_signature(fast), ir_signature(full), string)
+
+    def test_simple(self):
+        """ Check the fast parser handles a basic assertion """
+        result = ELFASTPARSE('.a.b.c')
+        self.assertEqual(len(result), 1)
+        self.assertIsInstance(result[0], ELFACT)
+        self.assertSameIR('.a.b.c')
+
+    def test_subset_statements(self):
+        """ Check hand picked statements in the subset match the grammar """
+        statements = ['.a', '.a.b!c.5', '.a.$x.b?', '~.a.b.c', '~.a.b?',
+                      '.a.b.-5', '.a.1d5', '.a.1/5', '.a.10_000', '.a."a string".b',
+                      '.a!$x!@y?', '.$x.b', '.a.b.c\n.d.e.f', '.a.b, .c.d',
+                      '.a.b\t,\t.c.d', '  .a.b  \n\n  .c!d?  ', '# comment\n.a.b # trailing\n.c',
+                      '.a.b,', '.a.b,\n.c', '.a.$1.b?', '.a.b.c\n']
+        for statement in statements:
+            self.assertSameIR(statement)
+
+    def test_generated_statements(self):
+        """ Check randomly generated statements match the grammar """
+        accepted = 0
+        for x in range(200):
+            statement = "\n".join([gen_statement() for y in range(gen_n())])
+            fast = ELFASTPARSE(statement)
+            if fast is None:
+                continue
+            accepted += 1
+            full = ELParser.ELPARSE(statement, fast_path=False)
+            self.assertEqual(ir_signature(fast), ir_signature(full), statement)
+        self.assertGreater(accepted, 100)
+
+    def test_variable_swallows_newlines(self):
+        """ Check the grammar's joining of lines after a variable
+        is left to the grammar """
+        self.assertIsNone(ELFASTPARSE('.a.$x\n.c'))
+        self.assertEqual(len(ELParser.ELPARSE('.a.$x\n.c')), 1)
+        self.assertIsNone(ELFASTPARSE('.a.$x\n~.c'))
+        with self.assertRaises(ELE.ELParseException):
+            ELParser.ELPARSE('.a.$x\n~.c')
+        self.assertSameIR('.a.$x, ~.c')
+        self.assertSameIR('.a.$x?\n~.c')
+
+    def test_fallbacks(self):
+        """ Check statements outside the subset are left to the grammar """
+        statements = ['.a.b.[1,2,3]', '.a.b.c + 20', '$x <- .a.b', '$..x.b',
+                      '.a.b.$x(1)', '.a.b.c.{ .a? -> .b }', '.a. b', '.a.b ?',
+                      '.a,.b', '.a.b.', '', '# just a comment', '.a5', '.a.5d',
+                      '.a."escaped \\" string"', '.a.b\r\n', '.a.b .c', '~ .a',
+                      '.a.b,#comment', '.a.b, #comment\n', '.a.b,\n#comment\n']
+        for statement in statements:
+            self.assertIsNone(ELFASTPARSE(statement), statement)
+
+    def test_fallback_still_parses(self):
+        """ Check ELPARSE falls back to the grammar for the full language """
+        result = ELParser.ELPARSE('.a.b.[1,2,3]')
+        self.assertEqual(len(result[0].expand()), 3)
+
+    def test_fallback_errors(self):
+        """ Check invalid strings still raise the grammar's parse error """
+        with self.assertRaises(ELE.ELParseException):
+            ELParser.ELPARSE('.a.b.')
+        with self.assertRaises(ELE.ELParseException):
+            ELParser.ELPARSE('.a,.b')
+        with self.assertRaises(ELE.ELParseException):
+            ELParser.ELPARSE('.a.b,#comment')
+
+    def test_query_vars_match(self):
+        """ Check queries carry the same variable copies as the grammar """
+        fast = ELFASTPARSE('.a.@x.$y?')[0]
+        full = ELParser.ELPARSE('.a.@x.$y?', fast_path=False)[0]
+        self.assertEqual(len(fast.bindings), len(full.bindings))
+        self.assertEqual([x.scope for x in fast.bindings], [x.scope for x in full.bindings])
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELFastParser.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
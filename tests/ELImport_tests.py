@@ -0,0 +1,77 @@
+"""
+	Testing of the import time of the package, and lazy grammar construction
+"""
+import unittest
+import logging as root_logger
+import os
+import subprocess
+import sys
+from test_context import ielpy
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(ielpy.__file__)))
+#seconds, measured around the import itself, not interpreter startup:
+IMPORT_BUDGET = float(os.environ.get('ELPY_IMPORT_BUDGET', 0.25))
+RUNS = 3
+
+def run_fresh(code):
+    """ Run code in a new interpreter, returning its stdout """
+    result = subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return result.stdout.strip()
+
+IMPORT_CHECK = """
+import sys, time
+start = time.perf_counter()
+import ielpy
+print(time.perf_counter() - start)
+print('pyparsing' in sys.modules, 'IPython' in sys.modules, 'ielpy.ELGrammar' in sys.modules)
+"""
+
+class ELImport_Tests(unittest.TestCase):
+
+    def test_import_budget(self):
+        """ Check importing the package stays within the time budget """
+        times = [float(run_fresh(IMPORT_CHECK).split('\n')[0]) for x in range(RUNS)]
+        self.assertLess(min(times), IMPORT_BUDGET,
+                        "import ielpy took {:.3f}s".format(min(times)))
+
+    def test_import_is_lazy(self):
+        """ Check the grammar, pyparsing and IPython aren't loaded on import """
+        flags = run_fresh(IMPORT_CHECK).split('\n')[1]
+        self.assertEqual(flags, 'False False False')
+
+    def test_fast_path_stays_lazy(self):
+        """ Check plain statements parse without building the grammar """
+        output = run_fresh("import sys, ielpy\n"
+                           "ielpy.ELPARSE('.a.b.c, .a.b!d?')\n"
+                           "print('ielpy.ELGrammar' in sys.modules)")
+        self.assertEqual(output, 'False')
+
+    def test_grammar_built_on_demand(self):
+        """ Check the grammar is built for the first statement that needs it """
+        output = run_fresh("import sys, ielpy\n"
+                           "result = ielpy.ELPARSE('.a.b.[1,2,3]')\n"
+                           "print('ielpy.ELGrammar' in sys.modules, len(result[0].expand()))")
+        self.assertEqual(output, 'True 3')
+
+    def test_grammar_components_accessible(self):
+        """ Check grammar components can still be reached through ELParser """
+        from ielpy import ELParser
+        self.assertIsNotNone(ELParser.ROOT)
+        self.assertIsNotNone(ELParser.NON_PATH_VAR)
+        with self.assertRaises(AttributeError):
+            ELParser.NOT_A_GRAMMAR_COMPONENT
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELImport.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+	Testing of join based query evaluation over binding frames
+"""
+import unittest
+import logging as root_logger
+from random import random, choice, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELJoin import ELJoin, ELFactoredProbe
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
+from ielpy.ELResults import ELSuccess
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_fact():
+    pairs = "".join([".{}".format(choice(VALUES)) if random() < 0.8 else "!{}".format(choice(VALUES))
+                     for x in range(2 + int(random() * 3))])
+    return ".p" + pairs
+
+def random_query(names):
+    pairs = "".join([choice(['.', '.', '!']) + ("${}".format(choice(names)) if random() < 0.5
+                                                 else str(choice(VALUES)))
+                     for x in range(1 + int(random() * 4))])
+    return ".p" + pairs + "?"
+
+def describe(result):
+    """ The content of a query result, comparable across evaluations """
+    if not bool(result):
+        return None
+    slices = [(x.uuid, [(k, v.uuid, v.value) for k, v in x.items()]) for x in result.bindings]
+    return (slices, list(result.nodes))
+
+def probe_each(runtime, query, frame):
+    """ The reference evaluation, binding the query to each slice """
+    return [runtime.trie.query(query.bind(x)) for x in frame]
+
+
+class CountingTrie(ELTrie):
+    """ Counts the walks the matcher starts """
+
+    def __init__(self):
+        super().__init__()
+        self.walks = 0
+
+    def sub_get(self, root, el_string, current_bindings=None, new_binding=None):
+        self.walks += 1
+        return super().sub_get(root, el_string, current_bindings, new_binding)
+
+
+class ELJoin_Tests(unittest.TestCase):
+
+    def query_both(self, runtime, query, frame):
+        parsed = runtime.parser(query)[0]
+        runtime.use_joins = False
+        probed = runtime.fact_query(parsed, frame)
+        runtime.use_joins = True
+        joined = runtime.fact_query(parsed, frame)
+        return probed, joined
+
+    def test_random_joins_match_probing(self):
+        """ Check joining gives the same results, in the same order, as probing each slice """
+        seed(3)
+        joined_count = 0
+        for trial in range(40):
+            runtime = ELR(trie=ELArrayTrie() if trial % 2 else None)
+            for i in range(30):
+                runtime(random_fact())
+            first = runtime.parser(choice(['.p.$x?', '.p.$x.$y?', '.p.$x!$y?', '.p.a.$x?']))[0]
+            frame = runtime.fact_query(first, ELBindingFrame())
+            if not bool(frame) or len(frame.bindings) < 2:
+                continue
+            for i in range(10):
+                query = random_query(['x', 'y', 'z'])
+                if ELJoin(runtime.trie, runtime.parser(query)[0]).results(frame.bindings) is not None:
+                    joined_count += 1
+                probed, joined = self.query_both(runtime, query, frame.bindings)
+                self.assertEqual(describe(probed), describe(joined), query)
+                negated, negated_joined = self.query_both(runtime, "~" + query, frame.bindings)
+                self.assertEqual(describe(negated), describe(negated_joined), query)
+        self.assertGreater(joined_count, 50)
+
+    def test_join_filters_by_shared_variable(self):
+        runtime = ELR()
+        for statement in ['.person.bob', '.person.alice', '.person.carol',
+                          '.likes.bob.cake', '.likes.alice.tea', '.likes.alice.cake']:
+            runtime(statement)
+        people = runtime.fact_query(runtime.parser('.person.$x?')[0], ELBindingFrame())
+        result = runtime.fact_query(runtime.parser('.likes.$x.$y?')[0], people.bindings)
+        pairs = [(x['x'].value, x['y'].value) for x in result.bindings]
+        self.assertEqual(pairs, [('bob', 'cake'), ('alice', 'tea'), ('alice', 'cake')])
+
+    def test_unjoinable_queries_probe(self):
+        runtime = ELR()
+        runtime('.a.b.c')
+        frame = ELBindingFrame([ELBindingSlice({ 'x' : ELBindingEntry('x', None, 'b') }) for i in range(3)])
+        for query in ['.a.$x.$x?', '.a.@x?', '$..x.b?']:
+            join = ELJoin(runtime.trie, runtime.parser(query)[0])
+            self.assertFalse(join.joinable, query)
+            self.assertIsNone(join.results(frame))
+        join = ELJoin(runtime.trie, runtime.parser('.a.$x.c?')[0])
+        self.assertIsNotNone(join.results(frame))
+        #a single slice is cheaper to probe:
+        self.assertIsNone(join.results(ELBindingFrame([frame[0]])))
+
+    def test_expensive_join_probes(self):
+        """ Check a join that would enumerate much more than the slices need falls back """
+        runtime = ELR()
+        for i in range(200):
+            for j in range(20):
+                runtime('.a.{}.{}'.format(i, j))
+        frame = ELBindingFrame([ELBindingSlice({ 'x' : ELBindingEntry('x', None, i) }) for i in range(2)])
+        join = ELJoin(runtime.trie, runtime.parser('.a.$x.$y?')[0])
+        self.assertIsNone(join.results(frame))
+        probed, joined = self.query_both(runtime, '.a.$x.$y?', frame)
+        self.assertEqual(describe(probed), describe(joined))
+
+    def test_random_factored_probes_match_probing(self):
+        """ Check the factored probe gives the same results as binding each slice """
+        seed(5)
+        compared = 0
+        for trial in range(40):
+            runtime = ELR(trie=ELArrayTrie() if trial % 2 else None)
+            for i in range(30):
+                runtime(random_fact())
+            first = runtime.parser(choice(['.p.$x?', '.p.$x.$y?', '.p.a.$x?', '.p.$x.$x?']))[0]
+            frame = runtime.fact_query(first, ELBindingFrame())
+            if not bool(frame):
+                continue
+            for i in range(10):
+                query = runtime.parser(choice(['', '~']) + random_query(['x', 'y', 'z']))[0]
+                expected = probe_each(runtime, query, frame.bindings)
+                actual = ELFactoredProbe(runtime.trie, query).results(frame.bindings)
+                self.assertEqual([describe(x) for x in expected], [describe(x) for x in actual], str(query))
+                compared += len(expected)
+        self.assertGreater(compared, 500)
+
+    def test_factored_probe_root_variables(self):
+        runtime = ELR()
+        for statement in ['.a.b.c', '.a.b.d', '.a.e.c', '.x.b.c']:
+            runtime(statement)
+        frame = runtime.fact_query(runtime.parser('.$x?')[0], ELBindingFrame()).bindings
+        #root variables are bound to node ids:
+        frame = ELBindingFrame([ELBindingSlice({ 'y' : ELBindingEntry('y', x.uuid, x.uuid) }) for x in frame])
+        query = runtime.parser('$..y.b.$z?')[0]
+        expected = probe_each(runtime, query, frame)
+        actual = ELFactoredProbe(runtime.trie, query).results(frame)
+        self.assertEqual([describe(x) for x in expected], [describe(x) for x in actual])
+        self.assertEqual(len([x for x in actual if bool(x)]), 2)
+
+    def test_factored_probe_shares_walks(self):
+        """ Check slices binding the same values share one walk """
+        runtime = ELR(trie=CountingTrie())
+        for i in range(20):
+            runtime('.likes.{}.{}'.format(i % 4, i))
+        frame = ELBindingFrame([ELBindingSlice({ 'x' : ELBindingEntry('x', None, i % 4),
+                                                 'n' : ELBindingEntry('n', None, i) })
+                                for i in range(100)])
+        query = runtime.parser('.likes.$x.$y?')[0]
+        runtime.trie.walks = 0
+        results = ELFactoredProbe(runtime.trie, query).results(frame)
+        self.assertEqual(runtime.trie.walks, 4)
+        self.assertEqual([describe(x) for x in results],
+                         [describe(x) for x in probe_each(runtime, query, frame)])
+        #entries aren't shared between slices:
+        self.assertIsNot(results[0].bindings[0]['y'], results[4].bindings[0]['y'])
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELJoin.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+	Testing of frozen tries, read in place from a mapped file
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import logging as root_logger
+from fractions import Fraction
+from random import Random
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELMappedTrie import ELMappedTrie, equivalents
+from ielpy import ELExceptions as ELE
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement(rng):
+    pairs = "." + str(rng.choice(VALUES)) + "".join([rng.choice(['.', '.', '.', '!']) + str(rng.choice(VALUES))
+                                                     for x in range(int(rng.random() * 4))])
+    if rng.random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+QUERIES = ['.$x?', '.$x.$y?', '.a.$x!$y?', '.a.b.c?', '.$x!$y.$z?', '~.b.$x?', '.c!a?', '.1.$x?']
+
+def describe(runtime, query):
+    result = runtime.trie.query(runtime.parser(query)[0])
+    if not bool(result):
+        return None
+    #node ids differ in a frozen trie, so matches are described by path
+    return [(None if x.uuid is None else str(runtime.trie[x.uuid]),
+             sorted([(k, v.value) for k, v in x.items()])) for x in result.bindings]
+
+
+class ELMappedTrie_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "trie.elm")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_random_tries_answer_as_before(self):
+        """ Check frozen tries answer queries as the tries they were written from """
+        rng = Random(7)
+        for trial in range(10):
+            for engine in [ELTrie, ELArrayTrie]:
+                runtime = ELR(trie=engine())
+                for i in range(40):
+                    runtime(random_statement(rng))
+                runtime.trie.freeze(self.path)
+                with ELTrie.open_frozen(self.path) as frozen:
+                    frozen_runtime = ELR(trie=frozen)
+                    for query in QUERIES:
+                        self.assertEqual(describe(frozen_runtime, query), describe(runtime, query))
+                    self.assertEqual([str(x) for x in frozen.leaves()],
+                                     [str(x) for x in runtime.trie.leaves()])
+                    self.assertEqual(frozen_runtime.num_nodes(), runtime.num_nodes())
+                    self.assertEqual(frozen_runtime.num_leaves(), runtime.num_leaves())
+                    self.assertEqual(frozen_runtime.max_depth(), runtime.max_depth())
+                    self.assertEqual(frozen.stats.fanout, runtime.trie.stats.fanout)
+
+    def test_nodes(self):
+        runtime = ELR()
+        runtime('.a.b!c, .a.d.e, .f')
+        runtime.trie.freeze(self.path)
+        frozen = ELTrie.open_frozen(self.path)
+        self.assertEqual(len(frozen), 7)
+        node = ELR(trie=frozen).get_location('.a.b!c?')
+        self.assertEqual(node.value, 'c')
+        self.assertEqual(node.parent.value, 'b')
+        self.assertEqual(str(node), '.a.b!c')
+        self.assertIn(node.uuid, frozen.allNodes)
+        self.assertEqual(frozen[node.uuid], node)
+        self.assertEqual([x.value for x in frozen.root['a']], ['b', 'd'])
+        self.assertTrue('c' in frozen.root['a']['b'])
+        self.assertFalse('z' in frozen.root['a'])
+        self.assertEqual(frozen.stats.leaves_under(frozen.root['a']), 2)
+        frozen.close()
+
+    def test_values(self):
+        runtime = ELR()
+        runtime('.a.1, .a.2d5, .a.1/3, .a.-4, .a."some text"')
+        runtime.trie.freeze(self.path)
+        with ELTrie.open_frozen(self.path) as frozen:
+            frozen_runtime = ELR(trie=frozen)
+            self.assertEqual(sorted([str(x) for x in frozen.leaves()]),
+                             sorted([str(x) for x in runtime.trie.leaves()]))
+            for value in ['1', '2d5', '1/3', '-4', '"some text"']:
+                self.assertTrue(frozen_runtime('.a.{}?'.format(value)))
+            self.assertFalse(frozen_runtime('.a.3?'))
+            #equal values of other types share a symbol:
+            self.assertTrue(frozen.root['a'][1.0] is not None)
+            self.assertIn(True, equivalents(1))
+            self.assertIn(Fraction(5, 2), equivalents(2.5))
+
+    def test_frozen_tries_cant_change(self):
+        runtime = ELR()
+        runtime('.a.b')
+        runtime.trie.freeze(self.path)
+        with ELTrie.open_frozen(self.path) as frozen:
+            frozen_runtime = ELR(trie=frozen)
+            with self.assertRaises(ELE.ELConsistencyException):
+                frozen_runtime('.a.c')
+            with self.assertRaises(ELE.ELConsistencyException):
+                frozen_runtime('~.a.b')
+            with self.assertRaises(ELE.ELConsistencyException):
+                frozen.root['a'].update_value('c')
+            self.assertTrue(frozen_runtime('.a.b?'))
+
+    def test_freeze_over_an_open_frozen_trie(self):
+        """ Check freezing to the path of an open frozen trie leaves it readable """
+        runtime = ELR()
+        runtime.assert_many([".a.{}.b.{}".format(i, i) for i in range(2000)])
+        runtime.trie.freeze(self.path)
+        with ELTrie.open_frozen(self.path) as frozen:
+            replacement = ELR()
+            replacement('.c.d')
+            replacement.trie.freeze(self.path)
+            self.assertTrue(ELR(trie=frozen)('.a.1998.b.1998?'))
+            with ELTrie.open_frozen(self.path) as refrozen:
+                self.assertTrue(ELR(trie=refrozen)('.c.d?'))
+                self.assertFalse(ELR(trie=refrozen)('.a?'))
+        self.assertEqual(os.listdir(self.dir), ['trie.elm'])
+
+    def test_has_base_trie_state(self):
+        """ Check frozen tries keep all the state a base trie has """
+        runtime = ELR()
+        runtime('.a.b')
+        runtime.trie.freeze(self.path)
+        with ELTrie.open_frozen(self.path) as frozen:
+            for name, value in vars(ELTrie()).items():
+                self.assertTrue(hasattr(frozen, name), name)
+            self.assertEqual(frozen.stats.nodes, 2)
+
+    def test_not_a_frozen_trie(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(256))
+        with self.assertRaises(ELE.ELTrieException):
+            ELMappedTrie(self.path)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELMappedTrie.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
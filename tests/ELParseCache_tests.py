@@ -0,0 +1,113 @@
+"""
+	Testing of the bounded parse cache
+"""
+import unittest
+import logging as root_logger
+from test_context import ielpy
+from ielpy import ELParser
+from ielpy import ELExceptions as ELE
+from ielpy import ELRuntime as ELR
+from ielpy.ELParseCache import ELParseCache
+from ielpy.ELFastParser import ELFASTPARSE
+from ielpy.ELFactStructure import ELFACT
+
+
+class ELParseCache_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ELParseCache(ELParser.ELPARSE, maxsize=2)
+    def tearDown(self):
+        self.cache = None
+
+    def test_simple(self):
+        """ Check the cache is constructed empty """
+        self.assertIsNotNone(self.cache)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    def test_hits_and_misses(self):
+        """ Check repeated strings are served from the cache """
+        first = self.cache('.a.b.c')
+        second = self.cache('.a.b.c')
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(repr(first), repr(second))
+        self.assertIn('.a.b.c', self.cache)
+
+    def test_eviction(self):
+        """ Check the least recently used string is evicted """
+        self.cache('.a')
+        self.cache('.b')
+        self.cache('.a')
+        self.cache('.c')
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertIn('.a', self.cache)
+        self.assertNotIn('.b', self.cache)
+
+    def test_returned_copies_are_independent(self):
+        """ Check mutating a returned IR doesn't corrupt the cache """
+        first = self.cache('.a.b.[1,2]')[0]
+        first.pair('corrupted')
+        first.data[1].value = 'changed'
+        second = self.cache('.a.b.[1,2]')[0]
+        self.assertEqual(str(second), '.a.b.[1, 2]')
+        self.assertEqual(len(second.expand()), 2)
+
+    def test_parse_errors_not_cached(self):
+        """ Check a failing parse raises each time, and isn't stored """
+        with self.assertRaises(ELE.ELParseException):
+            self.cache('.a.b.')
+        with self.assertRaises(ELE.ELParseException):
+            self.cache('.a.b.')
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_disabled_cache(self):
+        """ Check a cache of size 0 stores nothing """
+        cache = ELParseCache(ELParser.ELPARSE, maxsize=0)
+        cache('.a.b')
+        cache('.a.b')
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_fast_strings_not_cached(self):
+        """ Check strings the fast parser accepts are parsed afresh, not cached """
+        cache = ELParseCache(ELParser.ELPARSE, fast_func=ELFASTPARSE)
+        first = cache('.a.b.$x?')
+        second = cache('.a.b.$x?')
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(repr(first), repr(second))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.fast, 2)
+        cache('.a.b.[1,2]')
+        cache('.a.b.[1,2]')
+        self.assertIn('.a.b.[1,2]', cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_runtime_uses_cache(self):
+        """ Check the runtime routes its parsing through the cache """
+        runtime = ELR()
+        runtime('.a.b.[1, 2]')
+        runtime('.a.b.[1, 2]')
+        self.assertEqual(runtime.parser.hits, 1)
+        runtime('.a.b.c')
+        self.assertTrue(runtime('.a.b.$x?'))
+        self.assertTrue(runtime.get_location('.a.b?'))
+        self.assertTrue(runtime.get_location('.a.b?'))
+        self.assertEqual(runtime.parser.hits, 1)
+        self.assertEqual(runtime.parser.misses, 1)
+        self.assertEqual(runtime.parser.fast, 4)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELParseCache.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+	Testing of incremental reloading of edited files
+"""
+import unittest
+import logging as root_logger
+import os
+import shutil
+import tempfile
+from random import random, choice, randrange, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy import ELExceptions as ELE
+
+NAMES = ['a', 'b', 'c', 'd']
+
+def gen_statement():
+    pairs = "".join(["{}{}".format(choice(NAMES), choice(['.', '.', '!'])) for x in range(randrange(1, 4))])
+    negation = '~' if random() < 0.15 else ''
+    if random() < 0.15:
+        #arrays assert several paths from one statement
+        return ".{}[{}, {}]".format(pairs, choice(NAMES), choice(NAMES))
+    return "{}.{}{}".format(negation, pairs, choice(NAMES))
+
+def leaves(runtime):
+    return sorted(str(runtime).split('\n'))
+
+
+class ELReload_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'facts.el')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, lines):
+        with open(self.path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def assertMatchesFreshLoad(self, runtime):
+        fresh = ELR()
+        fresh.load_file(self.path, use_compiled=False)
+        self.assertEqual(leaves(runtime), leaves(fresh))
+
+    def test_unchanged_reload(self):
+        """ Check reloading an unchanged file does nothing """
+        self.write(['.a.b.c', '.a.b.d', '.a!e'])
+        runtime = ELR()
+        self.assertEqual(runtime.load_file(self.path, reloadable=True), 3)
+        result = runtime.reload(self.path)
+        self.assertEqual(result, { 'kept' : 3, 'added' : 0, 'removed' : 0, 'replayed' : 0 })
+
+    def test_reload_untracked_loads(self):
+        """ Check reloading a file that wasn't tracked loads it """
+        self.write(['.a.b.c'])
+        runtime = ELR()
+        self.assertEqual(runtime.reload(self.path)['added'], 1)
+        self.assertTrue(runtime('.a.b.c?'))
+
+    def test_added_and_removed(self):
+        """ Check only the edited statements are applied """
+        self.write(['.a.b.c', '.a.b.d', '.x.y'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.write(['.a.b.c', '.a.b.e', '.x.y'])
+        result = runtime.reload(self.path)
+        self.assertEqual(result['added'], 1)
+        self.assertEqual(result['removed'], 1)
+        self.assertEqual(result['kept'], 2)
+        #.x.y doesn't interact with the edit:
+        self.assertEqual(result['replayed'], 1)
+        self.assertTrue(runtime('.a.b.e?'))
+        self.assertTrue(runtime('~.a.b.d?'))
+        self.assertTrue(runtime('.a.b.c?'))
+        self.assertMatchesFreshLoad(runtime)
+
+    def test_removal_keeps_shared_prefix(self):
+        """ Check removing a fact keeps the parts other statements need """
+        self.write(['.a.b', '.a.b.c.d'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.write(['.a.b'])
+        runtime.reload(self.path)
+        self.assertTrue(runtime('.a.b?'))
+        self.assertTrue(runtime('~.a.b.c?'))
+        self.assertMatchesFreshLoad(runtime)
+
+    def test_removed_exclusion_restores(self):
+        """ Check removing an exclusive assertion restores what it replaced """
+        self.write(['.a!b', '.a!c'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.assertTrue(runtime('~.a!b?'))
+        self.write(['.a!b'])
+        runtime.reload(self.path)
+        self.assertTrue(runtime('.a!b?'))
+        self.assertTrue(runtime('~.a!c?'))
+
+    def test_removed_retraction_restores(self):
+        """ Check removing a retraction restores what it retracted """
+        self.write(['.a.b.c', '~.a.b', '.x'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.assertTrue(runtime('~.a.b?'))
+        self.write(['.a.b.c', '.x'])
+        runtime.reload(self.path)
+        self.assertTrue(runtime('.a.b.c?'))
+
+    def test_replay_is_transitive(self):
+        """ Check statements interacting with replayed statements are replayed in turn """
+        self.write(['.c.b', '.c.[b, a]', '.c.a!a'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.write(['.c.[b, a]', '.c.a!a'])
+        runtime.reload(self.path)
+        self.assertMatchesFreshLoad(runtime)
+        self.assertTrue(runtime('.c.a!a?'))
+
+    def test_failed_prune_isnt_logged(self):
+        """ Check a removal is only logged once it is applied """
+        self.write(['.a.b.c.d', '.a.e'])
+        runtime = ELR()
+        runtime.enable_wal(os.path.join(self.dir, 'facts.wal'))
+        runtime.load_file(self.path, reloadable=True)
+        logged = runtime.logged
+        def failing_remove(node):
+            raise MemoryError()
+        runtime.trie.remove_node = failing_remove
+        self.write(['.a.e'])
+        with self.assertRaises(MemoryError):
+            runtime.reload(self.path)
+        self.assertEqual(runtime.logged, logged)
+        runtime.wal.close()
+
+    def test_added_statement_reparsed_only(self):
+        """ Check kept statements aren't parsed again """
+        self.write([".a.b.{}".format(x) for x in range(100)])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        kept = runtime.reloader.files[self.path].records[50]
+        self.write([".a.b.{}".format(x) for x in range(100)] + ['.a.c'])
+        runtime.reload(self.path)
+        self.assertIs(runtime.reloader.files[self.path].records[50], kept)
+        self.assertEqual(len(runtime.reloader.files[self.path].records), 101)
+
+    def test_reload_parse_error(self):
+        """ Check an invalid edit reports its location """
+        self.write(['.a.b'])
+        runtime = ELR()
+        runtime.load_file(self.path, reloadable=True)
+        self.write(['.a.b', '.a.b.'])
+        with self.assertRaises(ELE.ELParseException) as cm:
+            runtime.reload(self.path)
+        self.assertIn('line 2', str(cm.exception))
+
+    def test_reloadable_load_options(self):
+        """ Check reloadable loads keep history if asked, and refuse compiled caches """
+        self.write(['.a.b.c', '.a.d'])
+        runtime = ELR()
+        with self.assertRaises(ELE.ELRuntimeException):
+            runtime.load_file(self.path, use_compiled=True, reloadable=True)
+        runtime.load_file(self.path, record_history=True, reloadable=True)
+        self.assertEqual(len(runtime.history), 2)
+        self.write(['.a.b.c', '.a.e'])
+        runtime.reload(self.path)
+        self.assertEqual(len(runtime.history), 3)
+
+    def test_random_edits_match_fresh_load(self):
+        """ Check random edit sequences leave the same trie as loading from scratch """
+        seed(7)
+        for trial in range(30):
+            lines = [gen_statement() for x in range(randrange(5, 25))]
+            self.write(lines)
+            runtime = ELR()
+            runtime.load_file(self.path, reloadable=True)
+            for edit in range(5):
+                position = randrange(len(lines) + 1)
+                action = choice(['insert', 'delete', 'replace'])
+                if action == 'insert' or not bool(lines):
+                    lines.insert(position, gen_statement())
+                elif action == 'delete':
+                    del lines[min(position, len(lines) - 1)]
+                else:
+                    lines[min(position, len(lines) - 1)] = gen_statement()
+                self.write(lines)
+                runtime.reload(self.path)
+                self.assertMatchesFreshLoad(runtime)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELReload.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
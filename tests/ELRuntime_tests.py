@@ -9,6 +9,7 @@ from test_context import ielpy
 from ielpy import ELPARSE
 from ielpy import ELExceptions as ELE
 from ielpy import ELRuntime as ELR
+from ielpy.ELBinding import ELBindingFrame, ELBindingSlice, ELBindingEntry
 from fractions import Fraction
 
 #Parser returns a ParseResult, which is an array of actual parse data structures
@@ -390,7 +391,84 @@ class ELRuntime_Tests(unittest.TestCase):
         """
         None
 
-    
+    def test_prepared_statement(self):
+        """ Check a prepared query runs with different pre-bound variables """
+        self.runtime('.agents.bob.energy.5, .agents.bill.energy.10')
+        stmt = self.runtime.prepare('.agents.$a.energy.$e?')
+        self.assertEqual(stmt.variables(), ['a', 'e'])
+        bob = stmt.run(a='bob')
+        self.assertTrue(bob)
+        self.assertEqual(len(bob.bindings), 1)
+        self.assertEqual(bob.bindings[0]['e'].value, 5)
+        self.assertEqual(bob.bindings[0]['a'].value, 'bob')
+        self.assertEqual(stmt.run(a='bill').bindings[0]['e'].value, 10)
+        self.assertFalse(stmt.run(a='jim'))
+        self.assertEqual(len(stmt.run()), 2)
+        self.assertTrue(stmt.run(a='bill', e=10))
+
+    def test_prepared_statement_matches_query(self):
+        """ Check a prepared query gets the same result as binding the query """
+        self.runtime('.a.b.c.d, .a.b.e.f, .a.q.c.d')
+        stmt = self.runtime.prepare('.a.$x.c.$y?')
+        prepared = stmt.run(x='b')
+        frame = ELBindingFrame([ELBindingSlice({'x': ELBindingEntry('x', None, 'b')})])
+        queried = self.runtime.fact_query(ELPARSE('.a.$x.c.$y?')[0], frame)
+        self.assertEqual(len(prepared.bindings), len(queried.bindings))
+        self.assertEqual(prepared.nodes, queried.nodes)
+
+    def test_prepared_negated_statement(self):
+        """ Check a prepared negated query succeeds on absence """
+        self.runtime('.a.b.c')
+        stmt = self.runtime.prepare('~.a.$x.c?')
+        self.assertFalse(stmt.run(x='b'))
+        self.assertTrue(stmt.run(x='d'))
+
+    def test_prepare_rejects_non_queries(self):
+        """ Check only single queries can be prepared """
+        with self.assertRaises(ELE.ELConsistencyException):
+            self.runtime.prepare('.a.b.c')
+        with self.assertRaises(ELE.ELConsistencyException):
+            self.runtime.prepare('.a.b?\n.a.c?')
+        stmt = self.runtime.prepare('.a.$x?')
+        with self.assertRaises(ELE.ELConsistencyException):
+            stmt.run(y='b')
+
+    def test_prepared_statement_follows_trie(self):
+        """ Check a prepared query runs against the runtime's current trie """
+        self.runtime('.a.b')
+        stmt = self.runtime.prepare('.a.$x?')
+        self.assertTrue(stmt.run(x='b'))
+        self.runtime.trie = ELR().trie
+        self.assertFalse(stmt.run(x='b'))
+        self.runtime('.a.b')
+        self.assertTrue(stmt.run(x='b'))
+
+    def test_assert_many(self):
+        """ Check asserting facts together matches asserting them in turn """
+        facts = ['.agents.{}.location!{}'.format(i % 3, place) for i, place
+                 in enumerate(['home', 'market', 'farm', 'forge', 'home'])]
+        self.runtime.assert_many(facts + ['.agents.0.mood.[happy, tired]'], record_history=True)
+        self.assertEqual(len(self.runtime.history), 6)
+        sequential = ELR()
+        for fact in facts:
+            sequential(fact)
+        self.assertTrue(self.runtime('.agents.0.location!forge?'))
+        self.assertTrue(self.runtime('.agents.0.mood.tired?'))
+        self.assertTrue(self.runtime('.agents.1.location!home?'))
+        self.assertEqual([str(x) for x in self.runtime.trie.leaves() if 'mood' not in str(x)],
+                         [str(x) for x in sequential.trie.leaves()])
+        with self.assertRaises(ELE.ELConsistencyException):
+            self.runtime.assert_many(['~.agents.0'])
+
+    def test_assert_many_keeps_facts_before_an_error(self):
+        """ Check the facts asserted before an invalid one stay asserted """
+        with self.assertRaises(ELE.ELConsistencyException):
+            self.runtime.assert_many(['.a.b', '.a.c', '.x.y?'])
+        self.assertTrue(self.runtime('.a.b?'))
+        self.assertTrue(self.runtime('.a.c?'))
+        self.assertFalse(self.runtime('.x?'))
+        self.assertEqual(self.runtime.num_nodes(), 3)
+
         
         
 if __name__ == "__main__":
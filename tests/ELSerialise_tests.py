@@ -0,0 +1,159 @@
+"""
+	Testing of the binary IR encoding and compiled file caches
+"""
+import unittest
+import logging as root_logger
+import os
+import pickle
+import shutil
+import tempfile
+from test_context import ielpy
+from ielpy import ELParser, ELSerialise, ELCompiled
+from ielpy import ELExceptions as ELE
+from ielpy import ELRuntime as ELR
+from ielpy.ELFactStructure import ELFACT, ELARITH_FACT, ELComparison
+from ielpy.ELActions import ELBIND
+from ELFastParser_tests import ir_signature
+
+STATEMENTS = ['.a.b.c', '.a.b!c.5', '~.a.b.-5', '.a.1d5.1/2', '.a."a string".b',
+              '.a.$x.b?', '.a!@y?', '$..x.b.$y', '.a.b.$x(2)',
+              '.a.b.[1,2,"three"]', '.rule.conditions.[ .a.b.$x?, .a.c.$y? ]',
+              '.a.b.[ $x < 5, $y > $z, $x ~=(5) 2 ]', '.a.[ $x + 20, $x * $y ]',
+              '$x <- .a.b', '$x <-', '.a.b.[]']
+#statements the runtime can act on at the top level:
+RUNNABLE = [x for x in STATEMENTS if '@' not in x and '<-' not in x]
+
+def full_signature(ir):
+    """ Extend the parser signature to the IR it compares by identity """
+    if isinstance(ir, ELARITH_FACT):
+        return ('ARITH', full_signature(ir.data), ir.op, full_signature(ir.val),
+                tuple(full_signature(x) for x in ir.bindings))
+    elif isinstance(ir, ELComparison):
+        return ('COMP', full_signature(ir.b1), ir.op, full_signature(ir.nearVal), full_signature(ir.b2))
+    elif isinstance(ir, ELBIND):
+        return ('BIND', full_signature(ir.var), full_signature(ir.root))
+    elif isinstance(ir, ELFACT):
+        return ('FACT', ir.negated,
+                tuple(full_signature(x) for x in ir.data),
+                tuple(full_signature(x) for x in ir.bindings))
+    elif isinstance(ir, list):
+        return tuple(full_signature(x) for x in ir)
+    return ir_signature(ir)
+
+
+class ELSerialise_Tests(unittest.TestCase):
+
+    def test_roundtrip(self):
+        """ Check each form of IR survives encoding """
+        for statement in STATEMENTS:
+            irs = ELParser.ELPARSE(statement)
+            decoded = ELSerialise.loads(ELSerialise.dumps(irs))
+            self.assertEqual(full_signature(irs), full_signature(decoded), statement)
+            self.assertEqual([repr(x) for x in irs], [repr(x) for x in decoded], statement)
+
+    def test_decoded_facts_behave(self):
+        """ Check decoded IR can be used like parsed IR """
+        ir = ELSerialise.loads(ELSerialise.dumps(ELParser.ELPARSE('.a.b.[1,2,3]')))[0]
+        self.assertEqual(len(ir.expand()), 3)
+        ir.filled_bindings['x'] = None
+        self.assertNotIn('x', ELSerialise.loads(ELSerialise.dumps(ELParser.ELPARSE('.a.$x?')))[0].filled_bindings)
+
+    def test_smaller_than_pickle(self):
+        """ Check the encoding is more compact than pickling the IR """
+        irs = [x for statement in STATEMENTS for x in ELParser.ELPARSE(statement)]
+        self.assertLess(len(ELSerialise.dumps(irs)), len(pickle.dumps(irs, pickle.HIGHEST_PROTOCOL)))
+
+    def test_unencodable(self):
+        """ Check IR outside of the encoding is rejected """
+        with self.assertRaises(ELE.ELSerialiseException):
+            ELSerialise.dumps([object()])
+
+
+class ELCompiled_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rules.el')
+        with open(self.path, 'w') as f:
+            f.write("\n".join(RUNNABLE) + "\n")
+            f.write("\n".join([".a.b.c.{}".format(x) for x in range(1000)]))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_compile_and_read(self):
+        """ Check a compiled file reads back the parsed IR """
+        count = ELCompiled.compile_file(self.path, ELParser.ELPARSE_iter)
+        self.assertTrue(os.path.exists(ELCompiled.compiled_path(self.path)))
+        with open(self.path) as f:
+            parsed = list(ELParser.ELPARSE_iter(f))
+        compiled = list(ELCompiled.read_compiled(self.path))
+        self.assertEqual(count, len(parsed))
+        self.assertEqual(full_signature(parsed), full_signature(compiled))
+
+    def test_missing_and_stale(self):
+        """ Check the cache is ignored when absent or the source changes """
+        self.assertIsNone(ELCompiled.read_compiled(self.path))
+        ELCompiled.compile_file(self.path, ELParser.ELPARSE_iter)
+        self.assertIsNotNone(ELCompiled.read_compiled(self.path))
+        with open(self.path, 'a') as f:
+            f.write("\n.a.new.fact")
+        self.assertIsNone(ELCompiled.read_compiled(self.path))
+
+    def test_truncated(self):
+        """ Check a damaged cache isn't silently read as a shorter file """
+        ELCompiled.compile_file(self.path, ELParser.ELPARSE_iter)
+        target = ELCompiled.compiled_path(self.path)
+        with open(target, 'rb') as f:
+            data = f.read()
+        with open(target, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(ELE.ELSerialiseException):
+            list(ELCompiled.read_compiled(self.path))
+
+    def test_failed_parse_leaves_no_cache(self):
+        """ Check a parse error doesn't leave a partial cache """
+        with open(self.path, 'a') as f:
+            f.write("\n.a.b.\n")
+        with self.assertRaises(ELE.ELParseException):
+            ELCompiled.compile_file(self.path, ELParser.ELPARSE_iter)
+        self.assertEqual(os.listdir(self.dir), ['rules.el'])
+
+    def test_runtime_uses_cache(self):
+        """ Check the runtime writes the cache on first load, and reads it after """
+        first = ELR()
+        count = first.load_file(self.path, use_compiled=True)
+        self.assertTrue(os.path.exists(ELCompiled.compiled_path(self.path)))
+        #a cached load shouldn't parse:
+        original = ELParser.ELPARSE_iter
+        ELParser.ELPARSE_iter = None
+        try:
+            second = ELR()
+            self.assertEqual(second.load_file(self.path, use_compiled=True), count)
+        finally:
+            ELParser.ELPARSE_iter = original
+        self.assertTrue(second('.a.b.c.999?'))
+        self.assertTrue(second('.rule.conditions?'))
+        self.assertEqual(str(first.trie), str(second.trie))
+
+    def test_runtime_without_cache(self):
+        """ Check loading only writes the cache when asked """
+        runtime = ELR()
+        runtime.load_file(self.path)
+        self.assertFalse(os.path.exists(ELCompiled.compiled_path(self.path)))
+        self.assertTrue(runtime('.a.b.c.999?'))
+        runtime.load_file(self.path, use_compiled=False)
+        self.assertEqual(os.listdir(self.dir), ['rules.el'])
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELSerialise.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
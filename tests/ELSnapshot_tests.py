@@ -0,0 +1,116 @@
+"""
+	Testing of immutable trie snapshots
+"""
+import unittest
+import gc
+import logging as root_logger
+from random import random, choice, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELSnapshot import ELSnapshot
+from ielpy import ELExceptions as ELE
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement():
+    pairs = "." + str(choice(VALUES)) + "".join([choice(['.', '.', '.', '!']) + str(choice(VALUES))
+                                                 for x in range(int(random() * 4))])
+    if random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+QUERIES = ['.$x?', '.$x.$y?', '.a.$x!$y?', '.a.b.c?', '.$x!$y.$z?', '~.b.$x?']
+
+def describe(result):
+    if not bool(result):
+        return None
+    return [(x.uuid, sorted([(k, v.value, v.uuid) for k, v in x.items()])) for x in result.bindings]
+
+def leaves(trie):
+    return sorted([str(x) for x in trie.leaves()])
+
+
+class ELSnapshot_Tests(unittest.TestCase):
+
+    def test_has_base_trie_state(self):
+        """ Check snapshots keep all the state a base trie has, without their own nodes """
+        trie = ELTrie()
+        with ELSnapshot(trie) as snapshot:
+            for name, value in vars(ELTrie()).items():
+                self.assertTrue(hasattr(snapshot, name), name)
+            self.assertEqual(snapshot.root.uuid, trie.root.uuid)
+            self.assertEqual(snapshot.generation, 0)
+            self.assertEqual(trie.generation, 1)
+
+    def test_random_snapshots_keep_their_state(self):
+        """ Check snapshots answer queries as the trie did when they were taken """
+        seed(13)
+        for trial in range(20):
+            runtime = ELR(trie=ELArrayTrie() if trial % 2 else ELTrie())
+            queries = [runtime.parser(x)[0] for x in QUERIES]
+            taken = []
+            for i in range(60):
+                statement = random_statement()
+                runtime(statement)
+                if random() < 0.2:
+                    snapshot = runtime.snapshot()
+                    taken.append((snapshot, [describe(runtime.trie.query(x)) for x in queries],
+                                  leaves(runtime.trie)))
+                for snapshot, expected, expected_leaves in taken:
+                    self.assertEqual([describe(snapshot.query(x)) for x in queries], expected,
+                                     (trial, i, statement))
+                    self.assertEqual(leaves(snapshot), expected_leaves)
+
+    def test_snapshot_is_immutable(self):
+        runtime = ELR()
+        runtime('.a.b')
+        snapshot = runtime.snapshot()
+        with self.assertRaises(ELE.ELConsistencyException):
+            snapshot.push(runtime.parser('.a.c')[0])
+        with self.assertRaises(ELE.ELConsistencyException):
+            snapshot.root['a']['c'] = snapshot.root['a']['b']
+
+    def test_runtime_over_a_snapshot(self):
+        runtime = ELR()
+        runtime('.agents.bob.location!market')
+        snapshot = runtime.snapshot()
+        runtime('.agents.bob.location!home, ~.agents.alice')
+        past = ELR(trie=snapshot)
+        self.assertTrue(past('.agents.bob.location!market?'))
+        self.assertFalse(past('.agents.bob.location!home?'))
+        self.assertTrue(runtime('.agents.bob.location!home?'))
+        result = past('.agents.$a?')
+        self.assertTrue(result)
+        self.assertIn(result.bindings[0]['a'].uuid, snapshot.allNodes)
+
+    def test_changes_are_kept_only_while_needed(self):
+        runtime = ELR()
+        for i in range(200):
+            runtime('.a.{}.b'.format(i))
+        snapshot = runtime.snapshot()
+        runtime('.a.5.c')
+        runtime('~.a.7')
+        #a.5, a, and a.7's subtree:
+        self.assertEqual(len(runtime.trie.frozen), 4)
+        self.assertEqual(len(snapshot.allNodes), 402)
+        self.assertNotIn(7, runtime.trie['a'])
+        self.assertIn(snapshot.root['a'][7].uuid, snapshot.allNodes)
+        snapshot = None
+        gc.collect()
+        runtime('.a.6.c')
+        self.assertEqual(len(runtime.trie.frozen), 0)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELSnapshot.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+	Testing of statement splitting and streaming parsing
+"""
+import unittest
+import logging as root_logger
+import os
+import tempfile
+from itertools import islice, count
+from test_context import ielpy
+from ielpy import ELParser
+from ielpy import ELExceptions as ELE
+from ielpy import ELRuntime as ELR
+from ielpy.ELStream import EL_STATEMENTS
+
+SOURCE = """# a comment
+.a.b.c, .a.b.d
+.a!e   # trailing comment
+.a.f."a string, with a comma".g
+.rule.conditions.[ .a.b.$x?,
+    .a.c.$y? ]
+.a.h.$x
+.i
+.b.[1,2,
+ 3]
+"""
+
+class ELStream_Tests(unittest.TestCase):
+
+    def test_statement_splitting(self):
+        """ Check source is split into top level statements """
+        statements = list(EL_STATEMENTS(SOURCE.splitlines(True)))
+        lines = [x[0] for x in statements]
+        self.assertEqual(len(statements), 7)
+        self.assertEqual(lines, [2, 2, 3, 4, 5, 7, 9])
+        self.assertEqual(statements[1][1].strip(), '.a.b.d')
+        self.assertIn('a string, with a comma', statements[3][1])
+        #the grammar joins a line ending in a variable with the next
+        self.assertEqual(statements[5][1], '.a.h.$x\n.i\n')
+
+    def test_streamed_parse_matches_whole_parse(self):
+        """ Check parsing a statement at a time gets the same IR as the whole text """
+        whole = ELParser.ELPARSE(SOURCE)
+        streamed = list(ELParser.ELPARSE_iter(SOURCE.splitlines(True)))
+        self.assertEqual([repr(x) for x in whole], [repr(x) for x in streamed])
+
+    def test_stream_is_lazy(self):
+        """ Check statements are yielded without reading all input """
+        lines = (".a.b.{}\n".format(x) for x in count())
+        first = list(islice(ELParser.ELPARSE_iter(lines), 5))
+        self.assertEqual(len(first), 5)
+        self.assertEqual(str(first[-1]), '.a.b.4.')
+
+    def test_stream_error_line(self):
+        """ Check a parse error reports the line it started on """
+        with self.assertRaises(ELE.ELParseException) as cm:
+            list(ELParser.ELPARSE_iter([".a.b\n", "\n", ".a.b.\n"]))
+        self.assertIn('line 3', str(cm.exception))
+
+    def test_runtime_load_file(self):
+        """ Check a file can be streamed into the runtime """
+        runtime = ELR()
+        with tempfile.NamedTemporaryFile('w', suffix='.el', delete=False) as f:
+            f.write(SOURCE)
+        try:
+            self.assertEqual(runtime.load_file(f.name), 7)
+            self.assertEqual(len(runtime.history), 0)
+            self.assertEqual(runtime.load_file(f.name, record_history=True), 7)
+            self.assertEqual(len(runtime.history), 7)
+        finally:
+            os.remove(f.name)
+            if os.path.exists(f.name + 'c'):
+                os.remove(f.name + 'c')
+        self.assertTrue(runtime('.a.h?'))
+        self.assertTrue(runtime('~.a!e?'))
+        self.assertTrue(runtime('.rule.conditions?'))
+        self.assertTrue(runtime('.b.3?'))
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELStream.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+	Testing of the symbol table trie node values are interned in
+"""
+import unittest
+import logging as root_logger
+import copy
+import gc
+import pickle
+from test_context import ielpy
+from ielpy.ELSymbols import ELSymbols, SYMBOLS
+from ielpy.ELStructure import ELPAIR, ELVAR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELFactStructure import ELFACT
+from ielpy.ELParser import ELPARSE
+from ielpy.ELUtil import EL
+from ielpy import ELExceptions as ELE
+
+
+class ELSymbols_Tests(unittest.TestCase):
+
+    def test_intern_is_stable(self):
+        symbols = ELSymbols()
+        a = symbols.intern("a")
+        b = symbols.intern("b")
+        self.assertNotEqual(a, b)
+        self.assertEqual(symbols.intern("a"), a)
+        self.assertEqual(symbols.value(b), "b")
+        self.assertEqual(len(symbols), 2)
+
+    def test_lookup_doesnt_add(self):
+        symbols = ELSymbols()
+        self.assertIsNone(symbols.lookup("a"))
+        self.assertNotIn("a", symbols)
+        self.assertIsNone(symbols.lookup([1, 2]))
+        self.assertEqual(len(symbols), 0)
+
+    def test_equal_numbers_share_symbols(self):
+        """ Check symbols follow python equality, as dict keys did """
+        symbols = ELSymbols()
+        value, sym = symbols.canonical(1)
+        fvalue, fsym = symbols.canonical(1.0)
+        self.assertEqual(sym, fsym)
+        #but the value keeps its type:
+        self.assertIsInstance(fvalue, float)
+
+    def test_strings_are_shared(self):
+        symbols = ELSymbols()
+        first, sym = symbols.canonical("".join(["ab", "cd"]))
+        second, sym2 = symbols.canonical("".join(["a", "bcd"]))
+        self.assertIs(first, second)
+
+    def test_unhashable_has_no_symbol(self):
+        symbols = ELSymbols()
+        value = [1, 2]
+        self.assertEqual(symbols.canonical(value), (value, None))
+
+    def test_pairs_carry_symbols(self):
+        pair = ELPAIR("blah")
+        self.assertEqual(pair.sym, SYMBOLS.lookup("blah"))
+        self.assertIs(pair.value, SYMBOLS.value(pair.sym))
+
+    def test_variables_keep_scope(self):
+        pair = ELPAIR(ELVAR("x"))
+        self.assertIsInstance(pair.value, ELVAR)
+        self.assertIsNotNone(pair.sym)
+
+    def test_copies_reintern(self):
+        pair = ELPAIR("blah", EL.EX)
+        for other in [pickle.loads(pickle.dumps(pair)), copy.deepcopy(pair)]:
+            self.assertEqual(other, pair)
+            self.assertEqual(other.sym, pair.sym)
+
+    def test_parsed_ir_carries_symbols(self):
+        fact = ELPARSE(".a.b!c")[0]
+        for pair in fact.data[1:]:
+            self.assertEqual(pair.sym, SYMBOLS.lookup(pair.value))
+
+    def test_unheld_symbols_are_freed(self):
+        """ Check symbols nothing holds leave the table, and their ids are reused """
+        symbols = ELSymbols()
+        kept = symbols.intern("kept")
+        dropped = symbols.intern("dropped")
+        dropped_id = dropped.id
+        del dropped
+        gc.collect()
+        self.assertEqual(len(symbols), 1)
+        self.assertIsNone(symbols.lookup("dropped"))
+        self.assertEqual(symbols.intern("other").id, dropped_id)
+        self.assertIs(symbols.lookup("kept"), kept)
+
+    def test_retracted_values_are_freed(self):
+        """ Check values churned through a trie don't accumulate symbols """
+        for engine in [ELTrie, ELArrayTrie]:
+            trie = engine()
+            before = len(SYMBOLS)
+            for i in range(2000):
+                trie.push(ELFACT(r=True).pair('agent').epair('energy').pair('churned_{}'.format(i)))
+                trie.push(ELFACT(r=True).pair('agent').pair('log').pair('entry_{}'.format(i)))
+                trie.pop(ELFACT(r=True, negated=True).pair('agent').pair('log'))
+            gc.collect()
+            self.assertLessEqual(len(SYMBOLS), before + 4)
+            self.assertTrue(trie.get(ELFACT(r=True).pair('agent').epair('energy').pair('churned_1999').query()))
+            del trie
+            gc.collect()
+            self.assertLessEqual(len(SYMBOLS), before)
+
+    def test_trie_children_keyed_by_symbol(self):
+        trie = ELTrie()
+        trie.push(ELPARSE(".a.b.c")[0])
+        self.assertIn(SYMBOLS.lookup("a"), trie.root.children)
+        self.assertIn("a", trie.root)
+        self.assertNotIn("unseen_value", trie.root)
+        with self.assertRaises(KeyError):
+            trie.root["unseen_value"]
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELSymbols.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
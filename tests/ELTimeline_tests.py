@@ -0,0 +1,134 @@
+"""
+	Testing of the trie timeline, for queries as of past steps
+"""
+import unittest
+import logging as root_logger
+from random import random, choice, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy import ELExceptions as ELE
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement():
+    pairs = "." + str(choice(VALUES)) + "".join([choice(['.', '.', '.', '!']) + str(choice(VALUES))
+                                                 for x in range(int(random() * 4))])
+    if random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+QUERIES = ['.$x?', '.$x.$y?', '.a.$x!$y?', '.a.b.c?', '.$x!$y.$z?', '~.b.$x?']
+
+def describe(result):
+    if not bool(result):
+        return None
+    return [(x.uuid, sorted([(k, v.value, v.uuid) for k, v in x.items()])) for x in result.bindings]
+
+def matches(result):
+    if not bool(result):
+        return set()
+    return set([(x.uuid, tuple(sorted([(k, v.value, v.uuid) for k, v in x.items()])))
+                for x in result.bindings])
+
+
+class ELTimeline_Tests(unittest.TestCase):
+
+    def test_random_past_queries(self):
+        """ Check queries at a step match the trie as it was then,
+        and queries between steps match any of them """
+        seed(17)
+        for trial in range(20):
+            runtime = ELR(trie=ELArrayTrie() if trial % 2 else ELTrie())
+            runtime('.a.b.c')
+            runtime.enable_timeline()
+            queries = [runtime.parser(x)[0] for x in QUERIES]
+            expected = []
+            for step in range(30):
+                for i in range(int(random() * 4)):
+                    runtime(random_statement())
+                expected.append([describe(runtime.trie.query(x)) for x in queries])
+                runtime.advance()
+            for step in range(30):
+                self.assertEqual([describe(runtime.trie.query(x, at=step)) for x in queries],
+                                 expected[step], (trial, step))
+            for start in range(0, 30, 7):
+                end = start + int(random() * 10)
+                for i, query in enumerate(queries[:-1]):
+                    union = set()
+                    for step in range(start, min(end, 29) + 1):
+                        if expected[step][i] is not None:
+                            union.update([(x, tuple(y)) for x, y in expected[step][i]])
+                    self.assertEqual(matches(runtime.trie.query(query, between=(start, end))), union,
+                                     (trial, start, end, query))
+
+    def test_ever_happened(self):
+        runtime = ELR()
+        runtime.enable_timeline()
+        runtime('.agents.bob.location!home')
+        runtime.advance()
+        runtime('.agents.bob.location!market')
+        runtime.advance(5)
+        runtime('.agents.bob.location!home')
+        runtime.advance()
+        runtime('~.agents.bob')
+        self.assertFalse(runtime('.agents.bob?'))
+        self.assertTrue(runtime.query('.agents.bob.location!market?', at=3))
+        self.assertFalse(runtime.query('.agents.bob.location!market?', at=6))
+        self.assertTrue(runtime.query('.agents.bob.location!market?', between=(0, 7)))
+        self.assertFalse(runtime.query('.agents.bob.location!market?', between=(6, 7)))
+        result = runtime.query('.agents.bob.location!$l?', between=(0, 6))
+        #home was asserted twice, as different nodes:
+        self.assertEqual([x['l'].value for x in result.bindings], ['home', 'market', 'home'])
+        self.assertFalse(runtime.query('.agents.$a?', at=7))
+        self.assertTrue(runtime.query('~.agents.$a?', at=7))
+
+    def test_changes_in_a_step_replace_each_other(self):
+        runtime = ELR()
+        runtime.enable_timeline()
+        runtime('.a.b, .a.c, ~.a.b')
+        runtime.advance()
+        runtime('.a!d')
+        self.assertFalse(runtime.query('.a.b?', between=(0, 1)))
+        self.assertTrue(runtime.query('.a.c?', at=0))
+        self.assertFalse(runtime.query('.a.c?', at=1))
+        self.assertTrue(runtime.query('.a!d?', at=1))
+        self.assertFalse(runtime.query('.a.d?', at=1))
+
+    def test_updated_values(self):
+        runtime = ELR()
+        runtime.enable_timeline()
+        runtime('.a.b.10')
+        node = runtime.trie['a']['b'][10]
+        runtime.advance()
+        runtime.trie.update_value(node, 20)
+        self.assertEqual(runtime.query('.a.b.$x?', at=0).bindings[0]['x'].value, 10)
+        self.assertEqual(runtime.query('.a.b.$x?', at=1).bindings[0]['x'].value, 20)
+        self.assertEqual(len(runtime.query('.a.b.$x?', between=(0, 1)).bindings), 2)
+
+    def test_steps_before_the_timeline(self):
+        runtime = ELR()
+        runtime.advance(3)
+        runtime('.a.b')
+        with self.assertRaises(ELE.ELTrieException):
+            runtime.query('.a.b?', at=3)
+        runtime.enable_timeline()
+        self.assertTrue(runtime.query('.a.b?', at=3))
+        self.assertFalse(runtime.query('.a.b?', at=2))
+        runtime.advance(-1)
+        with self.assertRaises(ELE.ELTrieException):
+            runtime.trie.pop(runtime.parser('~.a.b')[0])
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELTimeline.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
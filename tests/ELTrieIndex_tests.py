@@ -0,0 +1,193 @@
+"""
+	Testing of secondary indexes on trie path segments
+"""
+import unittest
+import logging as root_logger
+from random import random, choice, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELSymbols import SYMBOLS
+from ielpy import ELExceptions as ELE
+
+NAMES = [1, 2, 3, 4, 5, 6]
+PLACES = ['market', 'home', 'farm', 'forge']
+
+def random_statement():
+    agent = choice(NAMES)
+    roll = random()
+    if roll < 0.5:
+        return ".agents.{}.location!{}".format(agent, choice(PLACES))
+    if roll < 0.65:
+        return ".agents.{}.mood.{}".format(agent, choice(PLACES))
+    if roll < 0.75:
+        return "~.agents.{}.location".format(agent)
+    if roll < 0.8:
+        return "~.agents.{}".format(agent)
+    if roll < 0.9:
+        #an exclusion clears the agent's location, and anything else
+        return ".agents.{}!location".format(agent)
+    return ".agents.{}.location.{}".format(agent, choice(PLACES))
+
+QUERIES = ['.agents.$a.location!market?', '.agents.$a.location!home?',
+           '.agents.$a.location.market?', '.agents.$a.$b!farm?',
+           '.agents.$a.location!$l?', '.agents.3.location!market?',
+           '~.agents.$a.location!forge?']
+
+def describe(result):
+    """ The content of a query result, comparable across tries """
+    if not bool(result):
+        return None
+    return [sorted([(k, v.value) for k, v in x.items()]) for x in result.bindings]
+
+
+class ELTrieIndex_Tests(unittest.TestCase):
+
+    def test_random_indexed_queries_match_scanning(self):
+        """ Check queries give the same results with and without an index,
+        as the trie changes """
+        seed(5)
+        used = 0
+        for trial in range(20):
+            engine = ELArrayTrie if trial % 2 else ELTrie
+            indexed = ELR(trie=engine())
+            scanned = ELR(trie=engine())
+            indexed.add_index('.agents.$a.location!$l')
+            for i in range(60):
+                statement = random_statement()
+                indexed(statement)
+                scanned(statement)
+                if i % 10 == 0:
+                    for query in QUERIES:
+                        self.assertEqual(describe(indexed(query)), describe(scanned(query)),
+                                         (trial, statement, query))
+            index = indexed.trie.indexes[0]
+            for place in PLACES:
+                used += len(index.candidates(SYMBOLS.lookup(place)))
+        self.assertGreater(used, 20)
+
+    def test_index_follows_updates(self):
+        for engine in [ELTrie, ELArrayTrie]:
+            runtime = ELR(trie=engine())
+            runtime('.a.b.10, .test.[ .conditions.[ .a.b.$x? ], .arithmetic.[ $..x + 10 ] ]')
+            runtime.add_index('.a.$k.$v')
+            self.assertTrue(runtime('.a.$k.10?'))
+            result = runtime.run_conditions('.test.conditions?')
+            runtime.run_arithmetic('.test.arithmetic?', binding=result.bindings[0])
+            self.assertFalse(runtime('.a.$k.10?'))
+            self.assertEqual(describe(runtime('.a.$k.20?')), [[('k', 'b')]])
+
+    def test_index_holds_existing_nodes(self):
+        runtime = ELR()
+        runtime('.agents.1.location!market, .agents.2.location!home, .agents.3.location!market')
+        index = runtime.add_index('.agents.$a.location!$l')
+        self.assertEqual(len(index), 3)
+        result = runtime('.agents.$a.location!market?')
+        self.assertEqual([x['a'].value for x in result.bindings], [1, 3])
+
+    def test_removals_leave_the_index(self):
+        runtime = ELR()
+        index = runtime.add_index('.agents.$a.location!$l')
+        runtime('.agents.1.location!market, .agents.2.location!market')
+        self.assertEqual(len(index), 2)
+        runtime('~.agents.1')
+        self.assertEqual(len(index), 1)
+        runtime('.agents.2.location!home')
+        self.assertEqual(len(index), 1)
+        self.assertFalse(runtime('.agents.$a.location!market?'))
+
+    def test_stale_entries_are_dropped(self):
+        """ Nodes removed behind the trie's back are checked when used """
+        runtime = ELR()
+        index = runtime.add_index('.agents.$a.location!$l')
+        runtime('.agents.1.location!market, .agents.2.location!market')
+        del runtime.trie.root['agents'][1]
+        self.assertEqual(len(index), 2)
+        result = runtime('.agents.$a.location!market?')
+        self.assertEqual([x['a'].value for x in result.bindings], [2])
+        self.assertEqual(len(index), 1)
+
+    def test_index_needs_a_variable_to_index(self):
+        runtime = ELR()
+        for pattern in ['.agents.$a.location', '.agents.$a.location.$l.home', '$..x.location.$l']:
+            with self.assertRaises(ELE.ELConsistencyException):
+                runtime.add_index(pattern)
+
+    def test_uncovered_queries_scan(self):
+        runtime = ELR()
+        runtime.add_index('.agents.$a.location!$l')
+        runtime('.agents.1.location!market, .agents.1.mood.market')
+        for query in ['.agents.$a.mood.market?', '.agents.1.location!market?', '.agents.$a?']:
+            self.assertIsNone(runtime.trie.indexed_get(runtime.parser(query)[0].data[1:-1]), query)
+        self.assertIsNotNone(runtime.trie.indexed_get(
+            runtime.parser('.agents.$a.location!market?')[0].data[1:-1]))
+
+    def test_random_path_lookups_match_walking(self):
+        """ Check ground queries give the same results with and without the path index """
+        seed(7)
+        for trial in range(20):
+            engine = ELArrayTrie if trial % 2 else ELTrie
+            indexed = ELR(trie=engine())
+            walked = ELR(trie=engine())
+            indexed.trie.add_path_index()
+            for i in range(60):
+                statement = random_statement()
+                indexed(statement)
+                walked(statement)
+                if i % 10 == 0:
+                    for agent in NAMES[:3]:
+                        for place in PLACES:
+                            for query in [".agents.{}.location!{}?", ".agents.{}.location.{}?",
+                                          ".agents.{}!location?", "~.agents.{}.mood.{}?"]:
+                                query = query.format(agent, place)
+                                self.assertEqual(describe(indexed(query)), describe(walked(query)),
+                                                 (trial, statement, query))
+            #every attached node, and nothing else, is indexed:
+            self.assertEqual(len(indexed.trie.path_index), len(self.attached(indexed.trie)))
+
+    def attached(self, trie):
+        queue = list(trie.root)
+        found = []
+        while bool(queue):
+            current = queue.pop()
+            found.append(current)
+            queue.extend(current)
+        return found
+
+    def test_path_index_follows_updates(self):
+        for engine in [ELTrie, ELArrayTrie]:
+            runtime = ELR(trie=engine())
+            runtime.trie.add_path_index()
+            runtime('.a.b.10.x, .a.b.20.y')
+            node = runtime.trie['a']['b'][10]
+            runtime.trie.update_value(node, 20)
+            self.assertTrue(runtime('.a.b.20.x?'))
+            self.assertFalse(runtime('.a.b.20.y?'))
+            self.assertFalse(runtime('.a.b.10?'))
+            self.assertEqual(len(runtime.trie.path_index), 4)
+
+    def test_path_index_checks_elops(self):
+        runtime = ELR()
+        runtime.trie.add_path_index()
+        runtime('.a.b.c')
+        self.assertTrue(runtime('.a.b.c?'))
+        self.assertFalse(runtime('.a.b!c?'))
+        self.assertFalse(runtime('.a!b.c?'))
+        runtime('.a!d')
+        self.assertFalse(runtime('.a.b.c?'))
+        self.assertTrue(runtime('.a!d?'))
+        self.assertEqual(len(runtime.trie.path_index), 2)
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELTrieIndex.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
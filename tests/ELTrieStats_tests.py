@@ -0,0 +1,142 @@
+"""
+	Testing of the incrementally kept trie statistics
+"""
+import unittest
+import logging as root_logger
+from random import random, choice, seed
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy.ELFactStructure import ELFACT
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_fact():
+    fact = ELFACT(r=True)
+    for i in range(1 + int(random() * 4)):
+        if random() < 0.2:
+            fact.epair(choice(VALUES))
+        else:
+            fact.pair(choice(VALUES))
+    return fact
+
+def recount(trie):
+    """ The statistics, by walking the trie """
+    nodes = 0
+    leaves = 0
+    depths = {}
+    fanout = {}
+    under = {}
+    def walk(node, depth):
+        nonlocal nodes, leaves
+        depths[depth] = depths.get(depth, 0) + 1
+        fanout[len(node)] = fanout.get(len(node), 0) + 1
+        if depth > 0:
+            nodes += 1
+        if node.is_empty():
+            if depth > 0:
+                leaves += 1
+                return 1
+            return 0
+        total = sum([walk(x, depth + 1) for x in node])
+        under[node.uuid] = total
+        return total
+    walk(trie.root, 0)
+    return (nodes, leaves, [depths[x] for x in sorted(depths)], fanout, under)
+
+def current(trie):
+    stats = trie.stats
+    under = { x : stats.leaves_under(trie.allNodes[x]) for x in stats.under }
+    return (stats.nodes, stats.leaves, stats.depths, stats.fanout, under)
+
+
+class ELTrieStats_Tests(unittest.TestCase):
+
+    def test_random_changes_match_recount(self):
+        """ Check the statistics match a walk of the trie after each change """
+        seed(11)
+        for trial in range(20):
+            trie = ELArrayTrie() if trial % 2 else ELTrie()
+            for i in range(40):
+                roll = random()
+                if roll < 0.6:
+                    trie.push(random_fact())
+                elif roll < 0.8:
+                    trie.pop(random_fact())
+                elif bool(len(trie.root)):
+                    node = choice(list(trie.root))
+                    if bool(len(node)) and random() < 0.5:
+                        node = choice(list(node))
+                    trie.update_value(node, choice(VALUES))
+                self.assertEqual(current(trie), recount(trie), (trial, i))
+
+    def test_runtime_metrics(self):
+        runtime = ELR()
+        runtime('.a.b!c, .a.d.e')
+        self.assertEqual(runtime.max_depth(), 3)
+        self.assertEqual(runtime.num_leaves(), 2)
+        runtime('.a.d.f.g')
+        self.assertEqual(runtime.max_depth(), 4)
+        self.assertEqual(runtime.num_leaves(), 3)
+        self.assertEqual(runtime.num_nodes(), 7)
+        runtime('~.a.d')
+        self.assertEqual(runtime.max_depth(), 3)
+        self.assertEqual(runtime.num_leaves(), 1)
+        self.assertEqual(str(runtime), ".a.b!c")
+        #an exclusion overwrite:
+        runtime('.a.b!x')
+        self.assertEqual(runtime.num_leaves(), 1)
+        self.assertEqual(runtime.num_nodes(), 3)
+        self.assertEqual(runtime.trie.stats.leaves_under(runtime.trie.root), 1)
+
+    def test_fanout(self):
+        trie = ELTrie()
+        for i in range(5):
+            trie.push(ELFACT(r=True).pair('a').pair(i))
+        self.assertEqual(trie.stats.max_fanout(), 5)
+        self.assertEqual(trie.stats.mean_fanout(), 3)
+        self.assertEqual(trie.stats.leaves_under(trie.root['a']), 5)
+
+    def test_stats_built_on_first_read(self):
+        """ Check stats aren't kept until read, then match a walk and stay current """
+        for trie in [ELTrie(), ELArrayTrie()]:
+            self.assertIsNone(trie.kept_stats)
+            self.assertEqual(trie.observers, [])
+            trie.push(ELFACT(r=True).pair('a').pair('b').pair('c'))
+            trie.push(ELFACT(r=True).pair('a').epair('d'))
+            self.assertIsNone(trie.kept_stats)
+            self.assertEqual(current(trie), recount(trie))
+            self.assertIn(trie.kept_stats, trie.observers)
+            trie.push(ELFACT(r=True).pair('a').pair('e').pair('f'))
+            trie.pop(ELFACT(r=True).pair('a').pair('b'))
+            self.assertEqual(current(trie), recount(trie))
+
+    def test_empty_trie_has_no_leaves(self):
+        """ The root isn't counted, so an empty trie has no leaves.
+        (dfs_for_metrics counted the root as a leaf, giving 1) """
+        runtime = ELR()
+        self.assertEqual(runtime.num_leaves(), 0)
+        self.assertEqual(runtime.num_nodes(), 0)
+        self.assertEqual(runtime.max_depth(), 0)
+
+    def test_rebuild_after_compact(self):
+        trie = ELTrie()
+        trie.push(ELFACT(r=True).pair('a').pair('b').pair('c'))
+        trie.push(ELFACT(r=True).pair('a').pair('d'))
+        del trie.root['a']['b']
+        trie.compact()
+        self.assertEqual(current(trie), recount(trie))
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELTrieStats.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
@@ -2,15 +2,17 @@
 	BASIC testing of the ELTrie
 """
 import unittest
+import gc
 import IPython
 import logging as root_logger
-from random import random
+from random import random, choice
 from test_context import ielpy
-from ielpy.ELUtil import EL
+from ielpy.ELUtil import EL, ELNodeId
 from ielpy.ELStructure import ELROOT, ELPAIR, ELVAR
 from ielpy.ELFactStructure import ELFACT
 from ielpy.ELResults import ELSuccess, ELFail
 from ielpy.ELTrie import ELTrie
+from ielpy.ELSymbols import SYMBOLS
 from fractions import Fraction
 
 
@@ -18,6 +20,18 @@ base_root = ELROOT(EL.DOT)
 root_fact = ELFACT([base_root])
 logging = root_logger.getLogger(__name__)
 
+def reference_matches(node, pattern, bound=()):
+    """ Brute force matching of pairs from a node, yielding (bindings, node uuid) """
+    if not bool(pattern):
+        yield (dict(bound), node.uuid)
+        return
+    head, rest = pattern[0], pattern[1:]
+    if head.isVar():
+        for child in node:
+            yield from reference_matches(child, rest, bound + ((head.value.value, (child.uuid, child.value)),))
+    elif head in node and (not bool(rest) or head.elop == node[head].elop):
+        yield from reference_matches(node[head], rest, bound)
+
 
 class ELParser_Tests(unittest.TestCase):
     
@@ -81,8 +95,8 @@ class ELParser_Tests(unittest.TestCase):
         #Now get the root and see the children are there:
         root = self.trie.root
         self.assertEqual(root.value,"ROOT")
-        self.assertTrue("test" in root.children)
-        self.assertTrue("blah" in root.children)
+        self.assertTrue("test" in root)
+        self.assertTrue("blah" in root)
 
     def test_fact_len(self):
         """ Check adding a fact .test.bloo is of depth 2 """
@@ -497,12 +511,163 @@ class ELParser_Tests(unittest.TestCase):
         result2 = self.trie.query(query2)
         self.assertTrue(result2)
 
+    def test_node_ids(self):
+        """ Check nodes get increasing integer ids, distinct from integer values """
+        self.trie.push(ELFACT(r=True).pair('a').pair(1))
+        a_node = self.trie['a']
+        one_node = a_node[1]
+        self.assertIsInstance(one_node.uuid, ELNodeId)
+        self.assertGreater(one_node.uuid, a_node.uuid)
+        self.assertIs(self.trie[one_node.uuid], one_node)
+        #a plain int is a value, not a node id:
+        self.trie.push(ELFACT(r=True).pair(int(one_node.uuid)))
+        self.assertEqual(self.trie[int(one_node.uuid)].value, int(one_node.uuid))
+
+    def test_nodes_are_slotted(self):
+        """ Check trie nodes don't carry a __dict__ """
+        self.trie.push(ELFACT(r=True).pair('a'))
+        self.assertFalse(hasattr(self.trie['a'], '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.trie['a'].extra = True
         
-        
+    def test_variable_over_leaf_fails(self):
+        self.trie.push(ELFACT(r=True).pair('a').pair('b'))
+        self.assertFalse(self.trie.get(ELFACT(r=True).pair('a').pair('b').pair(ELVAR('x'))))
+        self.assertTrue(self.trie.query(ELFACT(r=True).pair('a').pair(ELVAR('x')).query()))
+
+    def test_get_matches_reference(self):
+        """ Check matches, and their order, against brute force matching on random tries """
+        values = ['a', 'b', 'c']
+        for trial in range(30):
+            self.trie = self.trie.__class__()
+            for i in range(20):
+                fact = ELFACT(r=True)
+                for d in range(1 + int(random() * 4)):
+                    if random() < 0.2:
+                        fact.epair(choice(values))
+                    else:
+                        fact.pair(choice(values))
+                self.trie.push(fact)
+            for i in range(20):
+                query = ELFACT(r=True)
+                for d in range(1 + int(random() * 4)):
+                    if random() < 0.4:
+                        query.pair(ELVAR(choice(['x', 'y'])))
+                    elif random() < 0.2:
+                        query.epair(choice(values))
+                    else:
+                        query.pair(choice(values))
+                expected = list(reference_matches(self.trie.root, query.data[1:]))
+                result = self.trie.get(query)
+                if not bool(expected) or len(set([tuple(sorted(x[0])) for x in expected])) > 1:
+                    self.assertFalse(result, str(query))
+                    continue
+                self.assertTrue(result, str(query))
+                actual = [({ k : (v.uuid, v.value) for k, v in x.items() }, x.uuid) for x in result.bindings]
+                self.assertEqual(actual, expected)
+
     #test trie dump
     #test trie pickle?
 
         
+    def reachable(self):
+        queue = [self.trie.root]
+        count = 0
+        while bool(queue):
+            current = queue.pop()
+            count += 1
+            queue.extend(current)
+        return count
+
+    def test_churn_keeps_nodes_constant(self):
+        """ Check asserting and retracting facts, directly and through
+        exclusion and elop changes, doesn't grow allNodes, or the symbol table """
+        self.trie.push(ELFACT(r=True).pair('base'))
+        baseline = len(self.trie.allNodes)
+        gc.collect()
+        symbols = len(SYMBOLS)
+        for i in range(10000):
+            fact = ELFACT(r=True).pair('agents').pair(i % 10).pair('state').epair(i)
+            self.trie.push(fact.pair('detail').pair(i))
+            self.trie.push(ELFACT(r=True).pair('agents').pair(i % 10).epair('state'))
+            self.trie.push(ELFACT(r=True).pair('agents').pair(i % 10).pair('state').pair(i))
+            self.trie.pop(ELFACT(r=True).pair('agents').pair(i % 10))
+        self.trie.pop(ELFACT(r=True).pair('agents'))
+        self.assertEqual(len(self.trie.allNodes), baseline)
+        self.assertEqual(len(self.trie.allNodes), self.reachable())
+        #the last fact still holds its symbols
+        del fact
+        gc.collect()
+        self.assertLessEqual(len(SYMBOLS), symbols)
+
+    def test_removed_nodes_are_released(self):
+        self.trie.push(ELFACT(r=True).pair('a').pair('b').pair('c'))
+        c_id = self.trie['a']['b']['c'].uuid
+        self.trie.push(ELFACT(r=True).epair('a').pair('d'))
+        self.assertNotIn(c_id, self.trie.allNodes)
+        self.assertFalse(self.trie.query(ELFACT(r=True).pair('a').pair('b').query()))
+
+    def test_compact_releases_orphans(self):
+        """ Nodes detached behind the trie's back are released by compact """
+        self.trie.push(ELFACT(r=True).pair('a').pair('b').pair('c'))
+        self.trie.push(ELFACT(r=True).pair('a').pair('d'))
+        del self.trie.root['a']['b']
+        self.assertEqual(len(self.trie.allNodes), 5)
+        self.assertEqual(self.trie.compact(), 2)
+        self.assertEqual(len(self.trie.allNodes), 3)
+        self.assertEqual(self.trie.compact(), 0)
+        self.assertTrue(self.trie.query(ELFACT(r=True).pair('a').pair('d').query()))
+
+    def test_push_many_matches_pushes(self):
+        """ Check pushing facts together leaves the trie as pushing them in turn,
+        including the order exclusions overwrite in """
+        values = ['a', 'b', 'c', 1]
+        for trial in range(20):
+            facts = []
+            for i in range(50):
+                fact = ELFACT(r=True)
+                for j in range(1 + int(random() * 4)):
+                    if random() < 0.3:
+                        fact.epair(choice(values))
+                    else:
+                        fact.pair(choice(values))
+                facts.append(fact)
+            if trial % 2:
+                facts.sort(key=str)
+            together = ELTrie()
+            self.assertTrue(together.push_many(facts))
+            for fact in facts:
+                self.trie.push(fact)
+            self.assertEqual([str(x) for x in together.leaves()], [str(x) for x in self.trie.leaves()])
+            self.assertEqual(len(together.allNodes), len(self.trie.allNodes))
+            #observers are told of the built subtrees:
+            self.assertEqual((together.stats.nodes, together.stats.leaves, together.stats.depths),
+                             (self.trie.stats.nodes, self.trie.stats.leaves, self.trie.stats.depths))
+            self.trie = ELTrie()
+
+    def test_push_many_keeps_facts_before_an_error(self):
+        """ Check facts pushed before the iterable raises stay attached """
+        def facts():
+            yield ELFACT(r=True).pair('a').pair('b')
+            yield ELFACT(r=True).pair('a').pair('c')
+            raise ValueError('partway')
+        with self.assertRaises(ValueError):
+            self.trie.push_many(facts())
+        self.assertTrue(self.trie.query(ELFACT(r=True).pair('a').pair('b').query()))
+        self.assertTrue(self.trie.query(ELFACT(r=True).pair('a').pair('c').query()))
+        self.assertEqual(len(self.trie.allNodes), self.reachable())
+        self.assertEqual(self.trie.stats.nodes, 3)
+
+    def test_push_many_from_other_roots(self):
+        self.trie.push(ELFACT(r=True).pair('a').pair('b'))
+        b_id = self.trie['a']['b'].uuid
+        facts = [ELFACT(r=True).pair('a').pair('b').pair('c'),
+                 ELFACT([ELROOT(EL.DOT, var=b_id)]).pair('d'),
+                 ELFACT(r=True).pair('a').pair('b').pair('e')]
+        self.assertTrue(self.trie.push_many(facts))
+        self.assertEqual(sorted([str(x) for x in self.trie.leaves()]), ['.a.b.c', '.a.b.d', '.a.b.e'])
+
+
 if __name__ == "__main__":
     LOGLEVEL = root_logger.DEBUG
     LOG_FILE_NAME = "test_ELTrie.log"
@@ -0,0 +1,134 @@
+"""
+	Testing of versions of a trie read from other threads as it changes
+"""
+import unittest
+import sys
+import threading
+import queue
+import logging as root_logger
+from random import Random
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELTrie import ELTrie
+from ielpy.ELArrayTrie import ELArrayTrie
+from ielpy import ELVersions
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement(rng):
+    pairs = "." + str(rng.choice(VALUES)) + "".join([rng.choice(['.', '.', '.', '!']) + str(rng.choice(VALUES))
+                                                     for x in range(int(rng.random() * 4))])
+    if rng.random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+QUERIES = ['.$x?', '.$x.$y?', '.a.$x!$y?', '.a.b.c?', '~.b.$x?']
+
+def describe(trie, queries):
+    results = []
+    for query in queries:
+        result = trie.query(query)
+        if not bool(result):
+            results.append(None)
+        else:
+            results.append([(x.uuid, sorted([(k, v.value) for k, v in x.items()]))
+                            for x in result.bindings])
+    return (results, sorted([str(x) for x in trie.leaves()]))
+
+
+class ELVersions_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        #switch threads often, to interleave reads with changes
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_readers_see_their_versions(self):
+        """ Check versions read in other threads keep their state as the writer carries on """
+        for engine in [ELTrie, ELArrayTrie]:
+            runtime = ELR(trie=engine())
+            runtime.enable_versions()
+            queries = [runtime.parser(x)[0] for x in QUERIES]
+            pinned = queue.Queue()
+            failures = []
+            def read():
+                while True:
+                    item = pinned.get()
+                    if item is None:
+                        return
+                    version, expected = item
+                    with version:
+                        for i in range(3):
+                            try:
+                                found = describe(version, queries)
+                            except Exception as e:
+                                found = e
+                            if found != expected:
+                                failures.append((found, expected))
+            readers = [threading.Thread(target=read) for x in range(4)]
+            for reader in readers:
+                reader.start()
+            rng = Random(3)
+            for i in range(400):
+                runtime(random_statement(rng))
+                if i % 5 == 0:
+                    #taken in the writer, so the expected state can be recorded with it
+                    version = runtime.snapshot()
+                    pinned.put((version, describe(version, queries)))
+                    version = None
+            for reader in readers:
+                pinned.put(None)
+            for reader in readers:
+                reader.join()
+            self.assertEqual(failures, [])
+            self.assertEqual(len(runtime.trie.versions), 0)
+
+    def test_reclaim_keeps_what_pinned_versions_need(self):
+        runtime = ELR()
+        versions = runtime.enable_versions()
+        for i in range(50):
+            runtime('.a.{}.b'.format(i))
+        old = runtime.snapshot()
+        runtime('.a.1.c, .a.2.c')
+        new = runtime.snapshot()
+        runtime('.a.1.d, .a.3.c')
+        #a.1 twice, a.2, a.3:
+        self.assertEqual(sum([len(x[0]) for x in runtime.trie.frozen.values()]), 4)
+        old.release()
+        self.assertEqual(versions.reclaim(), 1)
+        self.assertEqual(sum([len(x[0]) for x in runtime.trie.frozen.values()]), 2)
+        self.assertTrue(new.query(runtime.parser('.a.1.c?')[0]))
+        self.assertFalse(new.query(runtime.parser('.a.1.d?')[0]))
+        self.assertFalse(new.query(runtime.parser('.a.3.c?')[0]))
+        new.release()
+        self.assertEqual(versions.reclaim(), 2)
+        self.assertEqual(len(runtime.trie.frozen), 0)
+
+    def test_reclaim_as_the_writer_goes(self):
+        """ Check preserved states don't build up while readers keep versions pinned """
+        runtime = ELR()
+        runtime.enable_versions()
+        pinned = [runtime.snapshot()]
+        for i in range(ELVersions.MIN_RECLAIM * 20):
+            runtime('.a.{}'.format(i % 100))
+            pinned.append(runtime.snapshot())
+            pinned.pop(0).release()
+        kept = sum([len(x[0]) for x in runtime.trie.frozen.values()])
+        self.assertLess(kept, ELVersions.MIN_RECLAIM * 2)
+        self.assertTrue(pinned[0].query(runtime.parser('.a.99?')[0]))
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELVersions.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()
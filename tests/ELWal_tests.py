@@ -0,0 +1,161 @@
+"""
+	Testing of the write ahead log of a runtime's changes, and recovery from it
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import logging as root_logger
+from random import Random
+from test_context import ielpy
+from ielpy import ELRuntime as ELR
+from ielpy.ELStructure import ELROOT
+from ielpy.ELFactStructure import ELFACT, ELARITH_FACT
+from ielpy.ELFunctions import ELARITH
+from ielpy.ELUtil import EL
+from ielpy.ELWal import ELWal, ELDURABILITY
+from ielpy import ELExceptions as ELE
+
+VALUES = ['a', 'b', 'c', 1, 2]
+
+def random_statement(rng):
+    pairs = "." + str(rng.choice(VALUES)) + "".join([rng.choice(['.', '.', '.', '!']) + str(rng.choice(VALUES))
+                                                     for x in range(int(rng.random() * 4))])
+    if rng.random() < 0.25:
+        return "~" + pairs
+    return pairs
+
+
+class ELWal_Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.dir, "runtime.eld")
+        self.log = os.path.join(self.dir, "runtime.wal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_recover_at_each_level(self):
+        """ Check a runtime recovers its facts from checkpoints and the changes logged after """
+        rng = Random(5)
+        for durability in ELDURABILITY:
+            runtime = ELR.recover(self.checkpoint, self.log, durability)
+            for i in range(300):
+                runtime(random_statement(rng))
+                if i == 100:
+                    runtime.checkpoint(self.checkpoint)
+                elif i == 200:
+                    #a crash between saving and emptying the log, which mustn't replay twice
+                    runtime.save(self.checkpoint)
+            runtime.wal.close()
+            recovered = ELR.recover(self.checkpoint, self.log, durability)
+            self.assertEqual(str(recovered), str(runtime))
+            self.assertEqual(recovered.logged, runtime.logged)
+            recovered('.d.e')
+            recovered.wal.close()
+            recovered = ELR.recover(self.checkpoint, self.log, durability)
+            self.assertTrue(recovered('.d.e?'))
+            recovered.wal.close()
+            os.remove(self.checkpoint)
+            os.remove(self.log)
+
+    def test_updates_and_rooted_facts(self):
+        runtime = ELR()
+        runtime.enable_wal(self.log, ELDURABILITY.SYNC)
+        runtime('.a.b.10, .test.conditions.[ .a.b.$x ], .test.arithmetic.[ $..x + 10 ]')
+        result = runtime.run_conditions('.test.conditions?')
+        runtime.run_arithmetic('.test.arithmetic?', binding=result.bindings[0])
+        node = runtime.get_location('.a.b.20?')
+        runtime.act(ELARITH_FACT(data=node.uuid, op=ELARITH.MUL, val=3))
+        b = runtime.get_location('.a.b?')
+        runtime.fact_assert(ELFACT([ELROOT(EL.DOT, var=b.uuid)]).epair('c').pair('d'))
+        runtime.fact_retract(ELFACT([ELROOT(EL.DOT, var=b.uuid)], negated=True).pair(60))
+        runtime.wal.close()
+        recovered = ELR.recover(self.checkpoint, self.log)
+        self.assertEqual(str(recovered), str(runtime))
+        self.assertTrue(recovered('.a.b.c!d?'))
+        self.assertFalse(recovered('.a.b.60?'))
+        recovered.wal.close()
+
+    def test_assert_many(self):
+        runtime = ELR()
+        runtime.enable_wal(self.log, ELDURABILITY.OS)
+        runtime.assert_many(['.a.b.c', '.a.b.d, .a.e'])
+        runtime('~.a.b.c')
+        runtime.wal.close()
+        recovered = ELR.recover(self.checkpoint, self.log)
+        self.assertEqual(str(recovered), str(runtime))
+        self.assertEqual(recovered.logged, 4)
+        recovered.wal.close()
+
+    def test_failed_assert_many(self):
+        """ Check only the facts a failed batch applied are recovered """
+        runtime = ELR()
+        runtime.enable_wal(self.log, ELDURABILITY.SYNC)
+        with self.assertRaises(ELE.ELConsistencyException):
+            runtime.assert_many(['.a.b', '.a.c', '.x.y?'])
+        #a failure while pushing a fact:
+        new_node = runtime.trie.new_node
+        def failing_node(value, parent):
+            if value.value == 'f':
+                raise MemoryError()
+            return new_node(value, parent)
+        runtime.trie.new_node = failing_node
+        with self.assertRaises(MemoryError):
+            runtime.assert_many(['.d.e', '.d.f'])
+        runtime.wal.close()
+        recovered = ELR.recover(self.checkpoint, self.log)
+        self.assertEqual(recovered.logged, 3)
+        for query in ['.a.b?', '.a.c?', '.d.e?', '~.x?', '~.d.f?']:
+            self.assertTrue(runtime(query), query)
+            self.assertTrue(recovered(query), query)
+        recovered.wal.close()
+
+    def test_torn_records_are_cut_off(self):
+        runtime = ELR()
+        runtime.enable_wal(self.log, ELDURABILITY.SYNC)
+        runtime('.a.b, .a.c')
+        runtime.wal.close()
+        size = os.path.getsize(self.log)
+        with open(self.log, 'ab') as f:
+            f.write(b'\x20\x00\x00\x00partial')
+        recovered = ELR.recover(self.checkpoint, self.log, ELDURABILITY.SYNC)
+        self.assertEqual(os.path.getsize(self.log), size)
+        self.assertEqual(str(recovered), str(runtime))
+        recovered('.a.d')
+        recovered.wal.close()
+        recovered = ELR.recover(self.checkpoint, self.log)
+        self.assertTrue(recovered('.a.d?'))
+        recovered.wal.close()
+
+    def test_group_commits(self):
+        """ Check records are on disk within the window, without closing the log """
+        runtime = ELR()
+        runtime.enable_wal(self.log, ELDURABILITY.GROUP, window=0.01)
+        for i in range(50):
+            runtime('.a.{}'.format(i))
+        time.sleep(0.25)
+        self.assertEqual(len(ELWal(self.log).records()), 50)
+        runtime.wal.close()
+
+    def test_one_log_at_a_time(self):
+        runtime = ELR()
+        runtime.enable_wal(self.log)
+        with self.assertRaises(ELE.ELRuntimeException):
+            runtime.enable_wal(self.log)
+        runtime.wal.close()
+
+
+if __name__ == "__main__":
+    LOGLEVEL = root_logger.DEBUG
+    LOG_FILE_NAME = "test_ELWal.log"
+    root_logger.basicConfig(filename=LOG_FILE_NAME, level=LOGLEVEL, filemode='w')
+    console = root_logger.StreamHandler()
+    console.setLevel(root_logger.INFO)
+    root_logger.getLogger('').addHandler(console)
+    logging = root_logger.getLogger(__name__)
+    root_logger.disable(root_logger.CRITICAL)
+    ##############################
+    unittest.main()